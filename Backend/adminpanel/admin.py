@@ -1,7 +1,7 @@
 from django.contrib import admin
 from .models import (
     Product, Brand, Category, ProductImage,
-    Order, OrderItem, Payment,
+    Order, OrderItem, Payment, StripeEvent,
     Service, ServiceCategory, ServiceImage, ServiceInquiry,
     Review, ServiceReview,
     WebsiteContent, StoreSettings,
@@ -81,6 +81,20 @@ class PaymentAdmin(admin.ModelAdmin):
     list_filter = ('status', 'currency', 'created_at')
     search_fields = ('stripe_payment_intent_id', 'order__tracking_id')
 
+@admin.register(StripeEvent)
+class StripeEventAdmin(admin.ModelAdmin):
+    list_display = ('event_id', 'event_type', 'status', 'attempts', 'received_at', 'next_attempt_at', 'processed_at')
+    list_filter = ('status', 'event_type', 'received_at')
+    search_fields = ('event_id',)
+    readonly_fields = ('event_id', 'event_type', 'payload', 'received_at', 'processed_at', 'last_error')
+    actions = ['retry_now']
+
+    @admin.action(description="Retry selected events now")
+    def retry_now(self, request, queryset):
+        from .stripe_events import retry_event
+        retried = sum(retry_event(event.event_id) for event in queryset)
+        self.message_user(request, f"Requeued {retried} event(s)")
+
 # Service Management
 @admin.register(Service)
 class ServiceAdmin(admin.ModelAdmin):
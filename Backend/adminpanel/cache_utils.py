@@ -1,16 +1,97 @@
 """
 Cache utility functions that work with different cache backends
 """
+import time
 from django.core.cache import cache
 from django.core.cache.utils import make_template_fragment_key
+from django.db import transaction
 import logging
 
 logger = logging.getLogger(__name__)
 
+# --- Tag-based invalidation ---
+# Every tag (e.g. "products", "categories:12", "brands") owns a version counter
+# stored in the cache. Cached entries are written under a key that embeds the
+# current versions of their tags, so bumping a tag's version makes every entry
+# carrying it unreachable at once; the orphans simply age out via their TTL.
+# This needs nothing beyond get_many/add/incr/set, so it behaves the same on
+# LocMem and Redis and never has to scan keys or clear the whole cache.
+TAG_VERSION_PREFIX = "cache_tag_version"
+
+def _tag_version_key(tag):
+    return f"{TAG_VERSION_PREFIX}:{tag}"
+
+def _initial_tag_version():
+    # Seeding from the clock means a version key that was evicted never comes
+    # back with a value an older cached entry was written under
+    return time.time_ns()
+
+def get_tag_versions(tags):
+    """
+    Return {tag: version} for the given tags in a single cache round trip,
+    initialising any tag that has no version yet.
+    """
+    keys = {tag: _tag_version_key(tag) for tag in tags}
+    found = cache.get_many(list(keys.values()))
+    versions = {}
+    for tag, key in keys.items():
+        version = found.get(key)
+        if version is None:
+            # add() only wins if nobody else initialised the tag meanwhile
+            cache.add(key, _initial_tag_version(), None)
+            version = cache.get(key)
+        versions[tag] = version
+    return versions
+
+def tagged_cache_key(key, tags):
+    """
+    Build a cache key that is invalidated whenever any of ``tags`` is.
+
+        cache_key = tagged_cache_key("public_categories_top", ["categories"])
+        data = cache.get(cache_key)
+    """
+    tags = list(tags)
+    if not tags:
+        return key
+    versions = get_tag_versions(tags)
+    return f"{key}|" + ",".join(f"{tag}@{versions[tag]}" for tag in tags)
+
+def bump_tag_version(tag):
+    """
+    Advance a tag's version and return the new value.
+    """
+    key = _tag_version_key(tag)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Version never initialised (or evicted): start a fresh one
+        version = _initial_tag_version()
+        cache.set(key, version, None)
+        return version
+
+def invalidate_tags(*tags):
+    """
+    Invalidate every cache entry carrying any of the given tags.
+    """
+    for tag in tags:
+        try:
+            bump_tag_version(tag)
+            logger.debug(f"Invalidated cache tag: {tag}")
+        except Exception as e:
+            logger.error(f"Error invalidating cache tag {tag}: {e}")
+
+def invalidate_tags_on_commit(*tags):
+    """
+    Invalidate tags once the current transaction commits (immediately when
+    not in a transaction), so readers cannot re-cache rows about to change.
+    """
+    transaction.on_commit(lambda: invalidate_tags(*tags))
+
 def safe_delete_pattern(pattern):
     """
     Safely delete cache keys matching a pattern.
-    Works with both Redis and local memory cache backends.
+    Only backends with delete_pattern (django-redis) support this; on other
+    backends it is a no-op, use tagged keys and invalidate_tags() instead.
     """
     try:
         # Try Redis-specific delete_pattern method first
@@ -18,16 +99,9 @@ def safe_delete_pattern(pattern):
             cache.delete_pattern(pattern)
             logger.debug(f"Deleted cache pattern: {pattern}")
         else:
-            # Fallback for local memory cache - clear all cache
-            logger.warning(f"Cache backend doesn't support delete_pattern, clearing all cache instead of pattern: {pattern}")
-            cache.clear()
+            logger.warning(f"Cache backend doesn't support delete_pattern, skipping pattern: {pattern}")
     except Exception as e:
         logger.error(f"Error deleting cache pattern {pattern}: {e}")
-        # Fallback to clearing all cache
-        try:
-            cache.clear()
-        except Exception as clear_error:
-            logger.error(f"Error clearing cache: {clear_error}")
 
 def safe_delete(key):
     """
@@ -44,27 +118,27 @@ def invalidate_product_caches(product_id=None):
     Invalidate product-related caches
     """
     if product_id:
-        safe_delete(f"admin_product_detail:{product_id}")
-    
+        invalidate_tags(f"products:{product_id}")
+
     # Clear product list caches
-    safe_delete_pattern("admin_products_list:*")
+    invalidate_tags("products")
 
 def invalidate_category_caches(category_id=None):
     """
     Invalidate category-related caches
     """
     if category_id:
-        safe_delete(f"admin_category_detail:{category_id}")
-    
+        invalidate_tags(f"categories:{category_id}")
+
     # Clear category list caches
-    safe_delete_pattern("admin_categories_list:*")
+    invalidate_tags("categories")
 
 def invalidate_service_caches(service_id=None):
     """
     Invalidate service-related caches
     """
     if service_id:
-        safe_delete(f"admin_service_detail:{service_id}")
-    
+        invalidate_tags(f"services:{service_id}")
+
     # Clear service list caches
-    safe_delete_pattern("admin_services_list:*")
+    invalidate_tags("services")
@@ -0,0 +1,543 @@
+"""
+Streaming catalog import and export: products with their brand, category
+and image references.
+
+One record per product, as CSV rows or JSON lines, with the fields:
+
+    id, name, description, price, discount_rate, stock, isNew,
+    is_top_selling, brand, category, technical_specs, images
+
+``brand`` is the brand name and ``category`` the category path
+("Lighting / Indoor / Ceiling"). ``images`` lists stored image names, main
+image first. In CSV, ``technical_specs`` and ``images`` are JSON strings.
+Blank or missing fields leave an existing product's value unchanged; new
+products need ``name`` and ``category``.
+
+A record updates the product with its ``id``; otherwise the product with
+the same name in the same category; otherwise it creates one. Missing
+brands and categories are created on the way. Slugs are picked in memory
+from those loaded when the import starts.
+
+Records are processed ``chunk_size`` at a time. Each chunk is one
+transaction with one bulk insert/update per model, not a get_or_create per
+row; fields that already hold the imported value are not written. Bulk
+writes fire no model signals, so the import applies their effects itself:
+- blob reference counts for new images;
+- cache tags and a search index rebuild;
+- through ``suppress_broadcasts``, a change log reset and one realtime
+  refresh per resource.
+
+New images get no thumbnails here; run ``generate_image_variants``
+afterwards.
+"""
+import csv
+import io
+import json
+import logging
+import time
+from decimal import Decimal, InvalidOperation
+
+from django.db import connection, transaction
+from django.db.models import F, Max
+from django.utils.text import slugify
+
+from .cache_utils import invalidate_tags_on_commit
+from .content_storage import add_references
+from .models import Brand, Category, Product, ProductImage
+from .realtime_broadcast import suppress_broadcasts
+from .search_index import mark_search_index_stale
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("csv", "jsonl")
+COLUMNS = [
+    "id", "name", "description", "price", "discount_rate", "stock", "isNew",
+    "is_top_selling", "brand", "category", "technical_specs", "images",
+]
+# Written straight onto Product; brand, category and images are resolved first
+PRODUCT_FIELDS = [
+    "name", "description", "price", "discount_rate", "stock", "isNew", "is_top_selling", "technical_specs",
+]
+CHUNK_SIZE = 1000
+UPDATE_BATCH_SIZE = 100
+MAX_CATEGORY_DEPTH = 3
+MAX_REPORTED_ERRORS = 100
+
+
+def format_for(filename):
+    """``csv`` or ``jsonl`` from a file name, or None"""
+    name = (filename or "").lower()
+    if name.endswith(".csv"):
+        return "csv"
+    if name.endswith((".jsonl", ".ndjson")):
+        return "jsonl"
+    return None
+
+
+# --- Parsing ---
+
+_TRUE = {"1", "true", "yes", "y", "t"}
+_FALSE = {"0", "false", "no", "n", "f"}
+
+
+def _text(value, max_length=None):
+    value = str(value).strip()
+    if max_length and len(value) > max_length:
+        raise ValueError(f"longer than {max_length} characters")
+    return value
+
+
+def _decimal(value, low=None, high=None):
+    try:
+        value = Decimal(str(value).strip())
+    except InvalidOperation:
+        raise ValueError(f"not a number: {value!r}")
+    if not value.is_finite() or (low is not None and value < low) or (high is not None and value > high):
+        raise ValueError(f"out of range: {value}")
+    return value.quantize(Decimal("0.01"))
+
+
+def _count(value):
+    try:
+        value = int(str(value).strip())
+    except ValueError:
+        raise ValueError(f"not a whole number: {value!r}")
+    if value < 0:
+        raise ValueError(f"negative: {value}")
+    return value
+
+
+def _bool(value):
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in _TRUE:
+        return True
+    if text in _FALSE:
+        return False
+    raise ValueError(f"not a boolean: {value!r}")
+
+
+def _json(kind):
+    def parse(value):
+        if isinstance(value, str):
+            value = json.loads(value)
+        if not isinstance(value, kind):
+            raise ValueError(f"must be a JSON {'object' if kind is dict else 'list'}")
+        return value
+    return parse
+
+
+def _images(value):
+    names = _json(list)(value)
+    if not all(isinstance(name, str) and name.strip() for name in names):
+        raise ValueError("must be a list of image names")
+    return [name.strip() for name in names]
+
+
+def _category_path(value):
+    names = tuple(part.strip() for part in str(value).split("/") if part.strip())
+    if not names:
+        raise ValueError("empty category path")
+    if len(names) > MAX_CATEGORY_DEPTH:
+        raise ValueError(f"deeper than {MAX_CATEGORY_DEPTH} levels")
+    for name in names:
+        _text(name, 120)
+    return names
+
+
+PARSERS = {
+    "id": _count,
+    "name": lambda value: _text(value, 200),
+    "description": _text,
+    "price": lambda value: _decimal(value, low=0),
+    "discount_rate": lambda value: _decimal(value, low=0, high=100),
+    "stock": _count,
+    "isNew": _bool,
+    "is_top_selling": _bool,
+    "brand": lambda value: _text(value, 120),
+    "category": _category_path,
+    "technical_specs": _json(dict),
+    "images": _images,
+}
+
+
+def parse_record(record):
+    """
+    ``{field: value}`` for the non-blank fields of a record: a CSV row dict
+    or one JSONL line. Raises ValueError naming the offending field.
+    """
+    if isinstance(record, str):
+        record = json.loads(record)
+    if not isinstance(record, dict):
+        raise ValueError("record is not a JSON object")
+    values = {}
+    for field, parse in PARSERS.items():
+        value = record.get(field)
+        if value is None or (isinstance(value, str) and not value.strip()):
+            continue
+        try:
+            values[field] = parse(value)
+        except ValueError as e:
+            raise ValueError(f"{field}: {e}")
+    return values
+
+
+def read_records(stream, fmt):
+    """``(line, record)`` pairs from a text stream; JSONL records are left as text"""
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, record
+    else:
+        for line, text in enumerate(stream, 1):
+            if text.strip():
+                yield line, text
+
+
+# --- Import ---
+
+def _path_key(names):
+    # Category names are unique per parent regardless of case
+    return tuple(name.lower() for name in names)
+
+
+def _unique_slug(name, taken, fallback, max_length=120):
+    """Same scheme as Brand/Category.generate_slug, against ``taken`` in memory"""
+    base = slugify(name)[:max_length - 8] or fallback
+    slug, counter = base, 1
+    while slug in taken:
+        slug = f"{base}-{counter}"
+        counter += 1
+    taken.add(slug)
+    return slug
+
+
+def _insert(model, objs, key_fields):
+    """
+    bulk_create ``objs`` and give each its pk. MySQL returns no ids from a
+    multi-row INSERT, so there they are read back by ``key_fields``.
+    """
+    if connection.features.can_return_rows_from_bulk_insert:
+        model.objects.bulk_create(objs)
+        return
+    floor = model.objects.aggregate(top=Max("pk"))["top"] or 0
+    model.objects.bulk_create(objs)
+    waiting = {}
+    for obj in objs:
+        waiting.setdefault(tuple(getattr(obj, field) for field in key_fields), []).append(obj)
+    rows = model.objects.filter(pk__gt=floor).order_by("pk").values_list("pk", *key_fields)
+    for pk, *key in rows.iterator():
+        pending = waiting.get(tuple(key))
+        if pending:
+            pending.pop(0).pk = pk
+
+
+class CatalogImport:
+    """One import run; ``run()`` returns the report"""
+
+    def __init__(self, chunk_size=CHUNK_SIZE, progress=None):
+        self.chunk_size = chunk_size
+        self.progress = progress  # called with the running stats after each chunk
+        self.stats = dict.fromkeys(
+            ["rows", "created", "updated", "unchanged", "images", "brands", "categories", "errors"], 0
+        )
+        self.errors = []
+        self.started = None
+        self._load()
+
+    def _load(self):
+        """What already exists, so each chunk resolves names without queries"""
+        self.brands = {brand.name.lower(): brand for brand in Brand.objects.only("id", "name", "slug")}
+        self.brand_slugs = {brand.slug for brand in self.brands.values() if brand.slug}
+        self.categories = {}
+        self.category_slugs = {}
+        for category in Category.objects.only("id", "name", "slug", "parent_id", *Category.TREE_FIELDS):
+            self.categories[_path_key(category.tree_names.split(" / "))] = category
+            self.category_slugs.setdefault(category.parent_id, set()).add(category.slug)
+        self.products = {}  # (category id, name) -> product id
+        self.product_keys = {}  # product id -> (category id, name)
+        for pk, category_id, name in Product.objects.order_by("pk").values_list("pk", "category_id", "name").iterator():
+            self.products.setdefault((category_id, name), pk)
+            self.product_keys[pk] = (category_id, name)
+
+    def _error(self, line, message):
+        self.stats["errors"] += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "error": str(message)})
+
+    def run(self, records):
+        """Import ``(line, record)`` pairs, e.g. from ``read_records``"""
+        self.started = time.monotonic()
+        with suppress_broadcasts() as touched:
+            try:
+                chunk = []
+                for line, record in records:
+                    chunk.append((line, record))
+                    if len(chunk) >= self.chunk_size:
+                        self._import_chunk(chunk)
+                        chunk = []
+                if chunk:
+                    self._import_chunk(chunk)
+            finally:
+                # Also when reading fails halfway: earlier chunks are committed
+                self._invalidate(touched)
+        return self.report()
+
+    def _invalidate(self, touched):
+        changed = {
+            "products": self.stats["created"] or self.stats["updated"] or self.stats["images"],
+            "brands": self.stats["brands"],
+            "categories": self.stats["categories"],
+        }
+        changed = [resource for resource, count in changed.items() if count]
+        if changed:
+            # Before suppress_broadcasts tells clients to refetch
+            touched.update(changed)
+            invalidate_tags_on_commit(*changed)
+            transaction.on_commit(mark_search_index_stale)
+
+    def report(self):
+        seconds = time.monotonic() - self.started if self.started else 0.0
+        return {
+            **self.stats,
+            "seconds": round(seconds, 3),
+            "rows_per_second": round(self.stats["rows"] / seconds, 1) if seconds else None,
+            "error_samples": self.errors,
+        }
+
+    def _import_chunk(self, chunk):
+        parsed = []
+        for line, record in chunk:
+            self.stats["rows"] += 1
+            try:
+                parsed.append((line, parse_record(record)))
+            except ValueError as e:
+                self._error(line, e)
+        if parsed:
+            try:
+                with transaction.atomic():
+                    counts = self._apply(parsed)
+            except Exception as e:
+                logger.exception(f"Catalog import chunk at line {parsed[0][0]} rolled back: {e}")
+                for line, _ in parsed:
+                    self._error(line, f"chunk rolled back: {e}")
+                # The in-memory indexes may hold rows that were just rolled back
+                self._load()
+            else:
+                for key, count in counts.items():
+                    self.stats[key] += count
+        if self.progress:
+            self.progress(self.report())
+
+    def _apply(self, parsed):
+        counts = {"brands": self._create_brands(parsed), "categories": self._create_categories(parsed)}
+
+        creates = {}  # (category id, name) -> new Product
+        updates = {}  # product id -> (Product, changed fields)
+        images = {}  # ("id", pk) or ("new", key) -> image names
+        for line, values in parsed:
+            fields = {field: values[field] for field in PRODUCT_FIELDS if field in values}
+            if "brand" in values:
+                fields["brand"] = self.brands[values["brand"].lower()]
+            if "category" in values:
+                fields["category"] = self.categories[_path_key(values["category"])]
+
+            pk = values.get("id")
+            if pk is not None and pk not in self.product_keys:
+                self._error(line, f"product {pk} does not exist")
+                continue
+            if pk is None:
+                if "name" not in fields or "category" not in fields:
+                    self._error(line, "name and category are required for new products")
+                    continue
+                key = (fields["category"].pk, fields["name"])
+                pk = self.products.get(key)
+
+            if pk is None:
+                obj = creates.setdefault(key, Product())
+                ref = ("new", key)
+            else:
+                obj, changed = updates.setdefault(pk, (Product(pk=pk), set()))
+                changed.update(fields)
+                ref = ("id", pk)
+            for field, value in fields.items():
+                setattr(obj, field, value)
+            if "images" in values:
+                images[ref] = values["images"]
+
+        if creates:
+            _insert(Product, list(creates.values()), ("category_id", "name"))
+            for key, obj in creates.items():
+                self.products[key] = obj.pk
+                self.product_keys[obj.pk] = key
+
+        self._drop_unchanged(updates)
+        # bulk_update writes every listed field, so group rows by the fields they set
+        groups = {}
+        for obj, changed in updates.values():
+            if changed:
+                groups.setdefault(frozenset(changed), []).append(obj)
+        for fields, objs in groups.items():
+            # Its CASE WHEN per field grows with the batch; small batches stay fast
+            Product.objects.bulk_update(objs, sorted(fields), batch_size=UPDATE_BATCH_SIZE)
+        for pk, (obj, changed) in updates.items():
+            if {"name", "category"} & changed:
+                old = self.product_keys[pk]
+                new = (obj.category_id if "category" in changed else old[0], obj.name if "name" in changed else old[1])
+                if self.products.get(old) == pk:
+                    del self.products[old]
+                self.products.setdefault(new, pk)
+                self.product_keys[pk] = new
+
+        updated = sum(1 for _, changed in updates.values() if changed)
+        counts.update(created=len(creates), updated=updated, unchanged=len(updates) - updated)
+        counts["images"] = self._replace_images(
+            {(ref if kind == "id" else creates[ref].pk): names for (kind, ref), names in images.items()}
+        )
+        return counts
+
+    def _drop_unchanged(self, updates):
+        """Leave out fields that already hold the imported value, so re-imports write nothing"""
+        fields = set().union(*(changed for _, changed in updates.values()))
+        if not fields:
+            return
+        attnames = {field: Product._meta.get_field(field).attname for field in fields}
+        for row in Product.objects.filter(pk__in=updates).values("pk", *attnames.values()):
+            obj, changed = updates[row["pk"]]
+            changed.difference_update(
+                [field for field in changed if getattr(obj, attnames[field]) == row[attnames[field]]]
+            )
+
+    def _create_brands(self, parsed):
+        wanted = {}
+        for _, values in parsed:
+            name = values.get("brand")
+            if name and name.lower() not in self.brands:
+                wanted.setdefault(name.lower(), name)
+        new = [Brand(name=name, slug=_unique_slug(name, self.brand_slugs, "brand")) for name in wanted.values()]
+        if new:
+            _insert(Brand, new, ("name",))
+            for brand in new:
+                self.brands[brand.name.lower()] = brand
+        return len(new)
+
+    def _create_categories(self, parsed):
+        created = 0
+        # Level by level, so every parent has its pk before its children are built
+        for depth in range(MAX_CATEGORY_DEPTH):
+            wanted = {}
+            for _, values in parsed:
+                names = values.get("category")
+                if names and len(names) > depth:
+                    key = _path_key(names[:depth + 1])
+                    if key not in self.categories:
+                        wanted.setdefault(key, names[depth])
+            new = []
+            for key, name in wanted.items():
+                parent = self.categories[key[:-1]] if depth else None
+                taken = self.category_slugs.setdefault(parent.pk if parent else None, set())
+                category = Category(name=name, parent=parent, slug=_unique_slug(name, taken, "category"))
+                category.refresh_tree_fields()
+                new.append(category)
+            if new:
+                _insert(Category, new, ("parent_id", "name"))
+                self.categories.update(zip(wanted, new))
+                created += len(new)
+        return created
+
+    def _replace_images(self, targets):
+        """Give each product in ``{pk: names}`` exactly those images; returns how many were created"""
+        if not targets:
+            return 0
+        current = {}
+        rows = (
+            ProductImage.objects.filter(product_id__in=targets)
+            .order_by("product_id", "-is_main", "pk").values_list("product_id", "image")
+        )
+        for product_id, name in rows:
+            current.setdefault(product_id, []).append(name)
+        replace = [pk for pk, names in targets.items() if current.get(pk, []) != names]
+        stale = [pk for pk in replace if pk in current]
+        if stale:
+            # Row by row, so the delete signals release blobs and variant files
+            ProductImage.objects.filter(product_id__in=stale).delete()
+        new = [
+            ProductImage(product_id=pk, image=name, is_main=index == 0)
+            for pk in replace for index, name in enumerate(targets[pk])
+        ]
+        ProductImage.objects.bulk_create(new)
+        add_references([image.image.name for image in new])
+        return len(new)
+
+
+def import_catalog(stream, fmt, chunk_size=CHUNK_SIZE, progress=None):
+    """Import a CSV or JSONL text stream; returns the report"""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown catalog format {fmt!r}; use one of {', '.join(FORMATS)}")
+    return CatalogImport(chunk_size, progress).run(read_records(stream, fmt))
+
+
+# --- Export ---
+
+def export_records(chunk_size=CHUNK_SIZE):
+    """Lists of up to ``chunk_size`` product records, in id order"""
+    last = 0
+    while True:
+        rows = list(
+            Product.objects.filter(pk__gt=last).order_by("pk")
+            .values("id", *PRODUCT_FIELDS, brand_name=F("brand__name"), category_path=F("category__tree_names"))
+            [:chunk_size]
+        )
+        if not rows:
+            return
+        images = {}
+        image_rows = (
+            ProductImage.objects.filter(product_id__in=[row["id"] for row in rows])
+            .order_by("product_id", "-is_main", "pk").values_list("product_id", "image")
+        )
+        for product_id, name in image_rows:
+            images.setdefault(product_id, []).append(name)
+        yield [
+            {
+                **{field: row[field] for field in ("id", *PRODUCT_FIELDS)},
+                "brand": row["brand_name"] or "",
+                "category": row["category_path"],
+                "images": images.get(row["id"], []),
+            }
+            for row in rows
+        ]
+        last = rows[-1]["id"]
+
+
+def _csv_value(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return value
+
+
+def export_lines(fmt, chunk_size=CHUNK_SIZE, stats=None):
+    """
+    The catalog as CSV or JSONL text, one piece per chunk of products.
+    ``stats["rows"]`` (if given) counts the records written.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown catalog format {fmt!r}; use one of {', '.join(FORMATS)}")
+    stats = {} if stats is None else stats
+    stats.setdefault("rows", 0)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if fmt == "csv":
+        writer.writerow(COLUMNS)
+        yield buffer.getvalue()
+    for records in export_records(chunk_size):
+        if fmt == "csv":
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows([_csv_value(record[column]) for column in COLUMNS] for record in records)
+            yield buffer.getvalue()
+        else:
+            yield "".join(json.dumps(record, default=str, ensure_ascii=False) + "\n" for record in records)
+        stats["rows"] += len(records)
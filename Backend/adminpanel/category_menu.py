@@ -0,0 +1,87 @@
+"""
+Precomputed storefront category menu.
+
+The hover menu (``/api/public/categories/with-hierarchy/``) is the same
+three-level tree for every visitor. Instead of running the recursive
+CategorySerializer per page view, the whole tree is serialized and JSON
+encoded once into an immutable snapshot held in process memory.
+
+Snapshots are versioned by the ``categories`` cache tag, which the Category
+post_save/post_delete handlers in realtime_signals bump on commit, so a
+request only pays one cache lookup to learn whether its snapshot is current.
+Snapshots also expire after ``MENU_SNAPSHOT_MAX_AGE`` seconds, which bounds
+staleness when the cache backend is not shared between workers.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from rest_framework.renderers import JSONRenderer
+
+from .cache_utils import get_tag_versions
+
+MENU_SNAPSHOT_MAX_AGE = 300
+# Image URLs are absolute, so one snapshot is kept per host the API is served on
+MAX_SNAPSHOT_HOSTS = 8
+
+MenuSnapshot = namedtuple("MenuSnapshot", ["version", "etag", "body", "built_at"])
+
+_snapshots = OrderedDict()
+_lock = threading.Lock()
+
+
+def current_menu_version():
+    """Version of the category tree, shared by every worker using the same cache"""
+    return get_tag_versions(["categories"])["categories"]
+
+
+def _is_current(snapshot, version):
+    return (
+        snapshot is not None
+        and snapshot.version == version
+        and time.monotonic() - snapshot.built_at < MENU_SNAPSHOT_MAX_AGE
+    )
+
+
+def _build_snapshot(request, version):
+    from .models import Category
+    from .serializers import CategorySerializer
+
+    top_categories = Category.objects.filter(parent__isnull=True).prefetch_related(
+        "children__children__children"
+    ).order_by("name")
+    data = CategorySerializer(top_categories, many=True, context={"request": request}).data
+    body = JSONRenderer().render(data)
+    etag = '"menu-%s"' % hashlib.sha1(body).hexdigest()
+    return MenuSnapshot(version=version, etag=etag, body=body, built_at=time.monotonic())
+
+
+def get_menu_snapshot(request):
+    """
+    Return the current MenuSnapshot for the request's host, rebuilding it
+    only if the category tree changed since it was built.
+    """
+    # Read the version before building, so a change racing with the build
+    # leaves the new snapshot marked stale rather than hiding the change
+    version = current_menu_version()
+    host = request.build_absolute_uri("/")
+    snapshot = _snapshots.get(host)
+    if _is_current(snapshot, version):
+        return snapshot
+
+    with _lock:
+        snapshot = _snapshots.get(host)
+        if not _is_current(snapshot, version):
+            snapshot = _build_snapshot(request, version)
+            _snapshots[host] = snapshot
+            _snapshots.move_to_end(host)
+            while len(_snapshots) > MAX_SNAPSHOT_HOSTS:
+                _snapshots.popitem(last=False)
+    return snapshot
+
+
+def discard_menu_snapshots():
+    """Drop every snapshot held by this process"""
+    with _lock:
+        _snapshots.clear()
@@ -0,0 +1,114 @@
+"""
+Per-resource change log for delta sync over the admin realtime socket.
+
+The catalogue signal handlers in realtime_signals, and writes that bypass
+signals, call ``record_change`` (through ``realtime_broadcast.rows_changed``)
+inside the writing transaction. It bumps the resource's ``ChangeVersion``
+row and logs the row at that version. The counter row stays locked until
+commit, so versions become visible in order. A client that has seen
+version N therefore never misses a change numbered below it.
+
+Because of that lock, long transactions must not record changes: checkout
+stock reservations run alongside a Stripe call, so ``reserve_inventory``
+records them on commit, in a short transaction of their own.
+
+Clients send ``since=N`` and receive only what changed after N.
+``changes_since`` returns ``None`` when they need a snapshot instead:
+either the log was compacted past N (``compact_change_log``), or a bulk
+run under ``suppress_broadcasts`` recorded a reset after N.
+"""
+import logging
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Max
+
+from .models import ChangeLogEntry, ChangeVersion
+
+logger = logging.getLogger(__name__)
+
+RESOURCES = ("categories", "products", "services", "service_categories", "brands")
+
+
+def merge_action(previous, action):
+    """Net effect of ``action`` following ``previous`` on the same row"""
+    if action == "deleted" or previous is None:
+        return action
+    # A row created since the client last looked is still new to it however often it changed
+    return previous if previous == "created" else action
+
+
+def _bump(resource):
+    """Next version of ``resource``; locks its counter row until commit"""
+    if not ChangeVersion.objects.filter(resource=resource).update(version=F("version") + 1):
+        try:
+            with transaction.atomic():
+                ChangeVersion.objects.create(resource=resource, version=1)
+            return 1
+        except IntegrityError:
+            # Created concurrently
+            ChangeVersion.objects.filter(resource=resource).update(version=F("version") + 1)
+    return ChangeVersion.objects.filter(resource=resource).values_list("version", flat=True).get()
+
+
+def record_change(resource, action, pk):
+    """Log that row ``pk`` of ``resource`` was created, updated or deleted"""
+    from .realtime_broadcast import broadcasts_suppressed
+
+    if broadcasts_suppressed():
+        # A bulk run; it records one reset per resource when it finishes
+        return
+    with transaction.atomic():
+        version = _bump(resource)
+        ChangeLogEntry.objects.create(resource=resource, version=version, object_id=pk, action=action)
+
+
+def record_resets(resources):
+    """Force clients behind the current version of ``resources`` to take a snapshot"""
+    for resource in resources:
+        with transaction.atomic():
+            version = _bump(resource)
+            ChangeLogEntry.objects.create(resource=resource, version=version, action="reset")
+
+
+def current_version(resource):
+    return ChangeVersion.objects.filter(resource=resource).values_list("version", flat=True).first() or 0
+
+
+def changes_since(resource, since):
+    """
+    ``(version, {pk: action})`` for the rows of ``resource`` changed after
+    ``since``, or ``None`` if the client has to take a snapshot.
+    """
+    state = ChangeVersion.objects.filter(resource=resource).values("version", "compacted_through").first()
+    version, compacted_through = (state["version"], state["compacted_through"]) if state else (0, 0)
+    if since > version or since < compacted_through:
+        return None
+    changes = {}
+    entries = (
+        ChangeLogEntry.objects.filter(resource=resource, version__gt=since, version__lte=version)
+        .order_by("version").values_list("object_id", "action")
+    )
+    for pk, action in entries.iterator():
+        if action == "reset":
+            return None
+        changes[pk] = merge_action(changes.get(pk), action)
+    return version, changes
+
+
+def compact(before):
+    """Delete log entries created before ``before``; returns how many"""
+    total = 0
+    for resource in RESOURCES:
+        entries = ChangeLogEntry.objects.filter(resource=resource, created_at__lt=before)
+        through = entries.aggregate(v=Max("version"))["v"]
+        if through is None:
+            continue
+        with transaction.atomic():
+            # Raise the floor first, so no client is served a delta with a hole in it
+            ChangeVersion.objects.filter(resource=resource, compacted_through__lt=through).update(
+                compacted_through=through
+            )
+            deleted, _ = ChangeLogEntry.objects.filter(resource=resource, version__lte=through).delete()
+        total += deleted
+        logger.info(f"Compacted {deleted} {resource} change log entries through v{through}")
+    return total
@@ -0,0 +1,72 @@
+"""
+Cursor paging over a chat room's message history.
+
+Pages are addressed by message id: ``before`` returns the messages older
+than a given message, ``after`` the ones newer than it, and neither the
+most recent page. Every page is one range scan on the
+``(room, created_at, id)`` index, so opening a long-lived support room
+costs the same as opening a new one.
+"""
+from django.db.models import Q
+
+from .models import ChatMessage
+
+CHAT_PAGE_SIZE = 50
+MAX_CHAT_PAGE_SIZE = 200
+
+
+def clamp_page_size(value, default=CHAT_PAGE_SIZE):
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return default
+    if size <= 0:
+        return default
+    return min(size, MAX_CHAT_PAGE_SIZE)
+
+
+def _cursor_q(room_id, message_id, newer):
+    """Rows strictly after (or before) ``message_id`` in (created_at, id) order"""
+    created_at = (
+        ChatMessage.objects.filter(room_id=room_id, id=message_id)
+        .values_list("created_at", flat=True).first()
+    )
+    if created_at is None:
+        # Unknown or deleted message: ids still grow with created_at
+        return Q(id__gt=message_id) if newer else Q(id__lt=message_id)
+    if newer:
+        return Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=message_id)
+    return Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=message_id)
+
+
+def get_message_page(room_id, before=None, after=None, limit=None):
+    """
+    Return ``(messages, has_more)`` with messages oldest first.
+    ``has_more`` says whether more messages exist beyond the page in the
+    direction being paged (older for ``before``/latest, newer for ``after``).
+    """
+    limit = clamp_page_size(limit)
+    qs = ChatMessage.objects.filter(room_id=room_id)
+
+    if after is not None:
+        rows = list(
+            qs.filter(_cursor_q(room_id, after, newer=True))
+            .order_by("created_at", "id")[:limit + 1]
+        )
+        return rows[:limit], len(rows) > limit
+
+    if before is not None:
+        qs = qs.filter(_cursor_q(room_id, before, newer=False))
+    rows = list(qs.order_by("-created_at", "-id")[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    rows.reverse()
+    return rows, has_more
+
+
+def parse_message_id(value):
+    """Message id from a query parameter, or None if absent/invalid"""
+    try:
+        return int(value) if value not in (None, "") else None
+    except (TypeError, ValueError):
+        return None
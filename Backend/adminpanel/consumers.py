@@ -1,24 +1,19 @@
 import json
 import logging
-import asyncio
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from django.contrib.auth.models import AnonymousUser
 from .models import ChatRoom, ChatMessage
 from .encryption import encrypt_chat_message, decrypt_chat_message
+from . import presence
+from .heartbeat import HeartbeatMixin
 
 import logging
 
 logger = logging.getLogger(__name__)
 
-# Global connection tracking - COMMENTED OUT
-active_connections = {
-    'admin': set(),
-    'customers': {}
-}
-
 # Active consumers for chat functionality
-class ChatConsumer(AsyncWebsocketConsumer):
+class ChatConsumer(HeartbeatMixin, AsyncWebsocketConsumer):
     """WebSocket consumer for customer chat rooms with persistent connections"""
     """WebSocket consumer for customer chat rooms with persistent connections"""
     
@@ -27,7 +22,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
             logger.info("Customer WS connect path=%s", self.scope.get("path"))
             self.room_id = self.scope['url_route']['kwargs']['room_id']
             self.group_name = f'chat_{self.room_id}'
-            self.heartbeat_task = None
+            self.presence = None
             self.connection_id = f"{self.room_id}_{id(self)}"
             
             # Get authenticated user from JWT middleware
@@ -62,14 +57,12 @@ class ChatConsumer(AsyncWebsocketConsumer):
             await self.accept()
             logger.info("Customer WS accepted room=%s", self.room_id)
             
-            # Track active connection
-            if self.room_id not in active_connections['customers']:
-                active_connections['customers'][self.room_id] = set()
-            active_connections['customers'][self.room_id].add(self.connection_id)
+            # Track active connection (shared between workers)
+            self.presence = await presence.ajoin(presence.CUSTOMER, self.room_id)
             
             # Start heartbeat to maintain connection
             # COMMENTED OUT: Heartbeat causing WebSocket connection issues
-            # self.heartbeat_task = asyncio.create_task(self.heartbeat())
+            # self.start_heartbeat()
             
             # Send room info to client
             # COMMENTED OUT: WebSocket send operations causing connection errors
@@ -96,19 +89,12 @@ class ChatConsumer(AsyncWebsocketConsumer):
     async def disconnect(self, close_code):
         logger.info("Customer WS disconnect code=%s", close_code)
         
-        # Stop heartbeat task
-        if self.heartbeat_task:
-            self.heartbeat_task.cancel()
-            try:
-                await self.heartbeat_task
-            except asyncio.CancelledError:
-                pass
+        # Stop heartbeat
+        self.stop_heartbeat()
         
         # Remove from active connections
-        if self.room_id in active_connections['customers']:
-            active_connections['customers'][self.room_id].discard(self.connection_id)
-            if not active_connections['customers'][self.room_id]:
-                del active_connections['customers'][self.room_id]
+        await presence.aleave(getattr(self, 'presence', None))
+        self.presence = None
         
         # Notify admin about disconnection
         await self.channel_layer.group_send(
@@ -129,21 +115,9 @@ class ChatConsumer(AsyncWebsocketConsumer):
         except Exception as e:
             logger.error("Error leaving group: %s", e)
     
-    async def heartbeat(self):
-        """Send periodic heartbeat to maintain connection"""
-        try:
-            while True:
-                await asyncio.sleep(30)  # Send heartbeat every 30 seconds
-                await self.send(text_data=json.dumps({
-                    'type': 'heartbeat',
-                    'timestamp': asyncio.get_event_loop().time()
-                }))
-        except asyncio.CancelledError:
-            logger.info("Heartbeat task cancelled for room %s", self.room_id)
-        except Exception as e:
-            logger.error("Heartbeat error for room %s: %s", self.room_id, e)
-
     async def receive(self, text_data):
+        # Heartbeats are off here; client traffic keeps the presence lease fresh
+        await presence.atouch(self.presence)
         try:
             data = json.loads(text_data)
             message_type = data.get('type')
@@ -396,7 +370,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
             return None
 
 
-class AdminChatConsumer(AsyncWebsocketConsumer):
+class AdminChatConsumer(HeartbeatMixin, AsyncWebsocketConsumer):
     """WebSocket consumer for admin chat interface with persistent connections"""
     
     async def connect(self):
@@ -422,13 +396,13 @@ class AdminChatConsumer(AsyncWebsocketConsumer):
             self.admin_group_name = 'admin_chat'
             self.user = user
             self.connection_id = f"admin_{user.id}_{id(self)}"
-            self.heartbeat_task = None
+            self.presence = None
             
             await self.accept()
             logger.info("Admin WS accepted user=%s", user.id)
             
-            # Track active admin connection
-            active_connections['admin'].add(self.connection_id)
+            # Track active admin connection (shared between workers)
+            self.presence = await presence.ajoin(presence.ADMIN)
             
             # Defend against channel layer issues with clear error
             try:
@@ -443,7 +417,7 @@ class AdminChatConsumer(AsyncWebsocketConsumer):
             
             # Start heartbeat to maintain connection
             # COMMENTED OUT: Heartbeat causing WebSocket connection issues
-            # self.heartbeat_task = asyncio.create_task(self.admin_heartbeat())
+            # self.start_heartbeat()
             
             # Send list of active chat rooms with connection status
             # COMMENTED OUT: WebSocket send operations causing connection errors
@@ -454,10 +428,7 @@ class AdminChatConsumer(AsyncWebsocketConsumer):
             #     await self.send(text_data=json.dumps({
             #         'type': 'room_list',
             #         'rooms': rooms,
-            #         'connection_status': {
-            #             'admin_online': len(active_connections['admin']) > 0,
-            #             'active_customers': len(active_connections['customers'])
-            #         }
+            #         'connection_status': await presence.astatus()
             #     }))
             #     logger.info("Room list sent successfully")
             # except Exception as e:
@@ -471,16 +442,12 @@ class AdminChatConsumer(AsyncWebsocketConsumer):
     async def disconnect(self, close_code):
         logger.info("Admin WS disconnect code=%s", close_code)
         
-        # Stop heartbeat task
-        if hasattr(self, 'heartbeat_task') and self.heartbeat_task:
-            self.heartbeat_task.cancel()
-            try:
-                await self.heartbeat_task
-            except asyncio.CancelledError:
-                pass
+        # Stop heartbeat
+        self.stop_heartbeat()
         
         # Remove from active connections
-        active_connections['admin'].discard(self.connection_id)
+        await presence.aleave(getattr(self, 'presence', None))
+        self.presence = None
         
         # Leave admin group
         try:
@@ -491,25 +458,9 @@ class AdminChatConsumer(AsyncWebsocketConsumer):
         except Exception as e:
             logger.error("Error leaving admin group: %s", e)
     
-    async def admin_heartbeat(self):
-        """Send periodic heartbeat to maintain admin connection"""
-        try:
-            while True:
-                await asyncio.sleep(30)  # Send heartbeat every 30 seconds
-                await self.send(text_data=json.dumps({
-                    'type': 'heartbeat',
-                    'timestamp': asyncio.get_event_loop().time(),
-                    'connection_status': {
-                        'admin_online': len(active_connections['admin']) > 0,
-                        'active_customers': len(active_connections['customers'])
-                    }
-                }))
-        except asyncio.CancelledError:
-            logger.info("Admin heartbeat task cancelled")
-        except Exception as e:
-            logger.error("Admin heartbeat error: %s", e)
-
     async def receive(self, text_data):
+        # Heartbeats are off here; client traffic keeps the presence lease fresh
+        await presence.atouch(self.presence)
         try:
             data = json.loads(text_data)
             message_type = data.get('type')
@@ -599,10 +550,7 @@ class AdminChatConsumer(AsyncWebsocketConsumer):
         #     await self.send(text_data=json.dumps({
         #         'type': 'room_list',
         #         'rooms': rooms,
-        #         'connection_status': {
-        #             'admin_online': len(active_connections['admin']) > 0,
-        #             'active_customers': len(active_connections['customers'])
-        #         }
+        #         'connection_status': await presence.astatus()
         #     }))
         # except Exception as e:
         #     logger.error(f"Error refreshing room list: {e}")
@@ -625,10 +573,7 @@ class AdminChatConsumer(AsyncWebsocketConsumer):
         #     await self.send(text_data=json.dumps({
         #         'type': 'room_list',
         #         'rooms': rooms,
-        #         'connection_status': {
-        #             'admin_online': len(active_connections['admin']) > 0,
-        #             'active_customers': len(active_connections['customers'])
-        #         }
+        #         'connection_status': await presence.astatus()
         #     }))
         # except Exception as e:
         #     logger.error(f"Error refreshing room list after customer connect: {e}")
@@ -651,10 +596,7 @@ class AdminChatConsumer(AsyncWebsocketConsumer):
         #     await self.send(text_data=json.dumps({
         #         'type': 'room_list',
         #         'rooms': rooms,
-        #         'connection_status': {
-        #             'admin_online': len(active_connections['admin']) > 0,
-        #             'active_customers': len(active_connections['customers'])
-        #         }
+        #         'connection_status': await presence.astatus()
         #     }))
         # except Exception as e:
         #     logger.error(f"Error refreshing room list after customer disconnect: {e}")
@@ -724,7 +666,8 @@ class AdminChatConsumer(AsyncWebsocketConsumer):
                     'status': room.status,
                     'created_at': room.created_at.isoformat(),
                     'last_message_at': room.last_message_at.isoformat(),
-                    'unread_count': room.messages.filter(sender_type='customer', is_read=False).count(),
+                    'unread_count': room.unread_by_admin,
+                    'last_message_preview': room.last_message_preview,
                     'user': room.user.username if room.user else None
                 }
                 for room in rooms
@@ -737,7 +680,8 @@ class AdminChatConsumer(AsyncWebsocketConsumer):
     def get_active_rooms_with_status(self):
         """Get all active chat rooms with connection status"""
         try:
-            rooms = ChatRoom.objects.all().select_related('user').order_by('-last_message_at')
+            rooms = list(ChatRoom.objects.all().select_related('user').order_by('-last_message_at'))
+            counts = presence.get_presence().room_counts([room.id for room in rooms])
             return [
                 {
                     'id': str(room.id),
@@ -746,10 +690,11 @@ class AdminChatConsumer(AsyncWebsocketConsumer):
                     'status': room.status,
                     'created_at': room.created_at.isoformat(),
                     'last_message_at': room.last_message_at.isoformat(),
-                    'unread_count': room.messages.filter(sender_type='customer', is_read=False).count(),
+                    'unread_count': room.unread_by_admin,
+                    'last_message_preview': room.last_message_preview,
                     'user': room.user.username if room.user else None,
-                    'is_online': str(room.id) in active_connections['customers'],
-                    'connection_count': len(active_connections['customers'].get(str(room.id), set()))
+                    'is_online': counts[str(room.id)] > 0,
+                    'connection_count': counts[str(room.id)]
                 }
                 for room in rooms
             ]
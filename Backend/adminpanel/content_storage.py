@@ -0,0 +1,241 @@
+"""
+Content-addressed media storage.
+
+Uploads to fields using ``content_addressed_storage`` are hashed while
+streaming (in chunks, never fully in memory) and stored once under
+``cas/ab/cd/<sha256><ext>``, so the same photo uploaded for several
+products, services or brands occupies one file. Each blob has a
+``StoredBlob`` row whose ``ref_count`` is kept in step with the model rows
+pointing at it by the receivers in signals.py, inside the same transaction
+as the row change. ``delete()`` on a blob is therefore a no-op; blobs are
+reclaimed by ``collect_garbage`` (the ``gc_media_blobs`` command) once
+nothing has referenced them for a grace period.
+
+Files stored before this existed keep their old names and behave as plain
+FileSystemStorage files.
+"""
+import hashlib
+import logging
+import os
+import re
+from collections import Counter
+from datetime import timedelta
+
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F, FileField
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+CAS_PREFIX = "cas"
+CHUNK_SIZE = 64 * 1024
+GC_GRACE = timedelta(hours=24)
+
+_BLOB_NAME = re.compile(rf"^{CAS_PREFIX}/[0-9a-f]{{2}}/[0-9a-f]{{2}}/[0-9a-f]{{64}}(\.[\w]+)?$")
+
+
+def hash_file(content, chunk_size=CHUNK_SIZE):
+    """Hex SHA-256 of a Django File, read in chunks"""
+    digest = hashlib.sha256()
+    for chunk in content.chunks(chunk_size):
+        digest.update(chunk if isinstance(chunk, bytes) else chunk.encode())
+    return digest.hexdigest()
+
+
+def blob_name(digest, ext=""):
+    return f"{CAS_PREFIX}/{digest[:2]}/{digest[2:4]}/{digest}{ext.lower()}"
+
+
+def is_blob_name(name):
+    return bool(name) and bool(_BLOB_NAME.match(name))
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    content_addressed = True
+
+    def __init__(self, **kwargs):
+        # Identical names mean identical bytes, so a concurrent duplicate
+        # upload may safely overwrite instead of being renamed
+        kwargs.setdefault("allow_overwrite", True)
+        super().__init__(**kwargs)
+
+    def _save(self, name, content):
+        from .models import StoredBlob
+
+        name = blob_name(hash_file(content), os.path.splitext(name)[1])
+        if not self.exists(name):
+            name = super()._save(name, content)
+        blob, created = StoredBlob.objects.get_or_create(
+            name=name, defaults={"size": content.size, "unreferenced_at": timezone.now()}
+        )
+        if not created:
+            logger.info(f"Deduplicated upload into existing blob {name}")
+            if blob.ref_count <= 0:
+                # Restart the grace period so GC cannot take it before the row commits
+                StoredBlob.objects.filter(pk=blob.pk, ref_count__lte=0).update(unreferenced_at=timezone.now())
+        return name
+
+    def delete(self, name):
+        if is_blob_name(name):
+            # Shared between rows; reclaimed by collect_garbage once unreferenced
+            return
+        super().delete(name)
+
+    def purge(self, name):
+        """Really remove a blob file (garbage collection only)"""
+        super().delete(name)
+
+
+_storage = None
+
+
+def content_addressed_storage():
+    """Storage callable for FileField/ImageField ``storage=``"""
+    global _storage
+    if _storage is None:
+        _storage = ContentAddressedStorage()
+    return _storage
+
+
+# --- Reference counting ---
+
+_blob_fields = {}
+
+
+def blob_fields(model):
+    """Names of ``model``'s file fields stored content-addressed"""
+    if model not in _blob_fields:
+        _blob_fields[model] = [
+            field.name for field in model._meta.concrete_fields
+            if isinstance(field, FileField) and getattr(field.storage, "content_addressed", False)
+        ]
+    return _blob_fields[model]
+
+
+def _loaded_blobs(instance):
+    """``{field: name}`` for the blob fields actually loaded (deferred ones are skipped)"""
+    names = {}
+    for field in blob_fields(type(instance)):
+        if field in instance.__dict__:
+            value = instance.__dict__[field]
+            names[field] = getattr(value, "name", value) or ""
+    return names
+
+
+def remember_blobs(instance):
+    """Snapshot the blob names an instance was loaded or created with"""
+    instance._loaded_blobs = _loaded_blobs(instance)
+
+
+def adjust_references(added=(), removed=()):
+    from .models import StoredBlob
+
+    added = [name for name in added if is_blob_name(name)]
+    removed = [name for name in removed if is_blob_name(name)]
+    for name in added:
+        StoredBlob.objects.filter(name=name).update(ref_count=F("ref_count") + 1, unreferenced_at=None)
+    for name in removed:
+        StoredBlob.objects.filter(name=name).update(ref_count=F("ref_count") - 1)
+    if removed:
+        StoredBlob.objects.filter(name__in=removed, ref_count__lte=0).update(unreferenced_at=timezone.now())
+
+
+def add_references(names):
+    """``adjust_references(added=names)`` for rows inserted in bulk (no signals)"""
+    from .models import StoredBlob
+
+    by_count = {}
+    for name, count in Counter(name for name in names if is_blob_name(name)).items():
+        by_count.setdefault(count, []).append(name)
+    for count, group in by_count.items():
+        StoredBlob.objects.filter(name__in=group).update(ref_count=F("ref_count") + count, unreferenced_at=None)
+
+
+def row_saved(instance, created):
+    before = {} if created else getattr(instance, "_loaded_blobs", {})
+    after = _loaded_blobs(instance)
+    added = [value for key, value in after.items() if value and before.get(key) != value]
+    removed = [value for key, value in before.items() if value and key in after and after[key] != value]
+    if added or removed:
+        adjust_references(added, removed)
+    instance._loaded_blobs = after
+
+
+def row_deleted(instance):
+    adjust_references(removed=[name for name in _loaded_blobs(instance).values() if name])
+
+
+# --- Garbage collection ---
+
+def referencing_models():
+    from django.apps import apps
+
+    return [model for model in apps.get_app_config("adminpanel").get_models() if blob_fields(model)]
+
+
+def referenced_counts(names=None):
+    """``{blob name: rows referencing it}``, for ``names`` or every blob"""
+    counts = {}
+    for model in referencing_models():
+        for field in blob_fields(model):
+            qs = model.objects.order_by()
+            qs = qs.filter(**{f"{field}__in": names}) if names is not None else qs.filter(**{f"{field}__startswith": f"{CAS_PREFIX}/"})
+            for name in qs.values_list(field, flat=True).iterator():
+                counts[name] = counts.get(name, 0) + 1
+    return counts
+
+
+def recount_references():
+    """Rebuild every ``ref_count`` from the referencing rows; returns rows fixed"""
+    from .models import StoredBlob
+
+    counts = referenced_counts()
+    fixed = []
+    now = timezone.now()
+    for blob in StoredBlob.objects.all().iterator():
+        count = counts.get(blob.name, 0)
+        if blob.ref_count != count:
+            blob.ref_count = count
+            blob.unreferenced_at = None if count else (blob.unreferenced_at or now)
+            fixed.append(blob)
+    StoredBlob.objects.bulk_update(fixed, ["ref_count", "unreferenced_at"], batch_size=500)
+    return len(fixed)
+
+
+def collect_garbage(limit=500, grace=GC_GRACE, dry_run=False):
+    """
+    Delete up to ``limit`` blobs that have been unreferenced for ``grace``,
+    oldest first, and return their names. Candidates are re-checked against
+    the referencing rows first, so a missed decrement never loses a file.
+    """
+    from .image_variants import discard_blob_variants
+    from .models import StoredBlob
+
+    storage = content_addressed_storage()
+    candidates = list(
+        StoredBlob.objects.filter(ref_count__lte=0, unreferenced_at__lte=timezone.now() - grace)
+        .order_by("unreferenced_at")[:limit]
+    )
+    if not candidates:
+        return []
+    still_used = referenced_counts([blob.name for blob in candidates])
+    collected = []
+    for blob in candidates:
+        if blob.name in still_used:
+            if not dry_run:
+                StoredBlob.objects.filter(pk=blob.pk).update(ref_count=still_used[blob.name], unreferenced_at=None)
+            continue
+        collected.append(blob.name)
+        if dry_run:
+            continue
+        with transaction.atomic():
+            # Skip if re-referenced since the candidates were read
+            deleted, _ = StoredBlob.objects.filter(pk=blob.pk, ref_count__lte=0).delete()
+        if deleted:
+            try:
+                storage.purge(blob.name)
+                discard_blob_variants(blob.name)
+            except Exception as e:
+                logger.warning(f"Could not delete blob {blob.name}: {e}")
+    return collected
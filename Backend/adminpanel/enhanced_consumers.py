@@ -1,22 +1,19 @@
 import json
 import logging
-import asyncio
+from urllib.parse import parse_qs
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from django.contrib.auth.models import AnonymousUser
 from django.core.exceptions import PermissionDenied
 from .models import ChatRoom, ChatMessage
 from .encryption import encrypt_chat_message, decrypt_chat_message
+from .chat_history import MAX_CHAT_PAGE_SIZE, get_message_page, parse_message_id
+from . import presence
+from .heartbeat import HeartbeatMixin
 
 logger = logging.getLogger(__name__)
 
-# Global connection tracking for admin management
-active_connections = {
-    'admin': set(),
-    'customers': {}
-}
-
-class EnhancedChatConsumer(AsyncWebsocketConsumer):
+class EnhancedChatConsumer(HeartbeatMixin, AsyncWebsocketConsumer):
     """Enhanced WebSocket consumer for customer chat rooms with proper user isolation"""
     
     async def connect(self):
@@ -24,7 +21,7 @@ class EnhancedChatConsumer(AsyncWebsocketConsumer):
             logger.info("Enhanced Customer WS connect path=%s", self.scope.get("path"))
             self.room_id = self.scope['url_route']['kwargs']['room_id']
             self.group_name = f'chat_{self.room_id}'
-            self.heartbeat_task = None
+            self.presence = None
             self.connection_id = f"{self.room_id}_{id(self)}"
             
             # Get authenticated user from JWT middleware
@@ -60,10 +57,8 @@ class EnhancedChatConsumer(AsyncWebsocketConsumer):
             await self.accept()
             logger.info("Enhanced Customer WS accepted for room %s", self.room_id)
             
-            # Track active customer connection
-            if self.room_id not in active_connections['customers']:
-                active_connections['customers'][self.room_id] = set()
-            active_connections['customers'][self.room_id].add(self.connection_id)
+            # Track active customer connection (shared between workers)
+            self.presence = await presence.ajoin(presence.CUSTOMER, self.room_id)
             
             # Join room group
             await self.channel_layer.group_add(
@@ -74,8 +69,14 @@ class EnhancedChatConsumer(AsyncWebsocketConsumer):
             # Send room info to admin
             await self.notify_admin_room_activity()
             
-            # Start heartbeat to maintain connection
-            self.heartbeat_task = asyncio.create_task(self.heartbeat())
+            # Heartbeats come from the shared per-process scheduler
+            self.start_heartbeat()
+            
+            # Reconnecting clients pass ?resume_after=<last seen message id>
+            # and only receive the messages they missed
+            resume_after = self.get_resume_after()
+            if resume_after is not None:
+                await self.send_missed_messages(resume_after)
             
         except Exception as e:
             logger.exception("Enhanced Customer WS connect error: %s", e)
@@ -86,18 +87,11 @@ class EnhancedChatConsumer(AsyncWebsocketConsumer):
             logger.info("Enhanced Customer WS disconnect room=%s code=%s", self.room_id, close_code)
             
             # Stop heartbeat
-            if self.heartbeat_task:
-                self.heartbeat_task.cancel()
-                try:
-                    await self.heartbeat_task
-                except asyncio.CancelledError:
-                    pass
+            self.stop_heartbeat()
             
             # Remove from active connections
-            if self.room_id in active_connections['customers']:
-                active_connections['customers'][self.room_id].discard(self.connection_id)
-                if not active_connections['customers'][self.room_id]:
-                    del active_connections['customers'][self.room_id]
+            await presence.aleave(self.presence)
+            self.presence = None
             
             # Leave room group
             await self.channel_layer.group_discard(
@@ -175,17 +169,6 @@ class EnhancedChatConsumer(AsyncWebsocketConsumer):
         except Exception as e:
             logger.error(f"Enhanced Customer WS chat_message error: {e}")
 
-    async def heartbeat(self):
-        """Send periodic heartbeat to maintain connection"""
-        try:
-            while True:
-                await asyncio.sleep(30)  # Send heartbeat every 30 seconds
-                await self.send(text_data=json.dumps({'type': 'heartbeat'}))
-        except asyncio.CancelledError:
-            logger.info("Enhanced Customer WS heartbeat cancelled")
-        except Exception as e:
-            logger.error("Enhanced Customer WS heartbeat error: %s", e)
-
     @database_sync_to_async
     def validate_room_access(self):
         """Validate that the user can access this room"""
@@ -287,14 +270,7 @@ class EnhancedChatConsumer(AsyncWebsocketConsumer):
             room.save()
             
             # Return message data
-            return {
-                'id': str(message.id),
-                'content': message.content,
-                'sender_type': message.sender_type,
-                'sender_name': message.sender_name,
-                'created_at': message.created_at.isoformat(),
-                'is_read': message.is_read
-            }
+            return self._message_payload(message)
             
         except ChatRoom.DoesNotExist:
             logger.error(f"Enhanced Customer WS room {self.room_id} not found")
@@ -303,6 +279,39 @@ class EnhancedChatConsumer(AsyncWebsocketConsumer):
             logger.error(f"Enhanced Customer WS save_message error: {e}")
             return None
 
+    def _message_payload(self, message):
+        return {
+            'id': str(message.id),
+            'content': message.content,
+            'sender_type': message.sender_type,
+            'sender_name': message.sender_name,
+            'created_at': message.created_at.isoformat(),
+            'is_read': message.is_read
+        }
+
+    def get_resume_after(self):
+        query = parse_qs(self.scope.get("query_string", b"").decode())
+        return parse_message_id(query.get("resume_after", [None])[0])
+
+    async def send_missed_messages(self, resume_after):
+        """Send the messages newer than ``resume_after`` (up to one full page)"""
+        try:
+            messages, has_more = await self.get_missed_messages(resume_after)
+            await self.send(text_data=json.dumps({
+                'type': 'message_history',
+                'resume_after': str(resume_after),
+                'messages': messages,
+                # More than a page was missed: fetch the rest via get_messages?after=
+                'has_more': has_more
+            }))
+        except Exception as e:
+            logger.error(f"Enhanced Customer WS send_missed_messages error: {e}")
+
+    @database_sync_to_async
+    def get_missed_messages(self, resume_after):
+        messages, has_more = get_message_page(self.room_id, after=resume_after, limit=MAX_CHAT_PAGE_SIZE)
+        return [self._message_payload(message) for message in messages], has_more
+
     async def notify_admin_room_activity(self):
         """Notify admin about room activity"""
         try:
@@ -332,7 +341,7 @@ class EnhancedChatConsumer(AsyncWebsocketConsumer):
             logger.error(f"Enhanced Customer WS notify_admin_new_message error: {e}")
 
 
-class EnhancedAdminChatConsumer(AsyncWebsocketConsumer):
+class EnhancedAdminChatConsumer(HeartbeatMixin, AsyncWebsocketConsumer):
     """Enhanced WebSocket consumer for admin chat interface with proper room management"""
     
     async def connect(self):
@@ -359,13 +368,13 @@ class EnhancedAdminChatConsumer(AsyncWebsocketConsumer):
             self.admin_group_name = 'admin_chat'
             self.user = user
             self.connection_id = f"admin_{user.id}_{id(self)}"
-            self.heartbeat_task = None
+            self.presence = None
             
             await self.accept()
             logger.info("Enhanced Admin WS accepted user=%s", user.id)
             
-            # Track active admin connection
-            active_connections['admin'].add(self.connection_id)
+            # Track active admin connection (shared between workers)
+            self.presence = await presence.ajoin(presence.ADMIN)
             
             # Join admin group
             await self.channel_layer.group_add(
@@ -376,8 +385,8 @@ class EnhancedAdminChatConsumer(AsyncWebsocketConsumer):
             # Send current room status to admin
             await self.send_room_status()
             
-            # Start heartbeat
-            self.heartbeat_task = asyncio.create_task(self.admin_heartbeat())
+            # Heartbeats come from the shared per-process scheduler
+            self.start_heartbeat()
             
         except Exception as e:
             logger.exception("Enhanced Admin WS connect error: %s", e)
@@ -388,15 +397,11 @@ class EnhancedAdminChatConsumer(AsyncWebsocketConsumer):
             logger.info("Enhanced Admin WS disconnect code=%s", close_code)
             
             # Stop heartbeat
-            if self.heartbeat_task:
-                self.heartbeat_task.cancel()
-                try:
-                    await self.heartbeat_task
-                except asyncio.CancelledError:
-                    pass
+            self.stop_heartbeat()
             
             # Remove from active connections
-            active_connections['admin'].discard(self.connection_id)
+            await presence.aleave(getattr(self, 'presence', None))
+            self.presence = None
             
             # Leave admin group
             await self.channel_layer.group_discard(
@@ -479,17 +484,6 @@ class EnhancedAdminChatConsumer(AsyncWebsocketConsumer):
         except Exception as e:
             logger.error(f"Enhanced Admin WS admin_message_sent error: {e}")
 
-    async def admin_heartbeat(self):
-        """Send periodic heartbeat to maintain connection"""
-        try:
-            while True:
-                await asyncio.sleep(30)  # Send heartbeat every 30 seconds
-                await self.send(text_data=json.dumps({'type': 'heartbeat'}))
-        except asyncio.CancelledError:
-            logger.info("Enhanced Admin WS heartbeat cancelled")
-        except Exception as e:
-            logger.error("Enhanced Admin WS heartbeat error: %s", e)
-
     async def send_room_status(self):
         """Send current room status to admin"""
         try:
@@ -497,7 +491,7 @@ class EnhancedAdminChatConsumer(AsyncWebsocketConsumer):
             await self.send(text_data=json.dumps({
                 'type': 'room_status',
                 'active_rooms': active_rooms,
-                'active_customers': len(active_connections['customers'])
+                'active_customers': (await presence.astatus())['active_customers']
             }))
         except Exception as e:
             logger.error(f"Enhanced Admin WS send_room_status error: {e}")
@@ -506,7 +500,8 @@ class EnhancedAdminChatConsumer(AsyncWebsocketConsumer):
     def get_active_rooms(self):
         """Get list of active chat rooms"""
         try:
-            rooms = ChatRoom.objects.filter(status__in=['active', 'waiting']).order_by('-last_message_at')
+            rooms = list(ChatRoom.objects.filter(status__in=['active', 'waiting']).select_related('user').order_by('-last_message_at'))
+            online = presence.get_presence().live_rooms([room.id for room in rooms])
             return [
                 {
                     'id': str(room.id),
@@ -514,8 +509,9 @@ class EnhancedAdminChatConsumer(AsyncWebsocketConsumer):
                     'customer_email': room.customer_email,
                     'status': room.status,
                     'last_message_at': room.last_message_at.isoformat(),
-                    'unread_count': room.get_unread_count(),
-                    'is_online': str(room.id) in active_connections['customers']
+                    'unread_count': room.unread_by_admin,
+                    'last_message_preview': room.last_message_preview,
+                    'is_online': str(room.id) in online
                 }
                 for room in rooms
             ]
@@ -545,7 +541,7 @@ class EnhancedAdminChatConsumer(AsyncWebsocketConsumer):
             room.save()
             
             # Mark all customer messages as read
-            room.messages.filter(sender_type='customer', is_read=False).update(is_read=True)
+            room.mark_read_by_admin()
             
             # Return message data
             return {
@@ -0,0 +1,177 @@
+"""
+One heartbeat scheduler per event loop, shared by every WebSocket consumer.
+
+Consumers mix in ``HeartbeatMixin`` and call ``start_heartbeat()`` once
+accepted, instead of each running its own sleep-and-send task. The
+scheduler is a timer wheel of ``HEARTBEAT_INTERVAL / HEARTBEAT_TICK``
+slots, driven by a single loop timer. A socket joins the slot that comes
+round again one interval after it connected, so heartbeats are spread
+evenly over the interval. On each tick one slot is processed:
+- the heartbeat frame is encoded once and sent to every socket in the slot;
+- the presence leases due a refresh are touched in one thread hop.
+
+The same pass closes peers that are gone:
+- idle: nothing received for ``HEARTBEAT_IDLE_TIMEOUT`` seconds (0 disables
+  the check). These are closed with code 4408 and live clients reconnect.
+- dead: the heartbeat send fails or takes longer than
+  ``HEARTBEAT_SEND_TIMEOUT`` seconds. These are closed with code 1011.
+
+``manage.py benchmark_heartbeats`` compares this with one task per socket.
+"""
+import asyncio
+import json
+import logging
+import time
+import weakref
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import presence
+
+logger = logging.getLogger(__name__)
+
+IDLE_CLOSE_CODE = 4408
+DEAD_CLOSE_CODE = 1011
+
+
+def heartbeat_frame():
+    return json.dumps({'type': 'heartbeat', 'timestamp': timezone.now().isoformat()})
+
+
+class HeartbeatScheduler:
+    """Timer wheel for the heartbeats of every socket on one event loop"""
+
+    def __init__(self, loop, interval=30, tick=1, idle_timeout=3600, send_timeout=10):
+        self.loop = loop
+        self.tick = tick
+        self.idle_timeout = idle_timeout
+        self.send_timeout = send_timeout
+        self.slots = [set() for _ in range(max(1, round(interval / tick)))]
+        self.cursor = 0  # next slot to fire
+        self._slot_of = {}
+        self._handle = None
+        self._next_at = 0.0
+        self._beats = set()  # slot passes in flight
+        self._sending = {}  # slot pass -> (consumer, send started at)
+
+    def __len__(self):
+        return len(self._slot_of)
+
+    def register(self, consumer):
+        if consumer in self._slot_of:
+            return
+        # The slot that fired last comes round again one interval from now
+        index = (self.cursor - 1) % len(self.slots)
+        self.slots[index].add(consumer)
+        self._slot_of[consumer] = index
+        if self._handle is None:
+            self._next_at = self.loop.time() + self.tick
+            self._handle = self.loop.call_at(self._next_at, self._on_tick)
+
+    def unregister(self, consumer):
+        index = self._slot_of.pop(consumer, None)
+        if index is not None:
+            self.slots[index].discard(consumer)
+        if not self._slot_of and self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+    def _on_tick(self):
+        now = self.loop.time()
+        # Keep to the wall schedule, but don't replay ticks missed under load
+        self._next_at = max(self._next_at + self.tick, now)
+        self._handle = self.loop.call_at(self._next_at, self._on_tick)
+        # One deadline check per tick instead of a timer per send
+        for task, (_, started) in list(self._sending.items()):
+            if now - started > self.send_timeout:
+                task.cancel()
+        slot = self.slots[self.cursor]
+        self.cursor = (self.cursor + 1) % len(self.slots)
+        if slot:
+            task = self.loop.create_task(self.beat(list(slot)))
+            self._beats.add(task)
+            task.add_done_callback(self._beats.discard)
+
+    async def beat(self, consumers):
+        """Heartbeat ``consumers``, closing the idle and dead ones"""
+        text = heartbeat_frame()
+        now = time.monotonic()
+        task = asyncio.current_task()
+        leases = []
+        try:
+            for consumer in consumers:
+                if consumer not in self._slot_of:
+                    # Disconnected while this pass was running
+                    continue
+                if self.idle_timeout and now - consumer.last_seen > self.idle_timeout:
+                    await self._close(consumer, IDLE_CLOSE_CODE, "idle")
+                    continue
+                self._sending[task] = (consumer, self.loop.time())
+                try:
+                    await consumer.send(text_data=text)
+                except asyncio.CancelledError:
+                    # Stuck past HEARTBEAT_SEND_TIMEOUT; the rest of the slot skips one beat
+                    await self._close(consumer, DEAD_CLOSE_CODE, "heartbeat send timed out")
+                    raise
+                except Exception as e:
+                    await self._close(consumer, DEAD_CLOSE_CODE, f"heartbeat send failed ({e!r})")
+                    continue
+                lease = getattr(consumer, 'presence', None)
+                if lease is not None:
+                    leases.append(lease)
+        finally:
+            self._sending.pop(task, None)
+        if leases:
+            await presence.atouch_many(leases)
+
+    async def _close(self, consumer, code, reason):
+        logger.info("Closing %s WS peer: %s", type(consumer).__name__, reason)
+        self.unregister(consumer)
+        try:
+            await consumer.close(code=code)
+        except Exception as e:
+            logger.debug("Close of %s WS peer failed: %s", type(consumer).__name__, e)
+
+
+_schedulers = weakref.WeakKeyDictionary()  # event loop -> scheduler
+
+
+def get_scheduler():
+    """The scheduler of the running event loop"""
+    loop = asyncio.get_running_loop()
+    scheduler = _schedulers.get(loop)
+    if scheduler is None:
+        scheduler = _schedulers[loop] = HeartbeatScheduler(
+            loop,
+            interval=getattr(settings, "HEARTBEAT_INTERVAL", 30),
+            tick=getattr(settings, "HEARTBEAT_TICK", 1),
+            idle_timeout=getattr(settings, "HEARTBEAT_IDLE_TIMEOUT", 3600),
+            send_timeout=getattr(settings, "HEARTBEAT_SEND_TIMEOUT", 10),
+        )
+    return scheduler
+
+
+class HeartbeatMixin:
+    """Shared heartbeats for an AsyncWebsocketConsumer; also tracks ``last_seen``"""
+
+    last_seen = 0.0
+    heartbeat_scheduler = None
+
+    def start_heartbeat(self):
+        self.last_seen = time.monotonic()
+        self.heartbeat_scheduler = get_scheduler()
+        self.heartbeat_scheduler.register(self)
+
+    def stop_heartbeat(self):
+        if self.heartbeat_scheduler is not None:
+            self.heartbeat_scheduler.unregister(self)
+            self.heartbeat_scheduler = None
+
+    async def websocket_receive(self, message):
+        self.last_seen = time.monotonic()
+        await super().websocket_receive(message)
+
+    async def websocket_disconnect(self, message):
+        self.stop_heartbeat()
+        await super().websocket_disconnect(message)
@@ -1,47 +1,216 @@
-import random
-import string
-from django.db import models
+"""
+Order identifiers.
+
+Tracking ids, payment ids and order numbers come from a snowflake-style
+allocator: each value packs a millisecond timestamp, the id of the worker
+process that issued it and a per-millisecond sequence, so values are unique
+and time-ordered without asking the database whether they are taken, and an
+order is written with a single INSERT.
+
+Each process leases a worker id from ``IdWorkerLease`` on first use and
+renews it every few minutes (``ID_WORKER_ID`` pins one instead, e.g. for a
+single-process deployment). Lease queries run on a helper thread, so they
+autocommit even when the caller is inside a transaction that later rolls
+back. A process taking over an expired worker id never issues timestamps
+before the previous lease's expiry, which keeps values unique across
+restarts and moderate clock skew between hosts.
+
+Values fit in 53 bits (16 decimal digits). They are unique, not secret.
+"""
+import atexit
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connection
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+EPOCH_MS = 1735689600000  # 2025-01-01T00:00:00Z
+TIMESTAMP_BITS = 41
+WORKER_BITS = 7
+SEQUENCE_BITS = 5
+MAX_WORKERS = 1 << WORKER_BITS
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+
+LEASE_TTL = timedelta(minutes=10)
+RENEW_AFTER = timedelta(minutes=3)
+LEASE_MARGIN = 30  # seconds of the TTL never relied upon locally
+
+
+def _ms(dt):
+    return int(dt.timestamp() * 1000)
+
+
+def _in_own_connection(func, *args):
+    """Run ``func`` on a fresh thread, i.e. its own autocommit connection"""
+    def run():
+        close_old_connections()
+        try:
+            return func(*args)
+        finally:
+            connection.close()
+
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="id-lease") as pool:
+        return pool.submit(run).result()
+
+
+def _claim_lease(owner):
+    """Take a free or expired worker id; returns ``(worker_id, previous expiry)``"""
+    from .models import IdWorkerLease
+
+    now = timezone.now()
+    leases = {lease.worker_id: lease for lease in IdWorkerLease.objects.all()}
+    for worker_id in range(MAX_WORKERS):
+        lease = leases.get(worker_id)
+        if lease is None:
+            try:
+                IdWorkerLease.objects.create(worker_id=worker_id, owner=owner, expires_at=now + LEASE_TTL)
+            except IntegrityError:
+                continue
+            return worker_id, None
+        if lease.expires_at < now:
+            taken = IdWorkerLease.objects.filter(
+                worker_id=worker_id, owner=lease.owner, expires_at=lease.expires_at
+            ).update(owner=owner, expires_at=now + LEASE_TTL)
+            if taken:
+                return worker_id, lease.expires_at
+    raise RuntimeError(f"All {MAX_WORKERS} id allocator worker ids are leased")
+
+
+def _renew_lease(worker_id, owner):
+    from .models import IdWorkerLease
+
+    return IdWorkerLease.objects.filter(worker_id=worker_id, owner=owner).update(
+        expires_at=timezone.now() + LEASE_TTL
+    )
+
+
+def _release_lease(worker_id, owner, last_ms):
+    from .models import IdWorkerLease
+
+    # Expire now, but never before the last timestamp issued under this lease
+    expires_at = max(timezone.now(), datetime.fromtimestamp((last_ms + 1) / 1000, tz=dt_timezone.utc))
+    IdWorkerLease.objects.filter(worker_id=worker_id, owner=owner).update(expires_at=expires_at)
+
+
+class IdAllocator:
+    """Per-process snowflake generator; thread-safe"""
+
+    def __init__(self):
+        self._reset()
+
+    def _reset(self):
+        # Also runs in forked children, which must not share the parent's worker id
+        self._lock = threading.Lock()
+        self._owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._worker_id = None
+        self._renew_at = 0.0
+        self._deadline = 0.0
+        self._last_ms = -1
+        self._sequence = 0
+
+    def _ensure_worker(self):
+        pinned = getattr(settings, "ID_WORKER_ID", None)
+        if pinned is not None:
+            if not 0 <= int(pinned) < MAX_WORKERS:
+                raise ValueError(f"ID_WORKER_ID must be between 0 and {MAX_WORKERS - 1}")
+            self._worker_id = int(pinned)
+            return
+
+        now = time.monotonic()
+        if self._worker_id is not None and now < self._renew_at:
+            return
+        if self._worker_id is not None and now < self._deadline:
+            if _in_own_connection(_renew_lease, self._worker_id, self._owner):
+                self._renew_at = now + RENEW_AFTER.total_seconds()
+                self._deadline = now + LEASE_TTL.total_seconds() - LEASE_MARGIN
+                return
+            logger.warning(f"Id allocator lost worker id {self._worker_id}; claiming a new one")
+        elif self._worker_id is not None:
+            logger.warning(f"Id allocator lease on worker id {self._worker_id} expired; claiming a new one")
+
+        worker_id, previous_expiry = _in_own_connection(_claim_lease, self._owner)
+        self._worker_id = worker_id
+        if previous_expiry is not None:
+            self._last_ms = max(self._last_ms, _ms(previous_expiry))
+        self._renew_at = now + RENEW_AFTER.total_seconds()
+        self._deadline = now + LEASE_TTL.total_seconds() - LEASE_MARGIN
+        logger.info(f"Id allocator leased worker id {worker_id} ({self._owner})")
+
+    def next_id(self):
+        with self._lock:
+            self._ensure_worker()
+            # Never step backwards, even if the wall clock does
+            now = max(time.time_ns() // 1_000_000, self._last_ms)
+            if now == self._last_ms:
+                self._sequence = (self._sequence + 1) & MAX_SEQUENCE
+                if self._sequence == 0:
+                    # Sequence exhausted for this millisecond; borrow the next one
+                    now += 1
+            else:
+                self._sequence = 0
+            self._last_ms = now
+            elapsed = now - EPOCH_MS
+            if elapsed >= 1 << TIMESTAMP_BITS:
+                raise OverflowError("Id allocator timestamp space exhausted")
+            return (elapsed << (WORKER_BITS + SEQUENCE_BITS)) | (self._worker_id << SEQUENCE_BITS) | self._sequence
+
+    def release(self):
+        """Give the worker id back early (at interpreter exit)"""
+        with self._lock:
+            if self._worker_id is None or getattr(settings, "ID_WORKER_ID", None) is not None:
+                return
+            try:
+                _release_lease(self._worker_id, self._owner, self._last_ms)
+            except Exception as e:
+                logger.debug(f"Could not release id allocator worker id {self._worker_id}: {e}")
+            self._worker_id = None
+
+
+_allocator = IdAllocator()
+os.register_at_fork(after_in_child=_allocator._reset)
+atexit.register(_allocator.release)
+
+
+def next_id():
+    """A new unique, time-ordered 53-bit integer"""
+    return _allocator.next_id()
+
+
+def id_datetime(value):
+    """UTC time at which ``value`` was issued"""
+    ms = (value >> (WORKER_BITS + SEQUENCE_BITS)) + EPOCH_MS
+    return datetime.fromtimestamp(ms / 1000, tz=dt_timezone.utc)
 
 
 def generate_tracking_id():
     """
     Generate a tracking ID in the format: sppix_ + 16 digits
-    Example: sppix_1234567890123456
+    Example: sppix_0231453746307073
     """
-    # Generate 16 random digits
-    digits = ''.join(random.choices(string.digits, k=16))
-    return f"sppix_{digits}"
+    return f"sppix_{next_id():016d}"
 
 
 def generate_payment_id():
     """
     Generate a payment ID in the format: sppix_py_ + 16 digits
-    Example: sppix_py_1234567890123456
-    """
-    # Generate 16 random digits
-    digits = ''.join(random.choices(string.digits, k=16))
-    return f"sppix_py_{digits}"
-
-
-def generate_unique_tracking_id():
-    """
-    Generate a unique tracking ID that doesn't already exist in the database
+    Example: sppix_py_0231453746380800
     """
-    from .models import Order
-    
-    while True:
-        tracking_id = generate_tracking_id()
-        if not Order.objects.filter(tracking_id=tracking_id).exists():
-            return tracking_id
+    return f"sppix_py_{next_id():016d}"
 
 
-def generate_unique_payment_id():
+def generate_order_number():
     """
-    Generate a unique payment ID that doesn't already exist in the database
+    Generate an order number in the format: ORD- + issue date + 16 digits
+    Example: ORD-20261017-0231453746307072
     """
-    from .models import Order
-    
-    while True:
-        payment_id = generate_payment_id()
-        if not Order.objects.filter(payment_id=payment_id).exists():
-            return payment_id
+    value = next_id()
+    return f"ORD-{id_datetime(value):%Y%m%d}-{value:016d}"
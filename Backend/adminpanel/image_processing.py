@@ -0,0 +1,65 @@
+"""
+Pillow-only image derivative rendering.
+
+Kept free of Django imports so it can run in worker processes of the
+pool in ``image_variants`` without setting Django up there.
+"""
+from io import BytesIO
+
+from PIL import Image, ImageOps
+
+# Target widths; images narrower than a size are not upscaled
+VARIANT_SIZES = {
+    "thumb": 240,
+    "card": 600,
+    "detail": 1400,
+}
+
+FORMATS = {
+    "webp": {"format": "WEBP", "quality": 80, "method": 4},
+    "jpeg": {"format": "JPEG", "quality": 82, "optimize": True, "progressive": True},
+}
+
+
+def _flatten(img):
+    """RGB copy for JPEG, compositing any transparency onto white"""
+    if img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info):
+        rgba = img.convert("RGBA")
+        background = Image.new("RGB", rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.getchannel("A"))
+        return background
+    return img.convert("RGB")
+
+
+def render_variants(data):
+    """
+    Render every size/format derivative of the encoded image ``data``.
+
+    Returns ``{"width", "height", "variants": {size: {"width", "height",
+    "files": {fmt: bytes}}}}``. Orientation from EXIF is applied and no
+    metadata (EXIF, ICC, comments) is written to the derivatives.
+    """
+    with Image.open(BytesIO(data)) as source:
+        source.load()
+        img = ImageOps.exif_transpose(source)
+    width, height = img.size
+    has_alpha = img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info)
+    base = img.convert("RGBA" if has_alpha else "RGB")
+
+    variants = {}
+    for name, target in VARIANT_SIZES.items():
+        if width > target:
+            size = (target, max(1, round(height * target / width)))
+            resized = base.resize(size, Image.LANCZOS)
+        else:
+            resized = base.copy()
+        resized.info = {}
+
+        files = {}
+        for fmt, options in FORMATS.items():
+            out = BytesIO()
+            (resized if fmt == "webp" else _flatten(resized)).save(out, **options)
+            files[fmt] = out.getvalue()
+        variants[name] = {"width": resized.width, "height": resized.height, "files": files}
+
+    return {"width": width, "height": height, "variants": variants}
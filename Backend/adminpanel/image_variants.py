@@ -0,0 +1,278 @@
+"""
+Resized WebP/JPEG derivatives of uploaded product, service, brand and
+category images.
+
+Saving a row whose image has no derivatives yet schedules a job after the
+transaction commits. Jobs run on a small thread pool that hands the Pillow
+work (``image_processing.render_variants``) to a process pool, so neither
+the request nor the event loop waits on image encoding. Results are written
+with a queryset ``update()`` guarded on the image name, so a job that
+finishes after the image was replaced changes nothing.
+
+Variants of content-addressed images (see content_storage) are named after
+the blob, so rows sharing a blob share its variants; those files are
+removed by blob garbage collection rather than with the row.
+
+``IMAGE_VARIANT_WORKERS`` sets the pool size; 0 renders inline on commit.
+``generate_image_variants`` backfills existing rows.
+"""
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+
+from .cache_utils import invalidate_tags
+from .content_storage import is_blob_name
+from .image_processing import FORMATS, VARIANT_SIZES, render_variants
+from .models import Brand, Category, ProductImage, ServiceImage
+from .realtime_broadcast import rows_changed
+
+logger = logging.getLogger(__name__)
+
+# model -> (image field, width field, height field, variants field)
+VARIANT_FIELDS = {
+    ProductImage: ("image", "width", "height", "variants"),
+    ServiceImage: ("image", "width", "height", "variants"),
+    Brand: ("image", "image_width", "image_height", "image_variants"),
+    Category: ("image", "image_width", "image_height", "image_variants"),
+}
+
+EXTENSIONS = {"webp": "webp", "jpeg": "jpg"}
+
+_lock = threading.Lock()
+_processes = None
+_threads = None
+
+
+def _workers():
+    return getattr(settings, "IMAGE_VARIANT_WORKERS", 2)
+
+
+def _pools():
+    global _processes, _threads
+    with _lock:
+        if _processes is None:
+            # spawn: forking a threaded server process is unsafe
+            _processes = ProcessPoolExecutor(
+                max_workers=_workers(), mp_context=multiprocessing.get_context("spawn")
+            )
+            _threads = ThreadPoolExecutor(max_workers=_workers(), thread_name_prefix="image-variants")
+        return _processes, _threads
+
+
+def _cache_tags(instance):
+    if isinstance(instance, ProductImage):
+        return ("products", f"products:{instance.product_id}")
+    if isinstance(instance, ServiceImage):
+        return ("services", f"services:{instance.service_id}")
+    if isinstance(instance, Brand):
+        return ("brands", f"brands:{instance.pk}", "products")
+    return ("categories", f"categories:{instance.pk}", "products")
+
+
+def _changed_row(instance):
+    """``(resource, pk)`` of the catalogue row that serializes ``instance``'s variants"""
+    if isinstance(instance, ProductImage):
+        return "products", instance.product_id
+    if isinstance(instance, ServiceImage):
+        return "services", instance.service_id
+    return ("brands" if isinstance(instance, Brand) else "categories"), instance.pk
+
+
+def variant_name(source_name, size, fmt):
+    """Storage name of one derivative, next to the original under variants/"""
+    folder, filename = os.path.split(source_name)
+    stem = os.path.splitext(filename)[0]
+    return f"{folder}/variants/{stem}_{size}.{EXTENSIONS[fmt]}".lstrip("/")
+
+
+def needs_variants(instance):
+    image_field, _, _, variants_field = VARIANT_FIELDS[type(instance)]
+    name = getattr(instance, image_field).name
+    return bool(name) and getattr(instance, variants_field).get("source") != name
+
+
+def variant_files(variants):
+    """Every derivative storage name recorded in a ``variants`` value"""
+    return [
+        name
+        for size in (variants or {}).get("sizes", {}).values()
+        for fmt, name in size.items()
+        if fmt in FORMATS
+    ]
+
+
+def _variant_storage(file):
+    # Derived names must be kept as-is, so never hash them into blobs
+    return default_storage if getattr(file.storage, "content_addressed", False) else file.storage
+
+
+def store_variants(instance, rendered, force=False):
+    """Write rendered derivatives to storage and record them on the row"""
+    model = type(instance)
+    image_field, width_field, height_field, variants_field = VARIANT_FIELDS[model]
+    file = getattr(instance, image_field)
+    storage = _variant_storage(file)
+    shared = is_blob_name(file.name)
+    previous = variant_files(getattr(instance, variants_field))
+
+    sizes = {}
+    for size, variant in rendered["variants"].items():
+        entry = {"width": variant["width"], "height": variant["height"]}
+        for fmt, data in variant["files"].items():
+            name = variant_name(file.name, size, fmt)
+            if storage.exists(name):
+                if shared and not force:
+                    # Already rendered for another row with the same blob
+                    entry[fmt] = name
+                    continue
+                storage.delete(name)
+            entry[fmt] = storage.save(name, ContentFile(data))
+        sizes[size] = entry
+    variants = {"source": file.name, "sizes": sizes}
+
+    updated = model.objects.filter(pk=instance.pk, **{image_field: file.name}).update(**{
+        width_field: rendered["width"],
+        height_field: rendered["height"],
+        variants_field: variants,
+    })
+    written = variant_files(variants)
+    if not updated:
+        # Image replaced or row deleted while rendering
+        if not shared:
+            _delete_files(storage, written)
+        return False
+    _delete_files(storage, [name for name in previous if name not in written and not _blob_variant(name)])
+    setattr(instance, width_field, rendered["width"])
+    setattr(instance, height_field, rendered["height"])
+    setattr(instance, variants_field, variants)
+    invalidate_tags(*_cache_tags(instance))
+    # update() fires no signals
+    resource, pk = _changed_row(instance)
+    rows_changed(resource, "updated", [pk])
+    return True
+
+
+def read_source(instance):
+    image_field = VARIANT_FIELDS[type(instance)][0]
+    with getattr(instance, image_field).open("rb") as f:
+        return f.read()
+
+
+def _shared_variants(instance):
+    """Variants already rendered for another row using the same blob, if any"""
+    name = getattr(instance, VARIANT_FIELDS[type(instance)][0]).name
+    if not is_blob_name(name):
+        return None
+    for model, (image_field, width_field, height_field, variants_field) in VARIANT_FIELDS.items():
+        row = (
+            model.objects.filter(**{image_field: name, f"{variants_field}__source": name})
+            .values(width_field, height_field, variants_field).first()
+        )
+        if row:
+            return row[width_field], row[height_field], row[variants_field]
+    return None
+
+
+def generate_variants(instance, render=render_variants):
+    """Render and store derivatives for one row; returns True if stored"""
+    try:
+        shared = _shared_variants(instance)
+        if shared is not None:
+            model = type(instance)
+            image_field, width_field, height_field, variants_field = VARIANT_FIELDS[model]
+            width, height, variants = shared
+            updated = model.objects.filter(
+                pk=instance.pk, **{image_field: variants["source"]}
+            ).update(**{width_field: width, height_field: height, variants_field: variants})
+            if updated:
+                invalidate_tags(*_cache_tags(instance))
+            return bool(updated)
+        return store_variants(instance, render(read_source(instance)))
+    except Exception as e:
+        logger.error(f"Failed to generate image variants for {type(instance).__name__} {instance.pk}: {e}")
+        return False
+
+
+def _run_job(model, pk):
+    close_old_connections()
+    try:
+        instance = model.objects.filter(pk=pk).first()
+        if instance is not None and needs_variants(instance):
+            processes, _ = _pools()
+            generate_variants(instance, render=lambda data: processes.submit(render_variants, data).result())
+    finally:
+        close_old_connections()
+
+
+def schedule_variants(instance):
+    """Generate derivatives for ``instance`` after the current transaction commits"""
+    if not needs_variants(instance):
+        return
+    model, pk = type(instance), instance.pk
+
+    def submit():
+        if _workers() <= 0:
+            instance = model.objects.filter(pk=pk).first()
+            if instance is not None and needs_variants(instance):
+                generate_variants(instance)
+            return
+        _, threads = _pools()
+        threads.submit(_run_job, model, pk)
+
+    transaction.on_commit(submit)
+
+
+def discard_variants(instance):
+    """Delete the derivative files of a deleted row after commit"""
+    image_field, _, _, variants_field = VARIANT_FIELDS[type(instance)]
+    file = getattr(instance, image_field)
+    # The instance may predate its variants, so include the derived names too
+    names = set(variant_files(getattr(instance, variants_field)))
+    if file.name:
+        names.update(variant_name(file.name, size, fmt) for size in VARIANT_SIZES for fmt in FORMATS)
+    names = {name for name in names if not _blob_variant(name)}
+    if names:
+        storage = _variant_storage(file)
+        transaction.on_commit(lambda: _delete_files(storage, sorted(names)))
+
+
+def discard_blob_variants(blob):
+    """Delete the variants of a garbage-collected blob"""
+    _delete_files(default_storage, [
+        variant_name(blob, size, fmt) for size in VARIANT_SIZES for fmt in FORMATS
+    ])
+
+
+def _blob_variant(name):
+    folder, filename = os.path.split(name)
+    if os.path.basename(folder) != "variants":
+        return False
+    stem = os.path.splitext(filename)[0].rsplit("_", 1)[0]
+    return is_blob_name(f"{os.path.dirname(folder)}/{stem}")
+
+
+def _delete_files(storage, names):
+    for name in names:
+        try:
+            if storage.exists(name):
+                storage.delete(name)
+        except Exception as e:
+            logger.warning(f"Could not delete image variant {name}: {e}")
+
+
+def build_srcset(variants, fmt, url):
+    """``srcset`` string for one format; ``url`` maps a storage name to a URL"""
+    seen, parts = set(), []
+    sizes = sorted((variants or {}).get("sizes", {}).values(), key=lambda v: v["width"])
+    for size in sizes:
+        if fmt in size and size["width"] not in seen:
+            seen.add(size["width"])
+            parts.append(f"{url(size[fmt])} {size['width']}w")
+    return ", ".join(parts)
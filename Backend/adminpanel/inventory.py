@@ -0,0 +1,130 @@
+"""
+Stock reservation for checkout.
+
+All products in a cart are locked with a single ``SELECT ... FOR UPDATE``
+in ascending id order, so concurrent checkouts always acquire row locks in
+the same order and cannot deadlock on each other. Stock is checked in
+memory and decremented with one conditional UPDATE that only matches rows
+still holding enough stock, which also guards against oversells on
+databases that ignore ``FOR UPDATE``.
+"""
+import logging
+from collections import OrderedDict
+
+from django.db import transaction
+from django.db.models import Case, F, Q, When
+
+from .cache_utils import invalidate_tags_on_commit
+from .realtime_broadcast import rows_changed
+
+logger = logging.getLogger(__name__)
+
+
+class InsufficientInventory(Exception):
+    """Raised when a cart cannot be reserved; ``errors`` lists the offending items"""
+
+    def __init__(self, errors):
+        super().__init__("Insufficient inventory")
+        self.errors = errors
+
+
+def invalid_cart_items(cart_items):
+    """Errors for cart lines without a product id or a positive whole quantity"""
+    errors = []
+    for item in cart_items:
+        try:
+            int(item.get('product_id'))
+            quantity = int(item.get('quantity'))
+        except (TypeError, ValueError):
+            quantity = None
+        if quantity is None or quantity <= 0:
+            errors.append({
+                'product_id': item.get('product_id'),
+                'quantity': item.get('quantity'),
+                'error': 'Quantity must be a positive whole number'
+            })
+    return errors
+
+
+def cart_quantities(cart_items):
+    """
+    Total requested quantity per product id, in ascending id order.
+    Items without a product or with a non-positive quantity are ignored.
+    """
+    quantities = {}
+    for item in cart_items:
+        try:
+            product_id = int(item.get('product_id'))
+            quantity = int(item.get('quantity', 0))
+        except (TypeError, ValueError):
+            continue
+        if quantity <= 0:
+            continue
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+    return OrderedDict(sorted(quantities.items()))
+
+
+def reserve_inventory(cart_items):
+    """
+    Lock, check and decrement stock for every product in the cart.
+    Must run inside ``transaction.atomic()``. Returns ``{product_id: Product}``
+    for the locked products; raises InsufficientInventory without touching
+    stock if any item cannot be fulfilled.
+    """
+    from .models import Product
+
+    quantities = cart_quantities(cart_items)
+    if not quantities:
+        return {}
+
+    # One locking read, in primary key order
+    products = {
+        product.id: product
+        for product in Product.objects.select_for_update().filter(id__in=list(quantities)).order_by('id')
+    }
+
+    errors = []
+    for product_id, quantity in quantities.items():
+        product = products.get(product_id)
+        if product is None:
+            errors.append({
+                'product_id': product_id,
+                'product_name': 'Unknown Product',
+                'error': 'Product not found'
+            })
+        elif product.stock < quantity:
+            errors.append({
+                'product_id': product_id,
+                'product_name': product.name,
+                'requested': quantity,
+                'available': product.stock
+            })
+    if errors:
+        raise InsufficientInventory(errors)
+
+    # One conditional UPDATE for the whole cart
+    enough_stock = Q()
+    for product_id, quantity in quantities.items():
+        enough_stock |= Q(id=product_id, stock__gte=quantity)
+    updated = Product.objects.filter(enough_stock).update(
+        stock=Case(
+            *[When(id=product_id, then=F('stock') - quantity) for product_id, quantity in quantities.items()],
+            default=F('stock'),
+            output_field=Product._meta.get_field('stock'),
+        )
+    )
+    if updated != len(quantities):
+        # Only reachable if stock changed without holding the row lock
+        logger.warning(f"Stock changed during reservation: updated {updated} of {len(quantities)} products")
+        raise InsufficientInventory([{'error': 'Stock changed during checkout, please try again'}])
+
+    for product_id, quantity in quantities.items():
+        products[product_id].stock -= quantity
+    # update() bypasses the post_save handlers that normally drop cached product data,
+    # log the change for delta sync and broadcast it. The change log is written after
+    # commit: bumping it here would hold the products version row locked for the rest
+    # of the checkout, Stripe call included, and serialize every checkout and product save.
+    invalidate_tags_on_commit("products", *[f"products:{product_id}" for product_id in quantities])
+    product_ids = list(quantities)
+    transaction.on_commit(lambda: rows_changed("products", "updated", product_ids))
+    return products
@@ -0,0 +1,63 @@
+"""
+Short-lived cache of the users behind JWT access tokens.
+
+DRF's JWTAuthentication and the WebSocket JWT middleware both used to load
+the user row on every request or connect. They now go through
+``get_token_user``. It caches the user under the token's user id and
+``jti`` for ``AUTH_USER_CACHE_TTL`` seconds (default 60), so a steady
+stream of requests with the same token costs cache lookups and no
+auth_user query.
+
+Entries carry the ``users:<id>`` cache tag. Saving or deleting a user
+(including ``AdminUserViewSet.suspend``) bumps that tag on commit, so the
+next request reloads the row. The bump only reaches the workers that share
+the cache: with a shared default cache (``SHARED_CACHE_URL``) an inactive
+user is rejected everywhere on the next request, but with the per-process
+LocMem default only the worker that saved the user sees the bump, and the
+others keep accepting the token for up to ``AUTH_USER_CACHE_TTL``. The TTL
+is also the bound for changes that bypass signals, such as
+``QuerySet.update``.
+"""
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+from .cache_utils import invalidate_tags_on_commit, tagged_cache_key
+
+logger = logging.getLogger(__name__)
+
+
+def user_cache_tag(user_id):
+    return f"users:{user_id}"
+
+
+def get_token_user(validated_token, load):
+    """The user ``validated_token`` belongs to; ``load(validated_token)`` on a miss"""
+    user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+    jti = validated_token.get(api_settings.JTI_CLAIM)
+    if user_id is None or jti is None:
+        return load(validated_token)
+
+    # Keyed before loading: a save committed meanwhile bumps the tag past this key
+    key = tagged_cache_key(f"jwt_user:{user_id}:{jti}", [user_cache_tag(user_id)])
+    user = cache.get(key)
+    if user is None:
+        user = load(validated_token)
+        cache.set(key, user, getattr(settings, "AUTH_USER_CACHE_TTL", 60))
+        logger.debug(f"Cached user {user_id} for token {jti}")
+    return user
+
+
+def invalidate_token_user(user_id):
+    """Forget the cached user for every token of ``user_id`` (on commit), in every worker sharing the cache"""
+    invalidate_tags_on_commit(user_cache_tag(user_id))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that reads the user through ``get_token_user``"""
+
+    def get_user(self, validated_token):
+        return get_token_user(validated_token, super().get_user)
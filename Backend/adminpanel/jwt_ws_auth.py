@@ -2,9 +2,10 @@ from urllib.parse import parse_qs
 from channels.middleware import BaseMiddleware
 from django.contrib.auth.models import AnonymousUser
 from asgiref.sync import sync_to_async
-from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework_simplejwt.exceptions import InvalidToken, AuthenticationFailed
 
+from .jwt_user_cache import CachedJWTAuthentication
+
 def _clean_raw_token(raw: str | None) -> str | None:
     if not raw:
         return None
@@ -30,7 +31,7 @@ class JWTAuthMiddleware(BaseMiddleware):
 
         if raw:
             try:
-                jwt_auth = JWTAuthentication()
+                jwt_auth = CachedJWTAuthentication()
                 validated = jwt_auth.get_validated_token(raw)
                 # Enforce access token only
                 token_type = getattr(validated, "token_type", None) or validated.get("token_type", None)
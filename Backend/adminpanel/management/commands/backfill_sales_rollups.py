@@ -0,0 +1,23 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from adminpanel.sales_rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuild the daily sales/registration rollups behind the admin dashboard from orders and users"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=None,
+                            help="Only rebuild the last N days (default: the whole history)")
+
+    def handle(self, *args, **opts):
+        since = None
+        if opts["days"] is not None:
+            since = timezone.localdate() - timedelta(days=opts["days"])
+        sales_days, registration_days = rebuild_rollups(since)
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt sales rollups for {sales_days} day(s) and registrations for {registration_days} day(s)"
+        ))
@@ -0,0 +1,166 @@
+"""
+Measure channel-layer fan-out latency across several worker processes.
+
+Each worker process opens its own pub/sub channel layer connection and
+registers its share of simulated sockets: admin sockets join the
+``admin_realtime`` group (as AdminRealtimeConsumer does) and every customer
+socket joins its own ``chat_<room>`` group. The parent then broadcasts to
+the admin group and sends one message to every customer room per round,
+and each socket records how long its message took to arrive.
+
+    python manage.py benchmark_channel_fanout --workers 4 --admins 1000 --customers 1000
+    python manage.py benchmark_channel_fanout --workers 4 --admins 10000 --customers 10000
+
+Without --redis-url an in-process PubSubBroker is started, so the benchmark
+runs without a Redis server.
+"""
+import asyncio
+import multiprocessing
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from adminpanel.pubsub_broker import PubSubBroker
+
+ADMIN_GROUP = "admin_realtime"
+
+
+def _split(total, parts, index):
+    """Size of the ``index``-th of ``parts`` near-equal shares of ``total``"""
+    return total // parts + (1 if index < total % parts else 0)
+
+
+def _worker(url, admins, rooms, rounds, ready, results, timeout):
+    """Worker process: register sockets, then record per-message delivery latency"""
+    from channels_redis.pubsub import RedisPubSubChannelLayer
+
+    async def run():
+        layer = RedisPubSubChannelLayer(hosts=[url])
+        sockets = []
+        for _ in range(admins):
+            channel = await layer.new_channel()
+            await layer.group_add(ADMIN_GROUP, channel)
+            sockets.append(("admin", channel))
+        for room in rooms:
+            channel = await layer.new_channel()
+            await layer.group_add(f"chat_{room}", channel)
+            sockets.append(("customer", channel))
+        ready.put(len(sockets))
+
+        latencies = {"admin": [], "customer": []}
+
+        async def consume(kind, channel):
+            for _ in range(rounds):
+                message = await layer.receive(channel)
+                latencies[kind].append(time.time() - message["sent_at"])
+
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(consume(kind, channel) for kind, channel in sockets)),
+                timeout,
+            )
+        except asyncio.TimeoutError:
+            pass
+        results.put(latencies)
+        await layer.flush()
+
+    asyncio.run(run())
+
+
+class Command(BaseCommand):
+    help = "Benchmark channel-layer fan-out latency to many admin/customer sockets across worker processes"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4)
+        parser.add_argument("--admins", type=int, default=1000, help="Admin sockets in total")
+        parser.add_argument("--customers", type=int, default=1000, help="Customer sockets (one chat room each) in total")
+        parser.add_argument("--rounds", type=int, default=10, help="Messages delivered to every socket")
+        parser.add_argument("--interval", type=float, default=0.2, help="Seconds between rounds")
+        parser.add_argument("--timeout", type=float, default=120.0)
+        parser.add_argument("--redis-url", default=None, help="Use an existing Redis (or broker) instead of an in-process broker")
+
+    def handle(self, *args, **opts):
+        try:
+            from channels_redis.pubsub import RedisPubSubChannelLayer
+        except ImportError:
+            raise CommandError("channels-redis is required: pip install -r requirements.txt")
+
+        workers = opts["workers"]
+        if workers < 1:
+            raise CommandError("--workers must be at least 1")
+
+        broker = None
+        url = opts["redis_url"]
+        if not url:
+            broker = PubSubBroker()
+            url = broker.start_in_thread()
+            self.stdout.write(f"Started in-process broker at {url}")
+
+        ctx = multiprocessing.get_context("spawn")
+        ready, results = ctx.Queue(), ctx.Queue()
+        rooms = list(range(opts["customers"]))
+        processes = []
+        offset = 0
+        for i in range(workers):
+            count = _split(opts["customers"], workers, i)
+            process = ctx.Process(
+                target=_worker,
+                args=(url, _split(opts["admins"], workers, i), rooms[offset:offset + count],
+                      opts["rounds"], ready, results, opts["timeout"]),
+                daemon=True,
+            )
+            offset += count
+            process.start()
+            processes.append(process)
+
+        try:
+            sockets = sum(ready.get(timeout=opts["timeout"]) for _ in processes)
+            self.stdout.write(f"{sockets} sockets registered across {workers} workers")
+            elapsed = asyncio.run(self._publish(RedisPubSubChannelLayer(hosts=[url]), rooms, opts))
+            latencies = {"admin": [], "customer": []}
+            for _ in processes:
+                for kind, values in results.get(timeout=opts["timeout"]).items():
+                    latencies[kind].extend(values)
+        finally:
+            for process in processes:
+                process.join(timeout=5)
+                if process.is_alive():
+                    process.terminate()
+            if broker is not None:
+                broker.stop_thread()
+
+        self.stdout.write(f"Published {opts['rounds']} rounds in {elapsed:.2f}s")
+        self._report("admin", latencies["admin"], opts["admins"] * opts["rounds"])
+        self._report("customer", latencies["customer"], opts["customers"] * opts["rounds"])
+
+    async def _publish(self, layer, rooms, opts):
+        # Let the workers' subscriptions settle before the first round
+        await asyncio.sleep(0.5)
+        start = time.time()
+        for _ in range(opts["rounds"]):
+            await layer.group_send(ADMIN_GROUP, {"type": "data_update", "sent_at": time.time()})
+            for room in rooms:
+                await layer.group_send(f"chat_{room}", {"type": "chat_message", "sent_at": time.time()})
+            await asyncio.sleep(opts["interval"])
+        elapsed = time.time() - start
+        await layer.flush()
+        return elapsed
+
+    def _report(self, kind, latencies, expected):
+        if not expected:
+            return
+        if not latencies:
+            self.stdout.write(self.style.ERROR(f"{kind}: 0/{expected} messages delivered"))
+            return
+        ordered = sorted(latencies)
+
+        def pct(p):
+            return ordered[min(len(ordered) - 1, int(len(ordered) * p))] * 1000
+
+        style = self.style.SUCCESS if len(ordered) == expected else self.style.WARNING
+        self.stdout.write(style(
+            f"{kind}: {len(ordered)}/{expected} delivered  "
+            f"p50={pct(0.50):.1f}ms  p95={pct(0.95):.1f}ms  p99={pct(0.99):.1f}ms  "
+            f"max={ordered[-1] * 1000:.1f}ms  mean={statistics.mean(ordered) * 1000:.1f}ms"
+        ))
@@ -0,0 +1,147 @@
+"""
+Measure event-loop cost of WebSocket heartbeats for many idle sockets.
+
+Runs the same population of idle consumers twice on a fresh event loop:
+- ``tasks``: one sleep-and-send heartbeat task per socket, as the consumers
+  used to;
+- ``wheel``: the shared HeartbeatScheduler.
+
+Sockets connect at a steady rate over one interval (heartbeats are
+staggered as in production). The command then reports the process CPU
+time, event-loop lag and heartbeats sent over ``--duration`` seconds.
+Sends go to an in-memory sink, so only the scheduling and serialization
+cost is measured.
+
+    python manage.py benchmark_heartbeats --sockets 10000
+    python manage.py benchmark_heartbeats --sockets 10000 --interval 30 --duration 60
+    python manage.py benchmark_heartbeats --sockets 10000 --dead 100
+"""
+import asyncio
+import json
+import time
+
+from channels.generic.websocket import AsyncWebsocketConsumer
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from adminpanel.heartbeat import HeartbeatMixin, HeartbeatScheduler
+
+
+class IdleSocket(HeartbeatMixin, AsyncWebsocketConsumer):
+    """A connected consumer whose client never sends anything"""
+
+    def __init__(self, stats, dead=False):
+        super().__init__()
+        self.stats = stats
+        self.dead = dead
+        self.base_send = self._sink
+
+    async def _sink(self, message):
+        if message["type"] == "websocket.close":
+            self.stats["closed"] += 1
+        elif self.dead:
+            raise ConnectionResetError("peer gone")
+        else:
+            self.stats["sent"] += 1
+
+
+async def _task_heartbeat(socket, interval):
+    """The per-socket heartbeat the consumers used to run"""
+    try:
+        while True:
+            await asyncio.sleep(interval)
+            await socket.send(text_data=json.dumps({
+                'type': 'heartbeat',
+                'timestamp': timezone.now().isoformat()
+            }))
+    except asyncio.CancelledError:
+        pass
+    except Exception:
+        socket.stats["closed"] += 1
+
+
+async def _probe_lag(lags, period=0.05):
+    """Record how late the loop runs a callback scheduled every ``period``"""
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + period
+        await asyncio.sleep(period)
+        lags.append(loop.time() - expected)
+
+
+async def _run(mode, opts):
+    loop = asyncio.get_running_loop()
+    interval = opts["interval"]
+    stats = {"sent": 0, "closed": 0}
+    scheduler = HeartbeatScheduler(loop, interval=interval, tick=interval / 30, idle_timeout=0, send_timeout=5)
+    tasks = []
+    sockets = [IdleSocket(stats, dead=i < opts["dead"]) for i in range(opts["sockets"])]
+
+    # Connect at a steady rate over one interval
+    steps = 100
+    per_step = -(-len(sockets) // steps)
+    for start in range(0, len(sockets), per_step):
+        for socket in sockets[start:start + per_step]:
+            if mode == "tasks":
+                tasks.append(loop.create_task(_task_heartbeat(socket, interval)))
+            else:
+                socket.last_seen = time.monotonic()
+                scheduler.register(socket)
+        await asyncio.sleep(interval / steps)
+
+    lags = []
+    probe = loop.create_task(_probe_lag(lags))
+    stats["sent"] = 0
+    cpu, wall = time.process_time(), time.perf_counter()
+    await asyncio.sleep(opts["duration"])
+    cpu, wall = time.process_time() - cpu, time.perf_counter() - wall
+    probe.cancel()
+
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    for socket in sockets:
+        scheduler.unregister(socket)
+    return {"cpu": cpu, "wall": wall, "lags": sorted(lags), **stats}
+
+
+class Command(BaseCommand):
+    help = "Benchmark event-loop CPU of per-socket heartbeat tasks against the shared heartbeat scheduler"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sockets", type=int, default=10000)
+        parser.add_argument("--interval", type=float, default=5.0, help="Seconds between heartbeats of a socket")
+        parser.add_argument("--duration", type=float, default=15.0, help="Seconds measured per mode")
+        parser.add_argument("--dead", type=int, default=0, help="Sockets whose sends fail")
+        parser.add_argument("--mode", choices=["both", "tasks", "wheel"], default="both")
+
+    def handle(self, *args, **opts):
+        if opts["sockets"] < 1 or opts["interval"] <= 0 or opts["duration"] <= 0:
+            raise CommandError("--sockets, --interval and --duration must be positive")
+
+        modes = ["tasks", "wheel"] if opts["mode"] == "both" else [opts["mode"]]
+        self.stdout.write(
+            f"{opts['sockets']} idle sockets, heartbeat every {opts['interval']:g}s, "
+            f"measured over {opts['duration']:g}s"
+        )
+        results = {}
+        for mode in modes:
+            results[mode] = asyncio.run(_run(mode, opts))
+            self._report(mode, results[mode])
+
+        if len(results) == 2 and results["wheel"]["cpu"] > 0:
+            ratio = results["tasks"]["cpu"] / results["wheel"]["cpu"]
+            self.stdout.write(self.style.SUCCESS(f"wheel uses {ratio:.1f}x less event-loop CPU than per-socket tasks"))
+
+    def _report(self, mode, result):
+        lags = result["lags"]
+
+        def pct(p):
+            return lags[min(len(lags) - 1, int(len(lags) * p))] * 1000 if lags else 0.0
+
+        per_beat = result["cpu"] / result["sent"] * 1e6 if result["sent"] else 0.0
+        self.stdout.write(
+            f"{mode:>5}: cpu={result['cpu']:.3f}s ({result['cpu'] / result['wall'] * 100:.1f}% of a core)  "
+            f"{per_beat:.1f}us/heartbeat  sent={result['sent']}  closed={result['closed']}  "
+            f"loop lag p50={pct(0.50):.1f}ms p99={pct(0.99):.1f}ms max={pct(1.0):.1f}ms"
+        )
@@ -1,6 +1,7 @@
 import os
 import shutil
 from django.core.management.base import BaseCommand
+from adminpanel.realtime_broadcast import suppress_broadcasts
 from django.conf import settings
 from django.db import transaction
 from adminpanel.models import (
@@ -25,6 +26,7 @@ class Command(BaseCommand):
             help='Keep the media directory structure but remove all files',
         )
 
+    @suppress_broadcasts()
     def handle(self, *args, **options):
         if not options['confirm']:
             self.stdout.write(
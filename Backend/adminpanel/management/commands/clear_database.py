@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 from django.core.management.base import BaseCommand
+from adminpanel.realtime_broadcast import suppress_broadcasts
 from django.contrib.auth.models import User
 from adminpanel.models import (
     Brand, Category, Product, ProductImage, Order, OrderItem,
@@ -12,6 +13,7 @@ from adminpanel.models import (
 class Command(BaseCommand):
     help = 'Clear all data from the database except admin users'
 
+    @suppress_broadcasts()
     def handle(self, *args, **options):
         self.stdout.write("Starting database cleanup...")
         
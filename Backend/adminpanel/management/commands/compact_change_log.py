@@ -0,0 +1,27 @@
+"""
+Trim the realtime change log used for delta sync.
+
+Admin clients whose last seen version predates the trimmed entries get a
+full snapshot on their next sync instead of a delta.
+
+    python manage.py compact_change_log
+    python manage.py compact_change_log --keep-hours 6
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from adminpanel.change_log import compact
+
+
+class Command(BaseCommand):
+    help = "Delete realtime change log entries older than --keep-hours"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--keep-hours", type=float, default=72,
+                            help="Keep entries newer than this, so clients offline that long still get deltas")
+
+    def handle(self, *args, **opts):
+        deleted = compact(timezone.now() - timedelta(hours=opts["keep_hours"]))
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} change log entr{'y' if deleted == 1 else 'ies'}"))
@@ -113,10 +113,10 @@ class Command(BaseCommand):
         
         for order_data in sample_orders:
             # Create order
-            from adminpanel.id_generators import generate_unique_tracking_id, generate_unique_payment_id
+            from adminpanel.id_generators import generate_tracking_id, generate_payment_id
             order = Order.objects.create(
-                tracking_id=generate_unique_tracking_id(),
-                payment_id=generate_unique_payment_id(),
+                tracking_id=generate_tracking_id(),
+                payment_id=generate_payment_id(),
                 customer_email=order_data['customer_email'],
                 customer_phone=order_data['customer_phone'],
                 shipping_address=order_data['shipping_address'],
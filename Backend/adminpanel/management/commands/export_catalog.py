@@ -0,0 +1,45 @@
+"""
+Export the product catalog as CSV or JSONL, in the format import_catalog reads.
+
+    python manage.py export_catalog catalog.csv
+    python manage.py export_catalog catalog.jsonl
+    python manage.py export_catalog - --format jsonl > catalog.jsonl
+"""
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from adminpanel.catalog_io import CHUNK_SIZE, FORMATS, export_lines, format_for
+
+
+class Command(BaseCommand):
+    help = "Stream the product catalog to a CSV or JSONL file"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Output file, or - for stdout")
+        parser.add_argument("--format", choices=FORMATS, help="Default: from the file extension")
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="Products per query")
+
+    def handle(self, *args, **opts):
+        fmt = opts["format"] or format_for(opts["path"])
+        if fmt is None:
+            raise CommandError("Cannot tell the format from the file name; pass --format")
+        if opts["chunk_size"] < 1:
+            raise CommandError("--chunk-size must be positive")
+
+        stats = {}
+        started = time.monotonic()
+        lines = export_lines(fmt, opts["chunk_size"], stats)
+        if opts["path"] == "-":
+            sys.stdout.writelines(lines)
+            sys.stdout.flush()
+        else:
+            with open(opts["path"], "w", newline="", encoding="utf-8") as out:
+                out.writelines(lines)
+
+        seconds = time.monotonic() - started
+        # Report on stderr so stdout stays a clean catalog
+        self.stderr.write(self.style.SUCCESS(
+            f"Exported {stats['rows']} product(s) in {seconds:.1f}s ({stats['rows'] / seconds if seconds else 0:.0f}/s)"
+        ))
@@ -0,0 +1,38 @@
+"""
+Reclaim content-addressed media blobs that no row references any more.
+
+Runs incrementally: each invocation deletes at most --limit blobs, oldest
+unreferenced first, so it can run from cron without long pauses.
+
+    python manage.py gc_media_blobs
+    python manage.py gc_media_blobs --recount --dry-run
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from adminpanel.content_storage import GC_GRACE, collect_garbage, recount_references
+
+
+class Command(BaseCommand):
+    help = "Delete unreferenced content-addressed media blobs (and their image variants)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=500, help="Blobs to examine per run")
+        parser.add_argument("--grace-hours", type=float, default=GC_GRACE.total_seconds() / 3600,
+                            help="Only collect blobs unreferenced for at least this long")
+        parser.add_argument("--recount", action="store_true",
+                            help="Rebuild every reference count from the database first")
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **opts):
+        if opts["recount"]:
+            fixed = recount_references()
+            self.stdout.write(f"Corrected {fixed} reference count(s)")
+        collected = collect_garbage(
+            limit=opts["limit"], grace=timedelta(hours=opts["grace_hours"]), dry_run=opts["dry_run"]
+        )
+        for name in collected:
+            self.stdout.write(f"  {name}")
+        verb = "Would delete" if opts["dry_run"] else "Deleted"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {len(collected)} unreferenced blob(s)"))
@@ -0,0 +1,66 @@
+"""
+Backfill resized WebP/JPEG variants for existing images.
+
+    python manage.py generate_image_variants
+    python manage.py generate_image_variants --model product --force
+"""
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+
+from adminpanel.image_processing import render_variants
+from adminpanel.image_variants import VARIANT_FIELDS, needs_variants, read_source, store_variants
+from adminpanel.models import Brand, Category, ProductImage, ServiceImage
+from adminpanel.realtime_broadcast import suppress_broadcasts
+
+MODELS = {
+    "product": ProductImage,
+    "service": ServiceImage,
+    "brand": Brand,
+    "category": Category,
+}
+
+
+class Command(BaseCommand):
+    help = "Generate thumbnail/card/detail WebP and JPEG variants for existing images"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--model", choices=sorted(MODELS), action="append",
+                            help="Only these image models (repeatable; default: all)")
+        parser.add_argument("--force", action="store_true", help="Regenerate variants that already exist")
+        parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+        parser.add_argument("--batch-size", type=int, default=50)
+
+    # One change-log reset and refresh per resource, not a broadcast per row
+    @suppress_broadcasts()
+    def handle(self, *args, **opts):
+        models = [MODELS[name] for name in opts["model"] or MODELS]
+        done = failed = 0
+        with ProcessPoolExecutor(max_workers=opts["workers"],
+                                 mp_context=multiprocessing.get_context("spawn")) as pool:
+            for model in models:
+                image_field = VARIANT_FIELDS[model][0]
+                rows = model.objects.exclude(**{image_field: ""}).exclude(**{f"{image_field}__isnull": True})
+                pending = [row for row in rows.iterator() if opts["force"] or needs_variants(row)]
+                self.stdout.write(f"{model.__name__}: {len(pending)} image(s) to process")
+
+                for start in range(0, len(pending), opts["batch_size"]):
+                    futures = {}
+                    for row in pending[start:start + opts["batch_size"]]:
+                        try:
+                            futures[pool.submit(render_variants, read_source(row))] = row
+                        except Exception as e:
+                            failed += 1
+                            self.stdout.write(self.style.WARNING(f"  {model.__name__} {row.pk}: {e}"))
+                    for future in as_completed(futures):
+                        row = futures[future]
+                        try:
+                            if store_variants(row, future.result(), force=opts["force"]):
+                                done += 1
+                        except Exception as e:
+                            failed += 1
+                            self.stdout.write(self.style.WARNING(f"  {model.__name__} {row.pk}: {e}"))
+
+        style = self.style.SUCCESS if not failed else self.style.WARNING
+        self.stdout.write(style(f"Generated variants for {done} image(s), {failed} failed"))
@@ -0,0 +1,57 @@
+"""
+Import products, brands and categories from a CSV or JSONL catalog file.
+See adminpanel.catalog_io for the record format.
+
+    python manage.py import_catalog catalog.csv
+    python manage.py import_catalog catalog.jsonl --chunk-size 5000
+    python manage.py import_catalog - --format jsonl < catalog.jsonl
+"""
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from adminpanel.catalog_io import CHUNK_SIZE, FORMATS, format_for, import_catalog
+
+
+class Command(BaseCommand):
+    help = "Bulk import the product catalog from CSV or JSONL"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Catalog file, or - for stdin")
+        parser.add_argument("--format", choices=FORMATS, help="Default: from the file extension")
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="Records per transaction")
+
+    def handle(self, *args, **opts):
+        self.verbosity = opts["verbosity"]
+        fmt = opts["format"] or format_for(opts["path"])
+        if fmt is None:
+            raise CommandError("Cannot tell the format from the file name; pass --format")
+        if opts["chunk_size"] < 1:
+            raise CommandError("--chunk-size must be positive")
+
+        if opts["path"] == "-":
+            report = import_catalog(sys.stdin, fmt, opts["chunk_size"], self._progress)
+        else:
+            try:
+                stream = open(opts["path"], newline="", encoding="utf-8-sig")
+            except OSError as e:
+                raise CommandError(e)
+            with stream:
+                report = import_catalog(stream, fmt, opts["chunk_size"], self._progress)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {report['rows']} record(s) in {report['seconds']:.1f}s "
+            f"({report['rows_per_second'] or 0:.0f}/s): {report['created']} created, "
+            f"{report['updated']} updated, {report['unchanged']} unchanged, {report['images']} image(s), {report['brands']} new brand(s), "
+            f"{report['categories']} new categories"
+        ))
+        if report["images"]:
+            self.stdout.write("Run generate_image_variants to build thumbnails for the new images")
+        if report["errors"]:
+            self.stdout.write(self.style.WARNING(f"{report['errors']} record(s) skipped:"))
+            for error in report["error_samples"]:
+                self.stdout.write(self.style.WARNING(f"  line {error['line']}: {error['error']}"))
+
+    def _progress(self, report):
+        if self.verbosity > 1:
+            self.stdout.write(f"  {report['rows']} record(s), {report['rows_per_second'] or 0:.0f}/s")
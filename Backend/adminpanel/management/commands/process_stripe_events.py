@@ -0,0 +1,60 @@
+"""
+Process queued Stripe webhook events.
+
+    python manage.py process_stripe_events            # run until stopped
+    python manage.py process_stripe_events --once     # drain what is due and exit
+
+Several copies (or --workers threads) can run side by side; events are
+claimed with SKIP LOCKED and a lease, so none is processed twice at once.
+"""
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from adminpanel.stripe_events import BATCH_SIZE, drain, process_batch
+
+
+class Command(BaseCommand):
+    help = "Process queued Stripe webhook events in batches, retrying failures with backoff"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=2)
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+        parser.add_argument("--poll-interval", type=float, default=2.0, help="Seconds to sleep when the queue is idle")
+        parser.add_argument("--once", action="store_true", help="Drain due events and exit")
+
+    def handle(self, *args, **opts):
+        if opts["once"]:
+            handled = drain(opts["batch_size"])
+            self.stdout.write(self.style.SUCCESS(f"Processed {handled} event(s)"))
+            return
+
+        stop = threading.Event()
+
+        def work():
+            while not stop.is_set():
+                close_old_connections()
+                try:
+                    handled = process_batch(opts["batch_size"])
+                except Exception as e:
+                    self.stderr.write(f"Batch failed: {e}")
+                    handled = 0
+                if not handled:
+                    stop.wait(opts["poll_interval"])
+            close_old_connections()
+
+        threads = [threading.Thread(target=work, name=f"stripe-events-{i}", daemon=True)
+                   for i in range(opts["workers"])]
+        for thread in threads:
+            thread.start()
+        self.stdout.write(self.style.SUCCESS(f"Processing Stripe events with {len(threads)} worker(s)"))
+        try:
+            while any(thread.is_alive() for thread in threads):
+                time.sleep(0.5)
+        except KeyboardInterrupt:
+            stop.set()
+            for thread in threads:
+                thread.join()
+            self.stdout.write("Stopped")
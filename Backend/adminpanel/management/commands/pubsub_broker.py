@@ -0,0 +1,27 @@
+import asyncio
+
+from django.core.management.base import BaseCommand
+
+from adminpanel.pubsub_broker import PubSubBroker
+
+
+class Command(BaseCommand):
+    help = "Run the local Redis-compatible pub/sub broker for multi-worker development"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=6379)
+
+    def handle(self, *args, **opts):
+        broker = PubSubBroker(opts["host"], opts["port"])
+
+        async def run():
+            await broker.start()
+            self.stdout.write(self.style.SUCCESS(f"Pub/sub broker listening on {broker.url}"))
+            self.stdout.write("Set CHANNEL_LAYER_BACKEND=redis and REDIS_URL to this address in each worker.")
+            await broker.serve_forever()
+
+        try:
+            asyncio.run(run())
+        except KeyboardInterrupt:
+            self.stdout.write("Broker stopped")
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from adminpanel.models import ChatRoom
+
+
+class Command(BaseCommand):
+    help = "Recompute the denormalized unread counters and last-message previews on chat rooms"
+
+    def add_arguments(self, parser):
+        parser.add_argument("room_ids", nargs="*", help="Only repair these rooms (default: all)")
+
+    def handle(self, *args, **opts):
+        room_ids = opts["room_ids"] or None
+        updated = ChatRoom.recompute_counters(room_ids)
+        self.stdout.write(self.style.SUCCESS(f"Repaired counters on {updated} chat room(s)"))
@@ -1,9 +1,11 @@
 from django.core.management.base import BaseCommand
+from adminpanel.realtime_broadcast import suppress_broadcasts
 from adminpanel.models import Category
 
 class Command(BaseCommand):
     help = 'Seed initial categories'
 
+    @suppress_broadcasts()
     def handle(self, *args, **options):
         # Define initial categories
         categories_data = [
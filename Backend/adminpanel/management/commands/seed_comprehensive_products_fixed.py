@@ -2,12 +2,14 @@ import random
 import json
 from decimal import Decimal
 from django.core.management.base import BaseCommand
+from adminpanel.realtime_broadcast import suppress_broadcasts
 from django.utils import timezone
 from adminpanel.models import Product, Brand, Category
 
 class Command(BaseCommand):
     help = "Seed comprehensive product data covering all categories and brands with various discounts"
 
+    @suppress_broadcasts()
     def handle(self, *args, **opts):
         self.stdout.write("Starting comprehensive product seeding for all categories...")
         
@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 from django.core.management.base import BaseCommand
+from adminpanel.realtime_broadcast import suppress_broadcasts
 from django.contrib.auth.models import User
 from django.core.files import File
 from decimal import Decimal
@@ -1478,6 +1479,7 @@ class Command(BaseCommand):
                     website_content.deal2_image.save('anime.jpg', File(f), save=True)
                     self.stdout.write("   Added website content images")
 
+    @suppress_broadcasts()
     def handle(self, *args, **options):
         self.stdout.write("Starting database seeding...")
         
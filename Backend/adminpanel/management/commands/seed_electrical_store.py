@@ -5,6 +5,7 @@ Creates electrical categories, brands, products, and services with realistic dat
 """
 
 from django.core.management.base import BaseCommand
+from adminpanel.realtime_broadcast import suppress_broadcasts
 from django.db import transaction
 from decimal import Decimal
 import random
@@ -23,6 +24,7 @@ class Command(BaseCommand):
             help='Clear existing data before seeding',
         )
 
+    @suppress_broadcasts()
     def handle(self, *args, **options):
         if options['clear']:
             self.stdout.write(self.style.WARNING('Clearing existing data...'))
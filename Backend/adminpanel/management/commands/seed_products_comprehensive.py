@@ -2,6 +2,7 @@ import random
 import json
 from datetime import timedelta
 from django.core.management.base import BaseCommand
+from adminpanel.realtime_broadcast import suppress_broadcasts
 from django.utils import timezone
 from django.contrib.auth.models import User
 from adminpanel.models import Product, Brand, Category, Review, ProductImage
@@ -9,6 +10,7 @@ from adminpanel.models import Product, Brand, Category, Review, ProductImage
 class Command(BaseCommand):
     help = "Seed comprehensive product data with realistic information"
 
+    @suppress_broadcasts()
     def handle(self, *args, **opts):
         self.stdout.write("Starting comprehensive product seeding...")
         
@@ -1,9 +1,11 @@
 from django.core.management.base import BaseCommand
+from adminpanel.realtime_broadcast import suppress_broadcasts
 from adminpanel.models import ServiceCategory, Service
 
 class Command(BaseCommand):
     help = 'Seed service categories and assign them to existing services'
 
+    @suppress_broadcasts()
     def handle(self, *args, **options):
         # Create service categories
         categories_data = [
@@ -1,4 +1,5 @@
 from django.core.management.base import BaseCommand
+from adminpanel.realtime_broadcast import suppress_broadcasts
 from django.core.files.base import ContentFile
 from adminpanel.models import ServiceCategory, Service, ServiceImage
 import os
@@ -38,6 +39,7 @@ class Command(BaseCommand):
         
         return ContentFile(img_io.getvalue(), name=f"{text.replace(' ', '_').lower()}.png")
 
+    @suppress_broadcasts()
     def handle(self, *args, **options):
         # Enhanced service categories
         categories_data = [
@@ -1,6 +1,7 @@
 import random
 from datetime import timedelta
 from django.core.management.base import BaseCommand
+from adminpanel.realtime_broadcast import suppress_broadcasts
 from django.utils import timezone
 from django.contrib.auth.models import User
 from adminpanel.models import Product, Order, OrderItem, Brand, Category, Service, ServiceInquiry, Review, WebsiteContent, StoreSettings
@@ -11,6 +12,7 @@ CATS = ["Laptops", "Phones", "Accessories", "Monitors", "Storage"]
 class Command(BaseCommand):
     help = "Seed products and orders for dashboard demo"
 
+    @suppress_broadcasts()
     def handle(self, *args, **opts):
         if Product.objects.count() < 30:
             for i in range(30):
@@ -4,13 +4,14 @@ from urllib.parse import parse_qs
 from channels.middleware import BaseMiddleware
 from channels.db import database_sync_to_async
 from django.contrib.auth.models import AnonymousUser
-from django.contrib.auth import get_user_model
 from rest_framework_simplejwt.tokens import AccessToken
-from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken, TokenError
 from django.utils.deprecation import MiddlewareMixin
 
+from .jwt_user_cache import get_token_user
+
 logger = logging.getLogger(__name__)
-User = get_user_model()
 
 class CustomCorsMiddleware(MiddlewareMixin):
     """
@@ -73,20 +74,10 @@ class JWTAuthMiddleware(BaseMiddleware):
             # Validate the token
             access_token = AccessToken(token)
             
-            # Get user ID from token
-            user_id = access_token.get("user_id")
-            if not user_id:
-                return None
-            
-            # Get user from database
-            try:
-                user = User.objects.get(id=user_id)
-                return user
-            except User.DoesNotExist:
-                logger.error(f"User with ID {user_id} not found")
-                return None
+            # Get user (cached per token; see jwt_user_cache)
+            return get_token_user(access_token, JWTAuthentication().get_user)
                 
-        except (InvalidToken, TokenError) as e:
+        except (InvalidToken, TokenError, AuthenticationFailed) as e:
             logger.error(f"Token validation failed: {e}")
             return None
         except Exception as e:
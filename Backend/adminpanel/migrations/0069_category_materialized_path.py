@@ -0,0 +1,64 @@
+# Generated by Django 5.2.6 on 2026-10-17 00:01
+
+from django.db import migrations, models
+
+
+def populate_tree_paths(apps, schema_editor):
+    for model_name in ('Category', 'ServiceCategory'):
+        Model = apps.get_model('adminpanel', model_name)
+        nodes = {node.pk: node for node in Model.objects.all()}
+        computed = {}
+
+        def compute(node):
+            if node.pk not in computed:
+                if node.parent_id and node.parent_id in nodes:
+                    path, depth, names = compute(nodes[node.parent_id])
+                    computed[node.pk] = (f"{path}{node.parent_id}/", depth + 1, f"{names} / {node.name}")
+                else:
+                    computed[node.pk] = ("/", 0, node.name)
+            return computed[node.pk]
+
+        for node in nodes.values():
+            node.tree_path, node.tree_depth, node.tree_names = compute(node)
+        Model.objects.bulk_update(list(nodes.values()), ['tree_path', 'tree_depth', 'tree_names'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adminpanel', '0068_product_created_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='tree_depth',
+            field=models.PositiveSmallIntegerField(db_index=True, default=0, editable=False, help_text='0=root, 1=child, 2=grandchild'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='tree_names',
+            field=models.CharField(blank=True, default='', editable=False, help_text="Full name path, e.g. 'Parent / Child'", max_length=1000),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='tree_path',
+            field=models.CharField(db_index=True, default='/', editable=False, help_text="Ancestor ids, e.g. '/3/8/'", max_length=255),
+        ),
+        migrations.AddField(
+            model_name='servicecategory',
+            name='tree_depth',
+            field=models.PositiveSmallIntegerField(db_index=True, default=0, editable=False, help_text='0=root, 1=child, 2=grandchild'),
+        ),
+        migrations.AddField(
+            model_name='servicecategory',
+            name='tree_names',
+            field=models.CharField(blank=True, default='', editable=False, help_text="Full name path, e.g. 'Parent / Child'", max_length=1000),
+        ),
+        migrations.AddField(
+            model_name='servicecategory',
+            name='tree_path',
+            field=models.CharField(db_index=True, default='/', editable=False, help_text="Ancestor ids, e.g. '/3/8/'", max_length=255),
+        ),
+        migrations.RunPython(populate_tree_paths, migrations.RunPython.noop),
+    ]
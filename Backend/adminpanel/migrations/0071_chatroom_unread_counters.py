@@ -0,0 +1,48 @@
+# Generated by Django 5.2.6 on 2026-10-17 00:12
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Q, Subquery
+
+
+def populate_chat_counters(apps, schema_editor):
+    ChatRoom = apps.get_model('adminpanel', 'ChatRoom')
+    ChatMessage = apps.get_model('adminpanel', 'ChatMessage')
+    latest = ChatMessage.objects.filter(room=OuterRef('pk')).order_by('-created_at', '-id')
+    rooms = ChatRoom.objects.annotate(
+        admin_unread=Count('messages', filter=Q(messages__sender_type='customer', messages__is_read=False)),
+        customer_unread=Count('messages', filter=Q(messages__sender_type__in=['admin', 'system'], messages__is_read=False)),
+        latest_content=Subquery(latest.values('content')[:1]),
+    )
+    changed = []
+    for room in rooms:
+        room.unread_by_admin = room.admin_unread
+        room.unread_by_customer = room.customer_unread
+        room.last_message_preview = (room.latest_content or '')[:200]
+        changed.append(room)
+    ChatRoom.objects.bulk_update(changed, ['unread_by_admin', 'unread_by_customer', 'last_message_preview'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adminpanel', '0070_chatmessage_room_created_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatroom',
+            name='last_message_preview',
+            field=models.CharField(blank=True, max_length=200),
+        ),
+        migrations.AddField(
+            model_name='chatroom',
+            name='unread_by_admin',
+            field=models.PositiveIntegerField(default=0, help_text='Customer messages the admin has not read'),
+        ),
+        migrations.AddField(
+            model_name='chatroom',
+            name='unread_by_customer',
+            field=models.PositiveIntegerField(default=0, help_text='Admin/system messages the customer has not read'),
+        ),
+        migrations.RunPython(populate_chat_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.6 on 2026-10-17 00:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adminpanel', '0071_chatroom_unread_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRegistrations',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True)),
+                ('users', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'daily registrations',
+                'ordering': ['day'],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailySalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('paid_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('orders', models.PositiveIntegerField(default=0)),
+                ('paid_orders', models.PositiveIntegerField(default=0)),
+                ('units', models.PositiveIntegerField(default=0)),
+                ('customers', models.PositiveIntegerField(default=0, help_text='Distinct customer emails ordering that day')),
+                ('new_customers', models.PositiveIntegerField(default=0, help_text='Customers whose first order was that day')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['day'],
+            },
+        ),
+        migrations.CreateModel(
+            name='SalesCustomer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('customer_email', models.EmailField(max_length=254, unique=True)),
+                ('first_order_day', models.DateField(db_index=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailyProductSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('units', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='adminpanel.product')),
+            ],
+            options={
+                'ordering': ['day'],
+                'constraints': [models.UniqueConstraint(fields=('day', 'product'), name='uniq_daily_product_sales')],
+            },
+        ),
+    ]
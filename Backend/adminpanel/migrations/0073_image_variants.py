@@ -0,0 +1,73 @@
+# Generated by Django 5.2.6 on 2026-10-17 00:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adminpanel', '0072_sales_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='brand',
+            name='image_height',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='brand',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, help_text='Resized WebP/JPEG derivatives of image'),
+        ),
+        migrations.AddField(
+            model_name='brand',
+            name='image_width',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='image_height',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, help_text='Resized WebP/JPEG derivatives of image'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='image_width',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='productimage',
+            name='height',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='productimage',
+            name='variants',
+            field=models.JSONField(blank=True, default=dict, help_text='Resized WebP/JPEG derivatives of image'),
+        ),
+        migrations.AddField(
+            model_name='productimage',
+            name='width',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='serviceimage',
+            name='height',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='serviceimage',
+            name='variants',
+            field=models.JSONField(blank=True, default=dict, help_text='Resized WebP/JPEG derivatives of image'),
+        ),
+        migrations.AddField(
+            model_name='serviceimage',
+            name='width',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
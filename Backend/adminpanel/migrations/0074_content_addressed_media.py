@@ -0,0 +1,46 @@
+# Generated by Django 5.2.6 on 2026-10-17 00:21
+
+import adminpanel.content_storage
+import adminpanel.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adminpanel', '0073_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('size', models.BigIntegerField(default=0)),
+                ('ref_count', models.IntegerField(default=0)),
+                ('unreferenced_at', models.DateTimeField(blank=True, db_index=True, help_text='When ref_count last dropped to 0', null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='brand',
+            name='image',
+            field=models.ImageField(blank=True, help_text='Brand logo/image', null=True, storage=adminpanel.content_storage.content_addressed_storage, upload_to='brands/'),
+        ),
+        migrations.AlterField(
+            model_name='category',
+            name='image',
+            field=models.ImageField(blank=True, help_text='Category image (typically used for grandchild categories)', null=True, storage=adminpanel.content_storage.content_addressed_storage, upload_to='categories/'),
+        ),
+        migrations.AlterField(
+            model_name='productimage',
+            name='image',
+            field=models.ImageField(storage=adminpanel.content_storage.content_addressed_storage, upload_to=adminpanel.models.product_image_path, validators=[adminpanel.models.validate_image_ext]),
+        ),
+        migrations.AlterField(
+            model_name='serviceimage',
+            name='image',
+            field=models.ImageField(storage=adminpanel.content_storage.content_addressed_storage, upload_to='services/'),
+        ),
+    ]
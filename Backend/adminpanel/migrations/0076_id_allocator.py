@@ -0,0 +1,26 @@
+# Generated by Django 5.2.6 on 2026-10-17 00:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adminpanel', '0075_stripe_event_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdWorkerLease',
+            fields=[
+                ('worker_id', models.PositiveSmallIntegerField(primary_key=True, serialize=False)),
+                ('owner', models.CharField(max_length=255)),
+                ('expires_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='order_number',
+            field=models.CharField(blank=True, max_length=32, null=True),
+        ),
+    ]
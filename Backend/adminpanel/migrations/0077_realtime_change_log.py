@@ -0,0 +1,36 @@
+# Generated by Django 5.2.6 on 2026-10-17 00:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adminpanel', '0076_id_allocator'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeVersion',
+            fields=[
+                ('resource', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('version', models.BigIntegerField(default=0)),
+                ('compacted_through', models.BigIntegerField(default=0, help_text='Log entries up to this version have been deleted')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ChangeLogEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resource', models.CharField(max_length=50)),
+                ('version', models.BigIntegerField()),
+                ('object_id', models.BigIntegerField(blank=True, null=True)),
+                ('action', models.CharField(choices=[('created', 'Created'), ('updated', 'Updated'), ('deleted', 'Deleted'), ('reset', 'Reset')], max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'ordering': ['resource', 'version'],
+                'constraints': [models.UniqueConstraint(fields=('resource', 'version'), name='unique_change_version')],
+            },
+        ),
+    ]
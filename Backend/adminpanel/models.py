@@ -2,16 +2,146 @@ import os
 import uuid
 from uuid import uuid4
 from django.db import models
+from django.db.models import Max
 from django.db.models.functions import Lower
 from django.contrib.auth.models import User
 from django.utils import timezone
 from django.core.exceptions import ValidationError
+from .content_storage import content_addressed_storage
+from .id_generators import generate_order_number, generate_tracking_id
+
+# --- Hierarchy ---
+class MaterializedPathMixin(models.Model):
+    """
+    Materialized-path bookkeeping for self-referential ``parent`` trees.
+
+    ``tree_path`` holds the ids of a node's ancestors ("/" for a root,
+    "/3/" for a child of 3, "/3/8/" for a grandchild), ``tree_depth`` its
+    level and ``tree_names`` its " / "-joined name path. All three are kept
+    in sync on save, so depth, full path, ancestors and subtree membership
+    come from indexed columns instead of walking ``parent`` row by row.
+    Deleting a node cascades to its subtree, so deletes need no bookkeeping.
+    """
+    TREE_FIELDS = ["tree_path", "tree_depth", "tree_names"]
+    REALTIME_RESOURCE = None  # change-log resource name of the concrete model
+
+    tree_path = models.CharField(max_length=255, default="/", db_index=True, editable=False, help_text="Ancestor ids, e.g. '/3/8/'")
+    tree_depth = models.PositiveSmallIntegerField(default=0, db_index=True, editable=False, help_text="0=root, 1=child, 2=grandchild")
+    tree_names = models.CharField(max_length=1000, blank=True, default="", editable=False, help_text="Full name path, e.g. 'Parent / Child'")
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored position so save() can tell when the subtree moved
+        instance._loaded_tree_state = (instance.__dict__.get("tree_path"), instance.__dict__.get("tree_names"))
+        return instance
+
+    def refresh_tree_fields(self):
+        """Recompute this node's path columns from its parent's (one lookup at most)"""
+        if self.parent_id:
+            parent = self.parent
+            self.tree_path = f"{parent.tree_path}{parent.pk}/"
+            self.tree_depth = parent.tree_depth + 1
+            self.tree_names = f"{parent.tree_names} / {self.name}"
+        else:
+            self.tree_path = "/"
+            self.tree_depth = 0
+            self.tree_names = self.name
+
+    def get_descendant_prefix(self):
+        """``tree_path`` prefix shared by every descendant of this node"""
+        return f"{self.tree_path}{self.pk}/"
+
+    def get_ancestor_ids(self):
+        return [int(pk) for pk in self.tree_path.strip("/").split("/") if pk]
+
+    def is_descendant_of(self, other):
+        return self.tree_path.startswith(other.get_descendant_prefix())
+
+    def validate_tree_move(self, label, max_depth=2):
+        """
+        Raise ValueError if ``parent`` is this node or one of its descendants,
+        or would put any node of the subtree below ``max_depth``. Checks the
+        stored path, so call it before refresh_tree_fields().
+        """
+        if not self.parent_id:
+            return
+        if self.parent_id == self.pk:
+            raise ValueError(f"{label} cannot be its own parent")
+        # The stored position: refresh_tree_fields() may already have moved tree_path
+        stored_prefix = None
+        if self.pk:
+            loaded = getattr(self, "_loaded_tree_state", None)
+            stored_path = loaded[0] if loaded else type(self).objects.filter(pk=self.pk).values_list("tree_path", flat=True).first()
+            stored_prefix = f"{stored_path}{self.pk}/" if stored_path is not None else None
+        if stored_prefix and self.parent.tree_path.startswith(stored_prefix):
+            raise ValueError(f"{label} cannot be moved under one of its own subcategories")
+
+        too_deep = f"{label} hierarchy cannot exceed {max_depth + 1} levels (parent -> child -> grandchild)"
+        depth = self.parent.tree_depth + 1
+        if depth > max_depth:
+            raise ValueError(too_deep)
+        # Moving deeper: the subtree's deepest node must still fit
+        if stored_prefix and depth > stored_prefix.count("/") - 2:
+            stored_depth = stored_prefix.count("/") - 2
+            deepest = type(self).objects.filter(tree_path__startswith=stored_prefix).aggregate(deepest=Max("tree_depth"))["deepest"]
+            if deepest is not None and depth + deepest - stored_depth > max_depth:
+                raise ValueError(too_deep)
+
+    def save_tree(self, save, *args, **kwargs):
+        """Wrap a model save(): persist the path columns and re-path the subtree if it moved"""
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and {"name", "parent", "parent_id"} & set(update_fields):
+            kwargs["update_fields"] = list(set(update_fields) | set(self.TREE_FIELDS))
+        loaded = getattr(self, "_loaded_tree_state", None)
+        save(*args, **kwargs)
+        if loaded and loaded != (self.tree_path, self.tree_names):
+            self._rebuild_descendants(f"{loaded[0]}{self.pk}/")
+        self._loaded_tree_state = (self.tree_path, self.tree_names)
+
+    def _rebuild_descendants(self, old_prefix):
+        model = type(self)
+        # Ordered by the old depth, so every parent is handled before its children
+        nodes = list(model.objects.filter(tree_path__startswith=old_prefix).order_by("tree_depth"))
+        if not nodes:
+            return
+        computed = {self.pk: (self.get_descendant_prefix(), self.tree_depth, self.tree_names)}
+        for node in nodes:
+            prefix, depth, names = computed[node.parent_id]
+            node.tree_path = prefix
+            node.tree_depth = depth + 1
+            node.tree_names = f"{names} / {node.name}"
+            node._loaded_tree_state = (node.tree_path, node.tree_names)
+            computed[node.pk] = (node.get_descendant_prefix(), node.tree_depth, node.tree_names)
+        model.objects.bulk_update(nodes, self.TREE_FIELDS)
+        # bulk_update fires no signals; the descendants' full paths changed too
+        from .realtime_broadcast import rows_changed
+        rows_changed(self.REALTIME_RESOURCE, "updated", [node.pk for node in nodes])
+
+    def _ordered_descendants(self):
+        """All descendants in one query, arranged depth-first in Meta ordering"""
+        by_parent = {}
+        for node in type(self).objects.filter(tree_path__startswith=self.get_descendant_prefix()):
+            by_parent.setdefault(node.parent_id, []).append(node)
+        ordered = []
+        def visit(parent_id):
+            for node in by_parent.get(parent_id, []):
+                ordered.append(node)
+                visit(node.pk)
+        visit(self.pk)
+        return ordered
 
 # --- Attributes ---
 class Brand(models.Model):
     name = models.CharField(max_length=120, unique=True)
     slug = models.SlugField(max_length=120, unique=True, null=True, blank=True)
-    image = models.ImageField(upload_to="brands/", null=True, blank=True, help_text="Brand logo/image")
+    image = models.ImageField(upload_to="brands/", storage=content_addressed_storage, null=True, blank=True, help_text="Brand logo/image")
+    image_width = models.PositiveIntegerField(null=True, blank=True)
+    image_height = models.PositiveIntegerField(null=True, blank=True)
+    image_variants = models.JSONField(default=dict, blank=True, help_text="Resized WebP/JPEG derivatives of image")
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -35,7 +165,9 @@ class Brand(models.Model):
     def __str__(self):
         return self.name
 
-class Category(models.Model):
+class Category(MaterializedPathMixin, models.Model):
+    REALTIME_RESOURCE = "categories"
+
     name = models.CharField(max_length=120)
     slug = models.SlugField(max_length=120, null=True, blank=True)
     slogan = models.TextField(
@@ -50,7 +182,10 @@ class Category(models.Model):
         on_delete=models.CASCADE,
         related_name="children",
     )
-    image = models.ImageField(upload_to="categories/", null=True, blank=True, help_text="Category image (typically used for grandchild categories)")
+    image = models.ImageField(upload_to="categories/", storage=content_addressed_storage, null=True, blank=True, help_text="Category image (typically used for grandchild categories)")
+    image_width = models.PositiveIntegerField(null=True, blank=True)
+    image_height = models.PositiveIntegerField(null=True, blank=True)
+    image_variants = models.JSONField(default=dict, blank=True, help_text="Resized WebP/JPEG derivatives of image")
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -68,14 +203,10 @@ class Category(models.Model):
         ]
 
     def save(self, *args, **kwargs):
-        # Validate hierarchy depth before saving
-        if self.parent and self.get_depth() > 2:
-            raise ValueError("Category hierarchy cannot exceed 3 levels (parent -> child -> grandchild)")
-        
-        # Prevent circular references
-        if self.parent and self.parent.pk == self.pk:
-            raise ValueError("Category cannot be its own parent")
-        
+        # Depth and circular references, checked before the path is recomputed
+        self.validate_tree_move("Category")
+        self.refresh_tree_fields()
+
         # Check for duplicate names within the same parent (case-insensitive)
         existing_query = Category.objects.filter(name__iexact=self.name, parent=self.parent)
         if self.pk:  # If updating, exclude current instance
@@ -87,7 +218,7 @@ class Category(models.Model):
         
         if not self.slug:
             self.slug = self.generate_slug()
-        super().save(*args, **kwargs)
+        self.save_tree(super().save, *args, **kwargs)
 
     def generate_slug(self):
         from django.utils.text import slugify
@@ -101,12 +232,7 @@ class Category(models.Model):
 
     def get_depth(self):
         """Get the depth level of this category in the hierarchy"""
-        depth = 0
-        current = self.parent
-        while current:
-            depth += 1
-            current = current.parent
-        return depth
+        return self.tree_depth
 
     def get_level(self):
         """Get the hierarchy level: 0=parent, 1=child, 2=grandchild"""
@@ -120,20 +246,11 @@ class Category(models.Model):
 
     def get_full_path(self):
         """Get the full hierarchical path as a string"""
-        path_parts = []
-        current = self
-        while current:
-            path_parts.insert(0, current.name)
-            current = current.parent
-        return ' / '.join(path_parts)
+        return self.tree_names
 
     def get_all_descendants(self):
         """Get all descendants (children, grandchildren, etc.)"""
-        descendants = []
-        for child in self.children.all():
-            descendants.append(child)
-            descendants.extend(child.get_all_descendants())
-        return descendants
+        return self._ordered_descendants()
 
     def can_have_children(self):
         """Check if this category can have children (not exceeding depth limit)"""
@@ -141,12 +258,16 @@ class Category(models.Model):
 
     def get_ancestors(self):
         """Get all ancestors (parent, grandparent, etc.)"""
-        ancestors = []
-        current = self.parent
-        while current:
-            ancestors.append(current)
-            current = current.parent
-        return ancestors
+        return list(Category.objects.filter(pk__in=self.get_ancestor_ids()).order_by("-tree_depth"))
+
+    def get_subtree_products(self):
+        """Products in this category and all of its subcategories, in one indexed query"""
+        return Product.objects.filter(Category.subtree_q(self))
+
+    @staticmethod
+    def subtree_q(category, prefix="category__"):
+        """Q matching rows whose category (via ``prefix``) is ``category`` or one of its descendants"""
+        return models.Q(**{f"{prefix}pk": category.pk}) | models.Q(**{f"{prefix}tree_path__startswith": category.get_descendant_prefix()})
 
     def __str__(self):
         return f"{self.parent.name + ' / ' if self.parent else ''}{self.name}"
@@ -166,7 +287,14 @@ class Product(models.Model):
     isNew = models.BooleanField(default=False, help_text="Mark this product as new arrival to display in new products section")
     is_top_selling = models.BooleanField(default=False, help_text="Mark this product as top selling to display on home page")
     created_at = models.DateTimeField(auto_now_add=True)
-    class Meta: ordering = ["-created_at"]
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            # Backs keyset pagination of the public product list
+            models.Index(fields=["created_at", "id"], name="product_created_id_idx"),
+        ]
+
     def __str__(self): return self.name
 
 def validate_image_ext(file):
@@ -181,8 +309,11 @@ def product_image_path(instance, filename):
 
 class ProductImage(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="images")
-    image = models.ImageField(upload_to=product_image_path, validators=[validate_image_ext])
+    image = models.ImageField(upload_to=product_image_path, storage=content_addressed_storage, validators=[validate_image_ext])
     is_main = models.BooleanField(default=False, help_text="Mark this as the main product image")
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    variants = models.JSONField(default=dict, blank=True, help_text="Resized WebP/JPEG derivatives of image")
     created_at = models.DateTimeField(auto_now_add=True)
     class Meta: 
         ordering = ["-is_main", "-created_at"]
@@ -210,7 +341,7 @@ class Order(models.Model):
     user = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL)
     
     # Enhanced order identification
-    order_number = models.CharField(max_length=20, null=True, blank=True)
+    order_number = models.CharField(max_length=32, null=True, blank=True)
     tracking_id = models.CharField(max_length=100, unique=True, blank=True)
     
     # Customer Information
@@ -256,19 +387,18 @@ class Order(models.Model):
             models.Index(fields=['created_at']),
         ]
 
-    def generate_order_number(self):
-        """Generate unique order number"""
-        from django.utils import timezone
-        return f"ORD-{timezone.now().strftime('%Y%m%d')}-{str(self.id).zfill(6)}"
-
     def save(self, *args, **kwargs):
+        # Identifiers come from the id allocator, so a new order is a single INSERT
+        filled = []
         if not self.order_number:
-            # We'll set this after the object is saved and has an ID
-            super().save(*args, **kwargs)
-            self.order_number = self.generate_order_number()
-            super().save(update_fields=['order_number'])
-        else:
-            super().save(*args, **kwargs)
+            self.order_number = generate_order_number()
+            filled.append('order_number')
+        if not self.tracking_id:
+            self.tracking_id = generate_tracking_id()
+            filled.append('tracking_id')
+        if filled and kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], *filled}
+        super().save(*args, **kwargs)
 
     def __str__(self): 
         return f"Order #{self.order_number} - {self.customer_name}"
@@ -298,14 +428,109 @@ class Payment(models.Model):
     def __str__(self):
         return f"Payment {self.id} - {self.status}"
 
+class IdWorkerLease(models.Model):
+    """Worker id held by a running process for the order id allocator (see id_generators)"""
+    worker_id = models.PositiveSmallIntegerField(primary_key=True)
+    owner = models.CharField(max_length=255)
+    expires_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"Worker {self.worker_id} ({self.owner})"
+
+class StripeEvent(models.Model):
+    """A received Stripe webhook event, queued for background processing"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    event_id = models.CharField(max_length=255, unique=True)
+    event_type = models.CharField(max_length=100)
+    payload = models.JSONField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['received_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='stripe_event_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.event_type} {self.event_id} ({self.status})"
+
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, related_name="order_items", on_delete=models.CASCADE)
     product = models.ForeignKey(Product, on_delete=models.PROTECT)
     quantity = models.PositiveIntegerField(default=1)
     unit_price = models.DecimalField(max_digits=10, decimal_places=2)
 
+# --- Sales rollups (maintained by adminpanel.sales_rollups) ---
+class DailySalesRollup(models.Model):
+    """Order totals for one calendar day"""
+    day = models.DateField(unique=True)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    paid_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    orders = models.PositiveIntegerField(default=0)
+    paid_orders = models.PositiveIntegerField(default=0)
+    units = models.PositiveIntegerField(default=0)
+    customers = models.PositiveIntegerField(default=0, help_text="Distinct customer emails ordering that day")
+    new_customers = models.PositiveIntegerField(default=0, help_text="Customers whose first order was that day")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['day']
+
+    def __str__(self):
+        return f"Sales {self.day}: {self.orders} orders"
+
+class DailyProductSales(models.Model):
+    """Units and revenue per product for one calendar day"""
+    day = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='daily_sales')
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['day']
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'product'], name='uniq_daily_product_sales'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} on {self.day}: {self.units}"
+
+class DailyRegistrations(models.Model):
+    """New user accounts for one calendar day"""
+    day = models.DateField(unique=True)
+    users = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['day']
+        verbose_name_plural = 'daily registrations'
+
+    def __str__(self):
+        return f"Registrations {self.day}: {self.users}"
+
+class SalesCustomer(models.Model):
+    """First order day per customer email, for all-time distinct customer counts"""
+    customer_email = models.EmailField(unique=True)
+    first_order_day = models.DateField(db_index=True)
+
+    def __str__(self):
+        return f"{self.customer_email} since {self.first_order_day}"
+
 # --- Services ---
-class ServiceCategory(models.Model):
+class ServiceCategory(MaterializedPathMixin, models.Model):
+    REALTIME_RESOURCE = "service_categories"
+
     name = models.CharField(max_length=200)
     slug = models.SlugField(max_length=200, null=True, blank=True)
     description = models.TextField(blank=True)
@@ -340,14 +565,10 @@ class ServiceCategory(models.Model):
         ]
 
     def save(self, *args, **kwargs):
-        # Validate hierarchy depth before saving
-        if self.parent and self.get_depth() > 2:
-            raise ValueError("Service category hierarchy cannot exceed 3 levels (parent -> child -> grandchild)")
-        
-        # Prevent circular references
-        if self.parent and self.parent.pk == self.pk:
-            raise ValueError("Service category cannot be its own parent")
-        
+        # Depth and circular references, checked before the path is recomputed
+        self.validate_tree_move("Service category")
+        self.refresh_tree_fields()
+
         # Check for duplicate names within the same parent (case-insensitive)
         existing_query = ServiceCategory.objects.filter(name__iexact=self.name, parent=self.parent)
         if self.pk:  # If updating, exclude current instance
@@ -361,7 +582,7 @@ class ServiceCategory(models.Model):
         if not self.slug:
             self.slug = self.generate_slug()
         
-        super().save(*args, **kwargs)
+        self.save_tree(super().save, *args, **kwargs)
 
     def generate_slug(self):
         """Generate a unique slug for the category"""
@@ -378,29 +599,25 @@ class ServiceCategory(models.Model):
 
     def get_depth(self):
         """Get the depth of this category in the hierarchy"""
-        depth = 0
-        parent = self.parent
-        while parent:
-            depth += 1
-            parent = parent.parent
-        return depth
+        return self.tree_depth
+
+    def get_full_path(self):
+        """Get the full hierarchical path as a string"""
+        return self.tree_names
 
     def get_ancestors(self):
         """Get all ancestors of this category"""
-        ancestors = []
-        parent = self.parent
-        while parent:
-            ancestors.insert(0, parent)
-            parent = parent.parent
-        return ancestors
+        return list(ServiceCategory.objects.filter(pk__in=self.get_ancestor_ids()).order_by("tree_depth"))
 
     def get_descendants(self):
         """Get all descendants of this category"""
-        descendants = []
-        for child in self.children.all():
-            descendants.append(child)
-            descendants.extend(child.get_descendants())
-        return descendants
+        return self._ordered_descendants()
+
+    def get_subtree_services(self):
+        """Services in this category and all of its subcategories, in one indexed query"""
+        return Service.objects.filter(
+            models.Q(category=self) | models.Q(category__tree_path__startswith=self.get_descendant_prefix())
+        )
 
     def __str__(self):
         return self.name
@@ -429,8 +646,11 @@ class Service(models.Model):
 
 class ServiceImage(models.Model):
     service = models.ForeignKey(Service, related_name="images", on_delete=models.CASCADE)
-    image = models.ImageField(upload_to="services/")
+    image = models.ImageField(upload_to="services/", storage=content_addressed_storage)
     is_main = models.BooleanField(default=False)
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    variants = models.JSONField(default=dict, blank=True, help_text="Resized WebP/JPEG derivatives of image")
     created_at = models.DateTimeField(auto_now_add=True)
 
 class ServiceInquiry(models.Model):
@@ -584,6 +804,16 @@ class ChatRoom(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     last_message_at = models.DateTimeField(auto_now=True)
     
+    # Denormalized from ChatMessage so room lists need no per-room queries.
+    # Only ever changed with F() updates (see ChatMessage.save and mark_read_by_*);
+    # a plain room.save() leaves them alone. Repair: manage.py repair_chat_counters
+    unread_by_admin = models.PositiveIntegerField(default=0, help_text="Customer messages the admin has not read")
+    unread_by_customer = models.PositiveIntegerField(default=0, help_text="Admin/system messages the customer has not read")
+    last_message_preview = models.CharField(max_length=200, blank=True)
+    
+    COUNTER_FIELDS = ('unread_by_admin', 'unread_by_customer', 'last_message_preview')
+    PREVIEW_LENGTH = 200
+    
     class Meta:
         ordering = ['-last_message_at']
         # Ensure one active room per user/session
@@ -619,9 +849,58 @@ class ChatRoom(models.Model):
         else:
             return 'Anonymous'
     
+    def save(self, *args, **kwargs):
+        # Never write back possibly stale counters loaded with this instance
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+    
     def get_unread_count(self):
         """Get count of unread messages from customer"""
-        return self.messages.filter(sender_type='customer', is_read=False).count()
+        return self.unread_by_admin
+    
+    def _mark_read(self, sender_types, counter):
+        from django.db import transaction
+        with transaction.atomic():
+            # Lock the room first, in the same order as ChatMessage.save
+            ChatRoom.objects.select_for_update().filter(pk=self.pk).values_list('pk', flat=True).first()
+            updated = self.messages.filter(sender_type__in=sender_types, is_read=False).update(is_read=True)
+            ChatRoom.objects.filter(pk=self.pk).update(**{counter: 0})
+        setattr(self, counter, 0)
+        return updated
+    
+    def mark_read_by_admin(self):
+        """Mark all customer messages as read; returns the number updated"""
+        return self._mark_read(['customer'], 'unread_by_admin')
+    
+    def mark_read_by_customer(self):
+        """Mark all admin/system messages as read; returns the number updated"""
+        return self._mark_read(['admin', 'system'], 'unread_by_customer')
+    
+    @classmethod
+    def recompute_counters(cls, room_ids=None):
+        """Recompute the denormalized counters from the messages; returns rooms updated"""
+        from django.db.models import Count, OuterRef, Q, Subquery
+        latest = ChatMessage.objects.filter(room=OuterRef('pk')).order_by('-created_at', '-id')
+        rooms = cls.objects.all() if room_ids is None else cls.objects.filter(pk__in=room_ids)
+        rooms = rooms.annotate(
+            admin_unread=Count('messages', filter=Q(messages__sender_type='customer', messages__is_read=False)),
+            customer_unread=Count('messages', filter=Q(messages__sender_type__in=['admin', 'system'], messages__is_read=False)),
+            latest_content=Subquery(latest.values('content')[:1]),
+        ).only('pk', *cls.COUNTER_FIELDS)
+        changed = []
+        for room in rooms:
+            preview = (room.latest_content or '')[:cls.PREVIEW_LENGTH]
+            if (room.unread_by_admin, room.unread_by_customer, room.last_message_preview) != (room.admin_unread, room.customer_unread, preview):
+                room.unread_by_admin = room.admin_unread
+                room.unread_by_customer = room.customer_unread
+                room.last_message_preview = preview
+                changed.append(room)
+        cls.objects.bulk_update(changed, cls.COUNTER_FIELDS, batch_size=500)
+        return len(changed)
 
 class ChatMessage(models.Model):
     """Individual messages within a chat room"""
@@ -641,6 +920,28 @@ class ChatMessage(models.Model):
     
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            # Backs cursor paging of a room's history (chat_history.get_message_page)
+            models.Index(fields=['room', 'created_at', 'id'], name='chatmsg_room_created_id_idx'),
+        ]
+    
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            return super().save(*args, **kwargs)
+        from django.db import transaction
+        from django.db.models import F
+        counters = {
+            'last_message_preview': (self.content or '')[:ChatRoom.PREVIEW_LENGTH],
+        }
+        if not self.is_read:
+            if self.sender_type == 'customer':
+                counters['unread_by_admin'] = F('unread_by_admin') + 1
+            else:
+                counters['unread_by_customer'] = F('unread_by_customer') + 1
+        with transaction.atomic():
+            # Update the room before inserting so the room row is always locked first
+            ChatRoom.objects.filter(pk=self.room_id).update(**counters)
+            super().save(*args, **kwargs)
     
     def __str__(self):
         return f"{self.sender_type}: {self.content[:50]}..."
@@ -709,4 +1010,50 @@ class ServiceQuery(models.Model):
         ordering = ['-created_at']
     
     def __str__(self):
-        return f"{self.name} - {self.get_query_type_display()} for {self.service.name}"
\ No newline at end of file
+        return f"{self.name} - {self.get_query_type_display()} for {self.service.name}"
+
+# --- Media storage ---
+class StoredBlob(models.Model):
+    """A content-addressed media file and how many rows reference it (see content_storage)"""
+    name = models.CharField(max_length=255, unique=True)
+    size = models.BigIntegerField(default=0)
+    ref_count = models.IntegerField(default=0)
+    unreferenced_at = models.DateTimeField(null=True, blank=True, db_index=True, help_text="When ref_count last dropped to 0")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count} refs)"
+
+# --- Realtime delta sync ---
+class ChangeVersion(models.Model):
+    """Latest change version of one realtime resource (see change_log)"""
+    resource = models.CharField(max_length=50, primary_key=True)
+    version = models.BigIntegerField(default=0)
+    compacted_through = models.BigIntegerField(default=0, help_text="Log entries up to this version have been deleted")
+
+    def __str__(self):
+        return f"{self.resource} v{self.version}"
+
+class ChangeLogEntry(models.Model):
+    """One created/updated/deleted row, or a reset after a bulk run, at a resource version"""
+    ACTION_CHOICES = [
+        ('created', 'Created'),
+        ('updated', 'Updated'),
+        ('deleted', 'Deleted'),
+        ('reset', 'Reset'),
+    ]
+
+    resource = models.CharField(max_length=50)
+    version = models.BigIntegerField()
+    object_id = models.BigIntegerField(null=True, blank=True)
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        ordering = ['resource', 'version']
+        constraints = [
+            models.UniqueConstraint(fields=['resource', 'version'], name='unique_change_version'),
+        ]
+
+    def __str__(self):
+        return f"{self.resource} v{self.version}: {self.action} {self.object_id or ''}"
@@ -3,8 +3,9 @@ Performance optimizations for admin management sections.
 This module contains optimizations to fix excessive loading and message issues.
 """
 
-from django.db.models import Prefetch, Count
+from django.db.models import Prefetch, Count, Avg, OuterRef, Subquery
 from django.core.cache import cache
+from .cache_utils import tagged_cache_key
 from django.db import connection
 from django.conf import settings
 import logging
@@ -35,14 +36,30 @@ def get_optimized_category_queryset():
 
 def get_optimized_product_queryset():
     """
-    Optimizes the Product queryset by selecting related brand and category,
-    and prefetching images.
+    Optimizes the Product queryset for ProductSerializer.
+
+    Review aggregates and the main image path are computed in SQL as
+    ``annotated_average_rating``, ``annotated_review_count`` and
+    ``main_image_path``, and one level of category children is prefetched
+    for ``category_data.children_count``, so serializing N products costs a
+    constant number of queries.
     """
-    from .models import Product
+    from .models import Product, ProductImage
+    # Same precedence as ProductImage.Meta.ordering: main image first, then newest
+    main_image = (
+        ProductImage.objects.filter(product=OuterRef("pk"))
+        .order_by("-is_main", "-created_at")
+        .values("image")[:1]
+    )
     return (
         Product.objects.all()
         .select_related("brand", "category")
-        .prefetch_related("images")
+        .prefetch_related("images", "category__children")
+        .annotate(
+            annotated_average_rating=Avg("reviews__rating"),
+            annotated_review_count=Count("reviews"),
+            main_image_path=Subquery(main_image),
+        )
         .order_by("-created_at")
     )
 
@@ -97,13 +114,14 @@ def cache_queryset_result(cache_key, queryset_func, timeout=300):
     logger.debug(f"Cached {len(data)} items for {cache_key}")
     return data
 
-def cache_api_response(cache_key, timeout=300):
+def cache_api_response(cache_key, timeout=300, tags=()):
     """
     Decorator to cache API responses for better performance.
     
     Args:
         cache_key: The cache key to use
         timeout: Cache timeout in seconds (default: 5 minutes)
+        tags: Cache tags whose invalidation expires the cached response
     """
     def decorator(func):
         @wraps(func)
@@ -111,7 +129,7 @@ def cache_api_response(cache_key, timeout=300):
             # Create cache key with request parameters
             params = request.query_params.dict()
             param_str = '_'.join([f"{k}_{v}" for k, v in sorted(params.items())])
-            full_cache_key = f"{cache_key}_{param_str}"
+            full_cache_key = tagged_cache_key(f"{cache_key}_{param_str}", tags)
             
             # Try to get from cache first
             cached_data = cache.get(full_cache_key)
@@ -225,14 +243,14 @@ class CachedCategoryViewSetMixin:
     Mixin to add caching to Category ViewSets.
     """
     
-    @cache_api_response('categories_list', timeout=300)
+    @cache_api_response('categories_list', timeout=300, tags=('categories',))
     def list(self, request, *args, **kwargs):
         """
         Cached list method for categories.
         """
         return super().list(request, *args, **kwargs)
     
-    @cache_api_response('categories_tree', timeout=300)
+    @cache_api_response('categories_tree', timeout=300, tags=('categories',))
     def tree(self, request, *args, **kwargs):
         """
         Cached tree method for categories.
@@ -244,7 +262,7 @@ class CachedProductViewSetMixin:
     Mixin to add caching to Product ViewSets.
     """
     
-    @cache_api_response('products_list', timeout=180)
+    @cache_api_response('products_list', timeout=180, tags=('products',))
     def list(self, request, *args, **kwargs):
         """
         Cached list method for products.
@@ -256,14 +274,14 @@ class CachedServiceViewSetMixin:
     Mixin to add caching to Service ViewSets.
     """
     
-    @cache_api_response('services_list', timeout=180)
+    @cache_api_response('services_list', timeout=180, tags=('services',))
     def list(self, request, *args, **kwargs):
         """
         Cached list method for services.
         """
         return super().list(request, *args, **kwargs)
     
-    @cache_api_response('service_categories_list', timeout=300)
+    @cache_api_response('service_categories_list', timeout=300, tags=('service_categories',))
     def list(self, request, *args, **kwargs):
         """
         Cached list method for service categories.
@@ -274,23 +292,9 @@ def clear_management_cache():
     """
     Clear all management-related cache entries.
     """
-    from adminpanel.cache_utils import safe_delete_pattern
-    
-    cache_patterns_to_clear = [
-        'categories_list*',
-        'categories_tree*',
-        'admin_categories_list*',
-        'admin_category_detail*',
-        'admin_category_tree*',
-        'admin_category_subcategories*',
-        'products_list*',
-        'services_list*',
-        'service_categories_list*',
-        'brands_list*'
-    ]
+    from adminpanel.cache_utils import invalidate_tags
     
-    for pattern in cache_patterns_to_clear:
-        safe_delete_pattern(pattern)
+    invalidate_tags("categories", "products", "services", "service_categories", "brands")
     
     logger.info("Cleared management cache entries")
 
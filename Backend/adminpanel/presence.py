@@ -0,0 +1,263 @@
+"""
+Who is connected to the chat sockets, shared between worker processes.
+
+Each socket holds a ``PresenceLease``. On connect, and then on its
+heartbeats, the lease counts itself into the current time bucket
+(``PRESENCE_TTL / 2`` seconds wide) of up to three counters:
+- its room's counter (customer sockets);
+- the live-room counter, when it is the first customer socket of its room
+  in that bucket;
+- the admin counter (admin sockets).
+
+Readers take the larger of the current and previous bucket, so every
+answer costs one ``get_many``. A lease that stops refreshing drops out
+after at most two buckets, when its counters expire. Sockets lost to a
+crashed worker are therefore reaped without any sweeper. A clean
+disconnect decrements every bucket the lease was counted in.
+
+Counters live in the Django cache (``PRESENCE_CACHE`` alias), so all
+workers see the same numbers only when that cache is shared. The settings
+make the default cache Redis when ``SHARED_CACHE_URL`` is set, which it is
+by default in "redis" channel layer mode. With the per-process LocMem
+default, each worker counts only its own sockets.
+``LocalPresenceStore`` keeps them in process memory explicitly, for tests
+and single-process runs (``PRESENCE_BACKEND = "local"``).
+"""
+import logging
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+CUSTOMER = "customer"
+ADMIN = "admin"
+PRESENCE_TTL = 90  # seconds; heartbeats (30s) must be well inside half of it
+
+
+class CachePresenceStore:
+    """Counters in a Django cache; ``incr`` is atomic on shared backends"""
+
+    def __init__(self, alias="default"):
+        self.cache = caches[alias]
+
+    def incr(self, key, timeout):
+        self.cache.add(key, 0, timeout)
+        try:
+            return self.cache.incr(key)
+        except ValueError:
+            # Expired between add() and incr()
+            self.cache.add(key, 0, timeout)
+            return self.cache.incr(key)
+
+    def decr(self, key):
+        try:
+            return self.cache.decr(key)
+        except ValueError:
+            # Already expired; nothing to take back
+            return None
+
+    def get_many(self, keys):
+        return self.cache.get_many(keys)
+
+
+class LocalPresenceStore:
+    """In-process counters with expiry, same semantics as the cache store"""
+
+    SWEEP_EVERY = 1000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {}  # key -> [value, expires_at]
+        self._ops = 0
+
+    def _live(self, key, now):
+        entry = self._values.get(key)
+        if entry is not None and entry[1] <= now:
+            del self._values[key]
+            return None
+        return entry
+
+    def _sweep(self, now):
+        self._ops += 1
+        if self._ops % self.SWEEP_EVERY == 0:
+            for key in [key for key, (_, expires_at) in self._values.items() if expires_at <= now]:
+                del self._values[key]
+
+    def incr(self, key, timeout):
+        now = time.monotonic()
+        with self._lock:
+            self._sweep(now)
+            entry = self._live(key, now)
+            if entry is None:
+                entry = self._values[key] = [0, now + timeout]
+            entry[0] += 1
+            return entry[0]
+
+    def decr(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._live(key, now)
+            if entry is None:
+                return None
+            entry[0] -= 1
+            return entry[0]
+
+    def get_many(self, keys):
+        now = time.monotonic()
+        with self._lock:
+            return {key: entry[0] for key in keys if (entry := self._live(key, now)) is not None}
+
+
+class PresenceLease:
+    """One socket's presence; held by the consumer for its lifetime"""
+
+    __slots__ = ("kind", "room", "buckets")
+
+    def __init__(self, kind, room=None):
+        self.kind = kind
+        self.room = None if room is None else str(room)
+        self.buckets = []
+
+
+class Presence:
+    def __init__(self, store, ttl=PRESENCE_TTL):
+        self.store = store
+        self.width = max(1, int(ttl // 2))
+        # Long enough for the previous bucket to still be readable
+        self.timeout = self.width * 3
+
+    def _bucket(self):
+        return int(time.time() // self.width)
+
+    @staticmethod
+    def _room_key(room, bucket):
+        return f"presence:room:{room}:{bucket}"
+
+    @staticmethod
+    def _rooms_key(bucket):
+        return f"presence:rooms:{bucket}"
+
+    @staticmethod
+    def _admins_key(bucket):
+        return f"presence:admins:{bucket}"
+
+    def join(self, kind, room=None):
+        lease = PresenceLease(kind, room)
+        self.touch(lease)
+        return lease
+
+    def due(self, lease):
+        """Whether ``touch`` would do anything (cheap; no I/O)"""
+        return self._bucket() not in lease.buckets
+
+    def touch(self, lease):
+        """Count the lease into the current bucket; call from heartbeats"""
+        bucket = self._bucket()
+        if bucket in lease.buckets:
+            return
+        if lease.kind == ADMIN:
+            self.store.incr(self._admins_key(bucket), self.timeout)
+        elif self.store.incr(self._room_key(lease.room, bucket), self.timeout) == 1:
+            self.store.incr(self._rooms_key(bucket), self.timeout)
+        # Older buckets are no longer read
+        lease.buckets = lease.buckets[-1:] + [bucket]
+
+    def leave(self, lease):
+        for bucket in lease.buckets:
+            if lease.kind == ADMIN:
+                self.store.decr(self._admins_key(bucket))
+            elif self.store.decr(self._room_key(lease.room, bucket)) == 0:
+                self.store.decr(self._rooms_key(bucket))
+        lease.buckets = []
+
+    def _counts(self, key):
+        bucket = self._bucket()
+        values = self.store.get_many([key(bucket), key(bucket - 1)])
+        return max(0, values.get(key(bucket), 0), values.get(key(bucket - 1), 0))
+
+    def admins_online(self):
+        return self._counts(self._admins_key)
+
+    def live_room_count(self):
+        """Rooms with at least one live customer socket"""
+        return self._counts(self._rooms_key)
+
+    def room_connections(self, room):
+        return self._counts(lambda bucket: self._room_key(room, bucket))
+
+    def room_counts(self, rooms):
+        """``{room: live customer sockets}`` for ``rooms``, in one round trip"""
+        bucket = self._bucket()
+        rooms = [str(room) for room in rooms]
+        keys = [self._room_key(room, b) for room in rooms for b in (bucket, bucket - 1)]
+        values = self.store.get_many(keys) if keys else {}
+        return {
+            room: max(0, values.get(self._room_key(room, bucket), 0), values.get(self._room_key(room, bucket - 1), 0))
+            for room in rooms
+        }
+
+    def live_rooms(self, rooms):
+        """The subset of ``rooms`` with a live customer"""
+        return {room for room, count in self.room_counts(rooms).items() if count}
+
+    def status(self):
+        """Summary sent to admin sockets"""
+        return {'admin_online': self.admins_online() > 0, 'active_customers': self.live_room_count()}
+
+
+_presence = None
+_presence_lock = threading.Lock()
+
+
+def get_presence():
+    global _presence
+    with _presence_lock:
+        if _presence is None:
+            if getattr(settings, "PRESENCE_BACKEND", "cache") == "local":
+                store = LocalPresenceStore()
+            else:
+                store = CachePresenceStore(getattr(settings, "PRESENCE_CACHE", "default"))
+            _presence = Presence(store, getattr(settings, "PRESENCE_TTL", PRESENCE_TTL))
+        return _presence
+
+
+# --- Async helpers for consumers ---
+
+async def ajoin(kind, room=None):
+    return await sync_to_async(get_presence().join, thread_sensitive=False)(kind, room)
+
+
+async def atouch(lease):
+    if lease is not None and get_presence().due(lease):
+        try:
+            await sync_to_async(get_presence().touch, thread_sensitive=False)(lease)
+        except Exception as e:
+            logger.warning(f"Presence refresh failed: {e}")
+
+
+def _touch_all(leases):
+    for lease in leases:
+        get_presence().touch(lease)
+
+
+async def atouch_many(leases):
+    """``atouch`` for many sockets in one thread hop (the shared heartbeat)"""
+    due = [lease for lease in leases if get_presence().due(lease)]
+    if due:
+        try:
+            await sync_to_async(_touch_all, thread_sensitive=False)(due)
+        except Exception as e:
+            logger.warning(f"Presence refresh failed: {e}")
+
+
+async def aleave(lease):
+    if lease is not None:
+        await sync_to_async(get_presence().leave, thread_sensitive=False)(lease)
+
+
+async def astatus():
+    return await sync_to_async(get_presence().status, thread_sensitive=False)()
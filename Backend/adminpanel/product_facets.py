@@ -0,0 +1,128 @@
+"""
+Facet counts for the storefront product filters.
+
+Every facet is a single grouped or conditional aggregate query, so a filter
+sidebar costs a handful of small queries instead of a full catalog download.
+Category counts are rolled up the materialized tree paths, so a parent's
+count covers its whole subtree.
+"""
+from decimal import Decimal
+
+from django.db.models import Count, Max, Min, Q
+
+# (label, lower bound inclusive, upper bound exclusive or None)
+PRICE_BUCKETS = [
+    ("Under £25", None, Decimal("25")),
+    ("£25 - £50", Decimal("25"), Decimal("50")),
+    ("£50 - £100", Decimal("50"), Decimal("100")),
+    ("£100 - £250", Decimal("100"), Decimal("250")),
+    ("£250 - £500", Decimal("250"), Decimal("500")),
+    ("£500 - £1000", Decimal("500"), Decimal("1000")),
+    ("£1000 and over", Decimal("1000"), None),
+]
+
+DISCOUNT_BANDS = [
+    ("No discount", None, Decimal("0.01")),
+    ("Up to 10%", Decimal("0.01"), Decimal("10")),
+    ("10% - 25%", Decimal("10"), Decimal("25")),
+    ("25% - 50%", Decimal("25"), Decimal("50")),
+    ("50% and over", Decimal("50"), None),
+]
+
+
+def _range_q(field, low, high):
+    q = Q()
+    if low is not None:
+        q &= Q(**{f"{field}__gte": low})
+    if high is not None:
+        q &= Q(**{f"{field}__lt": high})
+    return q
+
+
+def _bucket_aggregates(prefix, field, buckets):
+    return {
+        f"{prefix}_{i}": Count("id", filter=_range_q(field, low, high))
+        for i, (_, low, high) in enumerate(buckets)
+    }
+
+
+def _bucket_counts(counts, prefix, buckets):
+    return [
+        {"label": label, "min": low, "max": high, "count": counts[f"{prefix}_{i}"]}
+        for i, (label, low, high) in enumerate(buckets)
+    ]
+
+
+def brand_facets(queryset):
+    rows = (
+        queryset.values("brand_id", "brand__name")
+        .annotate(count=Count("id"))
+        .order_by("-count", "brand__name")
+    )
+    return [
+        {"id": row["brand_id"], "name": row["brand__name"], "count": row["count"]}
+        for row in rows if row["brand_id"] is not None
+    ]
+
+
+def category_facets(queryset):
+    """Product counts per category, each including all of its descendants"""
+    from .models import Category
+
+    direct = dict(
+        queryset.values_list("category_id").annotate(count=Count("id")).order_by()
+    )
+    if not direct:
+        return []
+
+    categories = {
+        pk: (name, parent_id, tree_path, tree_depth)
+        for pk, name, parent_id, tree_path, tree_depth in Category.objects.values_list(
+            "id", "name", "parent_id", "tree_path", "tree_depth"
+        )
+    }
+    totals = {}
+    for category_id, count in direct.items():
+        if category_id not in categories:
+            continue
+        tree_path = categories[category_id][2]
+        ancestor_ids = [int(pk) for pk in tree_path.strip("/").split("/") if pk]
+        for pk in ancestor_ids + [category_id]:
+            totals[pk] = totals.get(pk, 0) + count
+
+    facets = [
+        {
+            "id": pk,
+            "name": categories[pk][0],
+            "parent": categories[pk][1],
+            "depth": categories[pk][3],
+            "count": count,
+        }
+        for pk, count in totals.items() if pk in categories
+    ]
+    facets.sort(key=lambda facet: (facet["depth"], -facet["count"], facet["name"]))
+    return facets
+
+
+def compute_product_facets(queryset, brand_queryset=None, category_queryset=None, price_queryset=None):
+    """
+    Facet counts for ``queryset``. Each facet may be computed over its own
+    queryset so that it can ignore its own filter.
+    """
+    brand_queryset = queryset if brand_queryset is None else brand_queryset
+    category_queryset = queryset if category_queryset is None else category_queryset
+    price_queryset = queryset if price_queryset is None else price_queryset
+
+    # Discount bands and price buckets are one conditional aggregate each
+    counts = queryset.aggregate(total=Count("id"), **_bucket_aggregates("discount", "discount_rate", DISCOUNT_BANDS))
+    price_counts = price_queryset.aggregate(
+        min=Min("price"), max=Max("price"), **_bucket_aggregates("price", "price", PRICE_BUCKETS)
+    )
+    return {
+        "total": counts["total"],
+        "brands": brand_facets(brand_queryset),
+        "categories": category_facets(category_queryset),
+        "discounts": _bucket_counts(counts, "discount", DISCOUNT_BANDS),
+        "prices": _bucket_counts(price_counts, "price", PRICE_BUCKETS),
+        "price_range": {"min": price_counts["min"], "max": price_counts["max"]},
+    }
@@ -0,0 +1,164 @@
+"""
+Minimal Redis-compatible pub/sub broker.
+
+Implements just enough of the Redis protocol (PUBLISH, SUBSCRIBE,
+UNSUBSCRIBE, PING and the connection handshake) for
+``channels_redis.pubsub.RedisPubSubChannelLayer``, so several ASGI workers
+can share channel groups on a development machine without installing
+Redis, and tests or benchmarks can start a broker in-process:
+
+    broker = PubSubBroker()
+    url = broker.start_in_thread()   # "redis://127.0.0.1:<port>/0"
+    ...
+    broker.stop_thread()
+
+It keeps no data and has no persistence or auth; use a real Redis server
+in production.
+"""
+import asyncio
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+def _bulk(value):
+    if isinstance(value, str):
+        value = value.encode()
+    return b"$%d\r\n%s\r\n" % (len(value), value)
+
+
+def _array(*items):
+    parts = [b"*%d\r\n" % len(items)]
+    for item in items:
+        parts.append(b":%d\r\n" % item if isinstance(item, int) else _bulk(item))
+    return b"".join(parts)
+
+
+class PubSubBroker:
+    def __init__(self, host="127.0.0.1", port=0):
+        self.host = host
+        self.port = port
+        self.subscribers = {}  # channel -> set of StreamWriter
+        self._server = None
+        self._loop = None
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"redis://{self.host}:{self.port}/0"
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle_client, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"Pub/sub broker listening on {self.url}")
+        return self.url
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    def start_in_thread(self):
+        """Run the broker on its own event loop in a daemon thread; returns its URL"""
+        started = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            self._loop.run_until_complete(self.start())
+            started.set()
+            self._loop.run_forever()
+            self._loop.run_until_complete(self.stop())
+            self._loop.close()
+
+        self._thread = threading.Thread(target=run, name="pubsub-broker", daemon=True)
+        self._thread.start()
+        started.wait()
+        return self.url
+
+    def stop_thread(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop = None
+            self._thread = None
+
+    async def _read_command(self, reader):
+        line = await reader.readline()
+        if not line:
+            return None
+        if not line.startswith(b"*"):
+            # Inline command, e.g. "PING\r\n" from telnet
+            return line.split()
+        args = []
+        for _ in range(int(line[1:])):
+            header = await reader.readline()
+            length = int(header[1:])
+            data = await reader.readexactly(length + 2)
+            args.append(data[:-2])
+        return args
+
+    async def _handle_client(self, reader, writer):
+        subscriptions = set()
+        try:
+            while True:
+                args = await self._read_command(reader)
+                if args is None:
+                    break
+                if not args:
+                    continue
+                command = args[0].upper()
+                if command == b"PUBLISH" and len(args) == 3:
+                    writer.write(b":%d\r\n" % self.publish(args[1], args[2]))
+                elif command == b"SUBSCRIBE":
+                    for channel in args[1:]:
+                        subscriptions.add(channel)
+                        self.subscribers.setdefault(channel, set()).add(writer)
+                        writer.write(_array(b"subscribe", channel, len(subscriptions)))
+                elif command == b"UNSUBSCRIBE":
+                    for channel in args[1:] or list(subscriptions):
+                        self._unsubscribe(channel, writer)
+                        subscriptions.discard(channel)
+                        writer.write(_array(b"unsubscribe", channel, len(subscriptions)))
+                elif command == b"PING":
+                    if subscriptions:
+                        writer.write(_array(b"pong", args[1] if len(args) > 1 else b""))
+                    else:
+                        writer.write(b"+PONG\r\n")
+                elif command in (b"CLIENT", b"SELECT"):
+                    writer.write(b"+OK\r\n")
+                elif command == b"QUIT":
+                    writer.write(b"+OK\r\n")
+                    break
+                else:
+                    writer.write(b"-ERR unknown command '%s'\r\n" % args[0])
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            for channel in subscriptions:
+                self._unsubscribe(channel, writer)
+            writer.close()
+
+    def publish(self, channel, data):
+        """Deliver ``data`` to every subscriber of ``channel``; returns the receiver count"""
+        writers = self.subscribers.get(channel, ())
+        if writers:
+            frame = _array(b"message", channel, data)
+            for writer in writers:
+                writer.write(frame)
+        return len(writers)
+
+    def _unsubscribe(self, channel, writer):
+        writers = self.subscribers.get(channel)
+        if writers is not None:
+            writers.discard(writer)
+            if not writers:
+                del self.subscribers[channel]
@@ -0,0 +1,213 @@
+"""
+Buffered realtime broadcasts to the ``admin_realtime`` group.
+
+Model signal handlers call ``queue_update``, which records the change only
+once the surrounding transaction commits, so rolled-back rows are never
+announced. Writes that fire no signals (``QuerySet.update``,
+``bulk_update``) call ``rows_changed`` for the rows they touched. Changes are coalesced per resource and id for
+``REALTIME_BROADCAST_WINDOW`` seconds and then sent from a timer thread as
+one ``data_update`` message per resource::
+
+    {"type": "data_update", "resource": "products", "action": "batch",
+     "version": 42, "created": [...], "updated": [...], "deleted": [...],
+     "data": [...], "timestamp": "..."}
+
+``version`` is the resource's change_log version once the batch was
+committed, so clients can resume with ``since=<version>`` after a reconnect.
+
+``data`` holds the created/updated rows, serialized after commit, and is
+left out when there are more than ``REALTIME_BATCH_INLINE`` of them (clients
+refetch instead). Inside ``suppress_broadcasts()`` nothing is queued or
+logged; each resource touched gets a change-log reset and a single
+``refresh`` message when the block exits.
+"""
+import atexit
+import logging
+import threading
+from contextlib import contextmanager
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .change_log import current_version, merge_action, record_change, record_resets
+
+logger = logging.getLogger(__name__)
+
+GROUP = "admin_realtime"
+
+_lock = threading.Lock()
+_pending = {}  # resource -> {pk: action}
+_timer = None
+_local = threading.local()
+
+
+def _window():
+    return getattr(settings, "REALTIME_BROADCAST_WINDOW", 0.25)
+
+
+def _inline_limit():
+    return getattr(settings, "REALTIME_BATCH_INLINE", 50)
+
+
+def resources():
+    """``{resource: (queryset, serializer class)}`` for every broadcast resource"""
+    from .models import Brand, Category, Product, Service, ServiceCategory
+    from .serializers import (
+        BrandSerializer, CategoryListSerializer, ProductSerializer, ServiceCategorySerializer, ServiceSerializer,
+    )
+
+    return {
+        "categories": (Category.objects.select_related("parent").prefetch_related("children"), CategoryListSerializer),
+        "products": (
+            Product.objects.select_related("brand", "category").prefetch_related("images"), ProductSerializer
+        ),
+        "services": (Service.objects.select_related("category"), ServiceSerializer),
+        "service_categories": (ServiceCategory.objects.all(), ServiceCategorySerializer),
+        "brands": (Brand.objects.all(), BrandSerializer),
+    }
+
+
+def send_message(message):
+    """Send one message to every connected admin client"""
+    try:
+        channel_layer = get_channel_layer()
+        if channel_layer:
+            async_to_sync(channel_layer.group_send)(GROUP, message)
+    except Exception as e:
+        logger.error(f"Error broadcasting {message.get('resource')} {message.get('action')}: {e}")
+
+
+def _serialize(resource, ids):
+    queryset, serializer_class = resources()[resource]
+    return serializer_class(queryset.filter(pk__in=ids), many=True).data
+
+
+def build_message(resource, changes, action="batch", version=None, include_data=None):
+    """
+    ``data_update`` message for ``{pk: action}`` changes; ``include_data``
+    defaults to whether the live rows fit under ``REALTIME_BATCH_INLINE``.
+    """
+    by_action = {"created": [], "updated": [], "deleted": []}
+    for pk, change in changes.items():
+        by_action[change].append(pk)
+    for ids in by_action.values():
+        ids.sort()
+    message = {
+        "type": "data_update",
+        "resource": resource,
+        "action": action,
+        "version": current_version(resource) if version is None else version,
+        **by_action,
+        "timestamp": timezone.now().isoformat(),
+    }
+    live = by_action["created"] + by_action["updated"]
+    if include_data is None:
+        include_data = len(live) <= _inline_limit()
+    if include_data:
+        message["data"] = _serialize(resource, live) if live else []
+    return message
+
+
+def flush():
+    """Send everything buffered now"""
+    global _pending, _timer
+    with _lock:
+        batch, _pending = _pending, {}
+        if _timer is not None:
+            _timer.cancel()
+            _timer = None
+    for resource, changes in batch.items():
+        try:
+            message = build_message(resource, changes)
+        except Exception as e:
+            logger.error(f"Error preparing {resource} broadcast: {e}")
+            continue
+        send_message(message)
+        logger.info(f"Broadcasted {len(changes)} {resource} change(s)")
+
+
+def _flush_in_thread():
+    try:
+        flush()
+    finally:
+        connection.close()
+
+
+def _buffer(resource, action, pk):
+    global _timer
+    with _lock:
+        changes = _pending.setdefault(resource, {})
+        changes[pk] = merge_action(changes.get(pk), action)
+        if _window() > 0 and _timer is None:
+            _timer = threading.Timer(_window(), _flush_in_thread)
+            _timer.daemon = True
+            _timer.start()
+    if _window() <= 0:
+        flush()
+
+
+def broadcasts_suppressed():
+    return getattr(_local, "touched", None) is not None
+
+
+def queue_update(resource, action, pk):
+    """Announce that ``pk`` of ``resource`` was created, updated or deleted, once committed"""
+    touched = getattr(_local, "touched", None)
+    if touched is not None:
+        touched.add(resource)
+        return
+    transaction.on_commit(lambda: _buffer(resource, action, pk))
+
+
+def rows_changed(resource, action, pks):
+    """Log ``pks`` of ``resource`` for delta sync and announce them; the signal handlers use this too"""
+    for pk in pks:
+        record_change(resource, action, pk)
+        queue_update(resource, action, pk)
+
+
+@contextmanager
+def suppress_broadcasts(notify=True):
+    """
+    Skip per-row broadcasts for bulk work (seeding, imports). With
+    ``notify``, each resource touched gets one ``refresh`` message on exit
+    (after commit). Usable as a decorator on ``Command.handle``.
+
+    Yields the set of touched resources; bulk_create/bulk_update fire no
+    signals, so add the resources they change to it.
+    """
+    if getattr(_local, "touched", None) is not None:
+        # Nested: the outermost block reports
+        yield _local.touched
+        return
+    _local.touched = set()
+    try:
+        yield _local.touched
+    finally:
+        touched, _local.touched = sorted(_local.touched), None
+        if touched:
+            # Rows changed without a log entry; clients behind this must resync
+            try:
+                record_resets(touched)
+            except Exception as e:
+                logger.error(f"Could not record change log reset for {touched}: {e}")
+            if notify:
+                transaction.on_commit(lambda: _send_refresh(touched))
+
+
+def _send_refresh(names):
+    for resource in names:
+        send_message({
+            "type": "data_update",
+            "resource": resource,
+            "action": "refresh",
+            "version": current_version(resource),
+            "timestamp": timezone.now().isoformat(),
+        })
+
+
+# Don't lose a pending window when a management command exits
+atexit.register(flush)
@@ -5,12 +5,30 @@ from channels.db import database_sync_to_async
 from django.contrib.auth.models import AnonymousUser
 from django.core.cache import cache
 from django.utils import timezone
-import asyncio
+
+from .change_log import RESOURCES, changes_since, current_version
+from .heartbeat import HeartbeatMixin
 
 logger = logging.getLogger(__name__)
 
-class AdminRealtimeConsumer(AsyncWebsocketConsumer):
-    """WebSocket consumer for real-time admin dashboard updates"""
+class AdminRealtimeConsumer(HeartbeatMixin, AsyncWebsocketConsumer):
+    """
+    WebSocket consumer for real-time admin dashboard updates.
+
+    Clients keep the ``version`` of each resource from the last message they
+    applied and resync with ``{"type": "sync", "resource": ..., "since": N}``.
+    The answer is a ``delta`` with only the rows changed after N, or a
+    ``bulk_update`` snapshot when the change log no longer reaches back to N.
+    A ``refresh_request`` without ``since`` always gets a snapshot.
+    """
+
+    SNAPSHOT_ORDERING = {
+        'categories': 'name',
+        'products': '-created_at',
+        'services': '-created_at',
+        'service_categories': 'name',
+        'brands': 'name',
+    }
     
     async def connect(self):
         try:
@@ -38,7 +56,6 @@ class AdminRealtimeConsumer(AsyncWebsocketConsumer):
             self.user = user
             self.group_name = 'admin_realtime'
             self.connection_id = f"admin_realtime_{user.id}_{id(self)}"
-            self.heartbeat_task = None
             
             await self.accept()
             logger.info("Admin Realtime WS accepted user=%s", user.id)
@@ -54,8 +71,8 @@ class AdminRealtimeConsumer(AsyncWebsocketConsumer):
                 await self.close(code=1011)
                 return
             
-            # Start heartbeat
-            self.heartbeat_task = asyncio.create_task(self.heartbeat())
+            # Heartbeats come from the shared per-process scheduler
+            self.start_heartbeat()
             
             # Send initial connection confirmation
             await self.send(text_data=json.dumps({
@@ -72,13 +89,8 @@ class AdminRealtimeConsumer(AsyncWebsocketConsumer):
     async def disconnect(self, close_code):
         logger.info("Admin Realtime WS disconnect code=%s", close_code)
         
-        # Stop heartbeat task
-        if hasattr(self, 'heartbeat_task') and self.heartbeat_task:
-            self.heartbeat_task.cancel()
-            try:
-                await self.heartbeat_task
-            except asyncio.CancelledError:
-                pass
+        # Stop heartbeat
+        self.stop_heartbeat()
         
         # Leave admin group
         try:
@@ -111,10 +123,12 @@ class AdminRealtimeConsumer(AsyncWebsocketConsumer):
                     'timestamp': timezone.now().isoformat()
                 }))
                 
-            elif message_type == 'refresh_request':
-                # Handle refresh request
+            elif message_type in ('sync', 'refresh_request'):
                 resource = data.get('resource')
-                if resource:
+                since = data.get('since')
+                if resource and since is not None:
+                    await self.handle_sync_request(resource, since)
+                elif resource:
                     await self.handle_refresh_request(resource)
                     
             else:
@@ -125,33 +139,19 @@ class AdminRealtimeConsumer(AsyncWebsocketConsumer):
         except Exception as e:
             logger.error(f"Error in receive: {e}")
 
-    async def heartbeat(self):
-        """Send periodic heartbeat to maintain connection"""
-        try:
-            while True:
-                await asyncio.sleep(30)  # Send heartbeat every 30 seconds
-                await self.send(text_data=json.dumps({
-                    'type': 'heartbeat',
-                    'timestamp': timezone.now().isoformat()
-                }))
-        except asyncio.CancelledError:
-            logger.info("Heartbeat task cancelled")
-        except Exception as e:
-            logger.error("Heartbeat error: %s", e)
-
     async def handle_refresh_request(self, resource):
         """Handle refresh request for specific resource"""
         try:
             logger.info(f"Handling refresh request for resource: {resource}")
             
-            # Get fresh data based on resource type
-            if resource in ['categories', 'products', 'services']:
-                fresh_data = await self.get_fresh_data(resource)
+            if resource in RESOURCES:
+                version, fresh_data = await self.get_fresh_data(resource)
                 
                 await self.send(text_data=json.dumps({
                     'type': 'data_update',
                     'resource': resource,
                     'action': 'bulk_update',
+                    'version': version,
                     'data': fresh_data,
                     'timestamp': timezone.now().isoformat()
                 }))
@@ -159,38 +159,50 @@ class AdminRealtimeConsumer(AsyncWebsocketConsumer):
         except Exception as e:
             logger.error(f"Error handling refresh request for {resource}: {e}")
 
+    async def handle_sync_request(self, resource, since):
+        """Send what changed in ``resource`` after version ``since``"""
+        try:
+            since = int(since)
+        except (TypeError, ValueError):
+            logger.warning(f"Invalid sync version {since!r} for {resource}")
+            return
+        if resource not in RESOURCES or since < 0:
+            logger.warning(f"Invalid sync request for {resource} since {since}")
+            return
+        try:
+            message = await self.get_changes(resource, since)
+            if message is None:
+                await self.handle_refresh_request(resource)
+            else:
+                await self.send(text_data=json.dumps(message))
+        except Exception as e:
+            logger.error(f"Error handling sync request for {resource} since {since}: {e}")
+
+    @database_sync_to_async
+    def get_changes(self, resource, since):
+        """Delta message since ``since``, or None when a snapshot is needed"""
+        from .realtime_broadcast import build_message
+
+        delta = changes_since(resource, since)
+        if delta is None:
+            return None
+        version, changes = delta
+        return build_message(resource, changes, action='delta', version=version, include_data=True)
+
     @database_sync_to_async
     def get_fresh_data(self, resource_type):
-        """Get fresh data for the specified resource type"""
+        """Snapshot of the specified resource type and the version it reflects"""
+        from .realtime_broadcast import resources
+
+        # Read the version first: anything changed meanwhile is in the next delta too
+        version = current_version(resource_type)
         try:
-            if resource_type == 'categories':
-                from .models import Category
-                from .serializers import CategoryListSerializer
-                categories = Category.objects.all().select_related("parent").prefetch_related("children").order_by("name")
-                serializer = CategoryListSerializer(categories, many=True)
-                return serializer.data
-                
-            elif resource_type == 'products':
-                from .models import Product
-                from .serializers import ProductSerializer
-                products = Product.objects.all().select_related("brand", "category").prefetch_related("images").order_by("-created_at")
-                serializer = ProductSerializer(products, many=True)
-                return serializer.data
-                
-            elif resource_type == 'services':
-                from .models import Service
-                from .serializers import ServiceSerializer
-                services = Service.objects.all().select_related("category").order_by("-created_at")
-                serializer = ServiceSerializer(services, many=True)
-                return serializer.data
-                
-            else:
-                logger.warning(f"Unknown resource type for refresh: {resource_type}")
-                return []
-                
+            queryset, serializer_class = resources()[resource_type]
+            queryset = queryset.order_by(self.SNAPSHOT_ORDERING[resource_type])
+            return version, serializer_class(queryset, many=True).data
         except Exception as e:
             logger.error(f"Error getting fresh data for {resource_type}: {e}")
-            return []
+            return version, []
 
     # Message handlers for different update types
     async def data_update(self, event):
@@ -0,0 +1,305 @@
+"""
+Daily sales and registration rollups for the admin dashboard.
+
+The dashboard reads only the rollup tables, so its cost depends on the
+number of days shown rather than on the size of the order history.
+
+Rows are kept current incrementally: saving or deleting an order, order
+item, payment or user marks the affected calendar day dirty, and after
+the transaction commits each dirty day is recomputed from the raw rows of
+that day alone. Recomputing (rather than adding deltas) keeps edits,
+deletions and status changes exact. ``backfill_sales_rollups`` rebuilds
+everything from scratch.
+"""
+import logging
+import threading
+from datetime import datetime, time, timedelta
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models import Count, F, Min, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import (
+    DailyProductSales, DailyRegistrations, DailySalesRollup, Order, OrderItem, SalesCustomer,
+)
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+
+_pending = threading.local()
+
+
+def _day_bounds(first, last):
+    """Aware datetimes spanning the local calendar days ``first``..``last``"""
+    start = timezone.make_aware(datetime.combine(first, time.min))
+    end = timezone.make_aware(datetime.combine(last + timedelta(days=1), time.min))
+    return start, end
+
+
+def _upsert(model, rows, unique_fields, update_fields):
+    if not rows:
+        return
+    kwargs = {}
+    if connection.features.supports_update_conflicts_with_target:
+        kwargs["unique_fields"] = unique_fields
+    model.objects.bulk_create(
+        rows, batch_size=BATCH_SIZE, update_conflicts=True, update_fields=update_fields, **kwargs
+    )
+
+
+# --- Recomputation ---
+
+def refresh_sales_days(days):
+    """Recompute the sales and product rollups for ``days`` from their orders"""
+    days = sorted(set(days))
+    if not days:
+        return
+    start, end = _day_bounds(days[0], days[-1])
+    wanted = set(days)
+    paid = Q(payment_status="paid")
+
+    totals = {
+        row["day"]: row
+        for row in Order.objects.filter(created_at__gte=start, created_at__lt=end)
+        .annotate(day=TruncDate("created_at")).order_by()
+        .values("day")
+        .annotate(
+            revenue=Sum("total_price"),
+            paid_revenue=Sum("total_price", filter=paid),
+            orders=Count("id"),
+            paid_orders=Count("id", filter=paid),
+            customers=Count("customer_email", distinct=True),
+        )
+        if row["day"] in wanted
+    }
+    product_rows = [
+        row
+        for row in OrderItem.objects.filter(order__created_at__gte=start, order__created_at__lt=end)
+        .annotate(day=TruncDate("order__created_at")).order_by()
+        .values("day", "product_id")
+        .annotate(units=Sum("quantity"), revenue=Sum(F("quantity") * F("unit_price")))
+        if row["day"] in wanted
+    ]
+    new_customers = dict(
+        SalesCustomer.objects.filter(first_order_day__in=days).order_by()
+        .values("first_order_day").annotate(n=Count("id"))
+        .values_list("first_order_day", "n")
+    )
+
+    units = {}
+    for row in product_rows:
+        units[row["day"]] = units.get(row["day"], 0) + (row["units"] or 0)
+
+    rollups = [
+        DailySalesRollup(
+            day=day,
+            revenue=row["revenue"] or 0,
+            paid_revenue=row["paid_revenue"] or 0,
+            orders=row["orders"],
+            paid_orders=row["paid_orders"],
+            units=units.get(day, 0),
+            customers=row["customers"],
+            new_customers=new_customers.get(day, 0),
+            updated_at=timezone.now(),
+        )
+        for day, row in totals.items()
+    ]
+    product_sales = [
+        DailyProductSales(day=row["day"], product_id=row["product_id"],
+                          units=row["units"] or 0, revenue=row["revenue"] or 0)
+        for row in product_rows
+    ]
+    live_pairs = {(row["day"], row["product_id"]) for row in product_rows}
+    stale_products = [
+        pk for pk, day, product_id in DailyProductSales.objects.filter(day__in=days)
+        .values_list("id", "day", "product_id")
+        if (day, product_id) not in live_pairs
+    ]
+
+    with transaction.atomic():
+        _upsert(DailySalesRollup, rollups, ["day"],
+                ["revenue", "paid_revenue", "orders", "paid_orders", "units",
+                 "customers", "new_customers", "updated_at"])
+        DailySalesRollup.objects.filter(day__in=wanted - set(totals)).delete()
+        _upsert(DailyProductSales, product_sales, ["day", "product"], ["units", "revenue"])
+        if stale_products:
+            DailyProductSales.objects.filter(pk__in=stale_products).delete()
+
+
+def refresh_registration_days(days):
+    """Recompute the registration rollups for ``days`` from auth users"""
+    days = sorted(set(days))
+    if not days:
+        return
+    start, end = _day_bounds(days[0], days[-1])
+    wanted = set(days)
+    counts = {
+        day: n
+        for day, n in User.objects.filter(date_joined__gte=start, date_joined__lt=end)
+        .annotate(day=TruncDate("date_joined")).order_by()
+        .values("day").annotate(n=Count("id")).values_list("day", "n")
+        if day in wanted
+    }
+    with transaction.atomic():
+        _upsert(DailyRegistrations, [DailyRegistrations(day=d, users=n) for d, n in counts.items()],
+                ["day"], ["users"])
+        DailyRegistrations.objects.filter(day__in=wanted - set(counts)).delete()
+
+
+def refresh_customers(emails):
+    """
+    Recompute the first order day of ``emails``. Returns the days whose
+    new-customer count changed as a result.
+    """
+    emails = {email for email in emails if email}
+    if not emails:
+        return set()
+    before = dict(
+        SalesCustomer.objects.filter(customer_email__in=emails)
+        .values_list("customer_email", "first_order_day")
+    )
+    after = {
+        email: timezone.localdate(first)
+        for email, first in Order.objects.filter(customer_email__in=emails).order_by()
+        .values("customer_email").annotate(first=Min("created_at"))
+        .values_list("customer_email", "first")
+    }
+    changed = {email for email in emails if before.get(email) != after.get(email)}
+    if not changed:
+        return set()
+
+    with transaction.atomic():
+        _upsert(SalesCustomer,
+                [SalesCustomer(customer_email=e, first_order_day=after[e]) for e in changed if e in after],
+                ["customer_email"], ["first_order_day"])
+        gone = [email for email in changed if email not in after]
+        if gone:
+            SalesCustomer.objects.filter(customer_email__in=gone).delete()
+
+    days = set()
+    for email in changed:
+        days.update(d for d in (before.get(email), after.get(email)) if d is not None)
+    return days
+
+
+def rebuild_customers():
+    """Rebuild SalesCustomer from every order; returns the number of customers"""
+    firsts = {
+        email: timezone.localdate(first)
+        for email, first in Order.objects.order_by()
+        .values("customer_email").annotate(first=Min("created_at"))
+        .values_list("customer_email", "first")
+    }
+    with transaction.atomic():
+        _upsert(SalesCustomer,
+                [SalesCustomer(customer_email=e, first_order_day=d) for e, d in firsts.items()],
+                ["customer_email"], ["first_order_day"])
+        stale = [
+            pk for pk, email in SalesCustomer.objects.values_list("id", "customer_email")
+            if email not in firsts
+        ]
+        for i in range(0, len(stale), BATCH_SIZE):
+            SalesCustomer.objects.filter(pk__in=stale[i:i + BATCH_SIZE]).delete()
+    return len(firsts)
+
+
+# --- Incremental maintenance (called from signals) ---
+
+def _state():
+    state = getattr(_pending, "state", None)
+    if state is None:
+        state = _pending.state = {
+            "sales_days": set(), "emails": set(), "order_ids": set(), "registration_days": set(),
+        }
+    return state
+
+
+def _schedule(key, values):
+    _state()[key].update(values)
+    # Every change registers a callback; the first to run drains the whole
+    # batch and the rest find nothing to do. A rolled-back batch is simply
+    # recomputed with the next one.
+    transaction.on_commit(flush_pending)
+
+
+def order_changed(order):
+    if order.created_at is None:
+        return
+    state = _state()
+    state["emails"].add(order.customer_email)
+    _schedule("sales_days", [timezone.localdate(order.created_at)])
+
+
+def order_rows_changed(order_id):
+    """An order item or payment changed; the order's day is resolved at flush time"""
+    if order_id is not None:
+        _schedule("order_ids", [order_id])
+
+
+def user_changed(user):
+    if user.date_joined is not None:
+        _schedule("registration_days", [timezone.localdate(user.date_joined)])
+
+
+def flush_pending():
+    state = getattr(_pending, "state", None)
+    _pending.state = None
+    if not state or not any(state.values()):
+        return
+    try:
+        sales_days = set(state["sales_days"])
+        emails = set(state["emails"])
+        if state["order_ids"]:
+            for created_at, email in Order.objects.filter(pk__in=state["order_ids"]).values_list(
+                "created_at", "customer_email"
+            ):
+                sales_days.add(timezone.localdate(created_at))
+                emails.add(email)
+        sales_days |= refresh_customers(emails)
+        refresh_sales_days(sales_days)
+        refresh_registration_days(state["registration_days"])
+    except Exception as e:
+        logger.error(f"Failed to refresh sales rollups: {e}")
+
+
+# --- Reading ---
+
+def dashboard_window(days=30):
+    """The local calendar days from ``days`` ago up to today, oldest first"""
+    today = timezone.localdate()
+    return [today - timedelta(days=offset) for offset in range(days, -1, -1)]
+
+
+def rebuild_rollups(since=None, chunk_days=31):
+    """
+    Rebuild every rollup from the raw rows, or only days from ``since`` on.
+    Returns ``(sales_days, registration_days)`` rebuilt.
+    """
+    rebuild_customers()
+    today = timezone.localdate()
+    rebuilt = []
+    for model, first_row, refresh in (
+        (DailySalesRollup, Order.objects.order_by("created_at").values_list("created_at", flat=True).first(),
+         refresh_sales_days),
+        (DailyRegistrations, User.objects.order_by("date_joined").values_list("date_joined", flat=True).first(),
+         refresh_registration_days),
+    ):
+        first = timezone.localdate(first_row) if first_row else today
+        if since is not None:
+            first = max(first, since)
+        day, count = first, 0
+        while day <= today:
+            chunk = [day + timedelta(days=i) for i in range(chunk_days) if day + timedelta(days=i) <= today]
+            refresh(chunk)
+            count += len(chunk)
+            day = chunk[-1] + timedelta(days=1)
+        if since is None:
+            # Days with no rows left at all, e.g. before the earliest order
+            model.objects.exclude(day__gte=first, day__lte=today).delete()
+            if model is DailySalesRollup:
+                DailyProductSales.objects.exclude(day__gte=first, day__lte=today).delete()
+        rebuilt.append(count)
+    return tuple(rebuilt)
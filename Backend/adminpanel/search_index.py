@@ -0,0 +1,234 @@
+"""
+In-memory inverted index for storefront product search.
+
+Products are tokenized from their name, brand, technical specs and
+description into a term -> {product_id: weight} posting table plus a sorted
+term list, so ranked lookups and prefix autocomplete never touch the
+database. Every query token is matched as a prefix; an exact term match
+scores its full field weight and a prefix match half of it.
+
+The index is built lazily per process and kept current by the Product and
+Brand signals in signals.py. A product save or delete advances the shared
+``search_index:products`` cache-tag version; on its next query each worker
+notices the bump, reads the products changed since its index was built from
+the delta-sync change log (change_log) and re-reads just those rows. Only
+``mark_search_index_stale`` (brand renames, catalogue imports) or a change
+log that no longer reaches back far enough triggers a full rebuild.
+"""
+import bisect
+import logging
+import re
+import threading
+from collections import defaultdict
+
+from .cache_utils import bump_tag_version, get_tag_versions
+
+logger = logging.getLogger(__name__)
+
+SEARCH_INDEX_TAG = "search_index"  # bumped to force a full rebuild
+SEARCH_DELTA_TAG = "search_index:products"  # bumped when products change
+
+# Relative weight of a term depending on the field it came from
+FIELD_WEIGHTS = {
+    "name": 5.0,
+    "brand": 3.0,
+    "technical_specs": 1.5,
+    "description": 1.0,
+}
+PREFIX_MATCH_FACTOR = 0.5
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text):
+    """Lower-cased word tokens of ``text``"""
+    if not text:
+        return []
+    return _TOKEN_RE.findall(str(text).lower())
+
+
+def _spec_text(specs):
+    """Flatten the technical_specs JSON into searchable text"""
+    if isinstance(specs, dict):
+        return " ".join(f"{key} {_spec_text(value)}" for key, value in specs.items())
+    if isinstance(specs, (list, tuple)):
+        return " ".join(_spec_text(value) for value in specs)
+    return "" if specs is None else str(specs)
+
+
+class SearchIndex:
+    """Posting table plus sorted vocabulary for prefix expansion"""
+
+    def __init__(self):
+        self.postings = defaultdict(dict)
+        self.doc_terms = {}
+        self.names = {}
+        self._vocabulary = None
+
+    def add(self, pk, name, brand_name="", technical_specs=None, description=""):
+        self.remove(pk)
+        weights = defaultdict(float)
+        fields = {
+            "name": name,
+            "brand": brand_name,
+            "technical_specs": _spec_text(technical_specs),
+            "description": description,
+        }
+        for field, text in fields.items():
+            for term in tokenize(text):
+                weights[term] += FIELD_WEIGHTS[field]
+        for term, weight in weights.items():
+            self.postings[term][pk] = weight
+        self.doc_terms[pk] = tuple(weights)
+        self.names[pk] = name
+        self._vocabulary = None
+
+    def remove(self, pk):
+        for term in self.doc_terms.pop(pk, ()):
+            docs = self.postings.get(term)
+            if docs is not None:
+                docs.pop(pk, None)
+                if not docs:
+                    del self.postings[term]
+        self.names.pop(pk, None)
+        self._vocabulary = None
+
+    @property
+    def vocabulary(self):
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self.postings)
+        return self._vocabulary
+
+    def expand(self, prefix):
+        """All indexed terms starting with ``prefix``"""
+        vocabulary = self.vocabulary
+        start = bisect.bisect_left(vocabulary, prefix)
+        end = bisect.bisect_left(vocabulary, prefix + "\uffff")
+        return vocabulary[start:end]
+
+    def score(self, query):
+        """{pk: score} for products matching every token of ``query``"""
+        scores = None
+        for token in tokenize(query):
+            token_scores = defaultdict(float)
+            for term in self.expand(token):
+                factor = 1.0 if term == token else PREFIX_MATCH_FACTOR
+                for pk, weight in self.postings[term].items():
+                    token_scores[pk] = max(token_scores[pk], weight * factor)
+            if scores is None:
+                scores = dict(token_scores)
+            else:
+                scores = {pk: s + token_scores[pk] for pk, s in scores.items() if pk in token_scores}
+            if not scores:
+                return {}
+        return scores or {}
+
+    def search(self, query, limit=None):
+        """Matching product ids, best first (newest first on ties)"""
+        scores = self.score(query)
+        ranked = sorted(scores, key=lambda pk: (-scores[pk], -pk))
+        return ranked[:limit] if limit else ranked
+
+    def complete(self, query, limit=5):
+        """Completions of the last token of ``query``, most common first"""
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        head = " ".join(tokens[:-1])
+        terms = sorted(self.expand(tokens[-1]), key=lambda term: (-len(self.postings[term]), term))
+        return [f"{head} {term}".strip() for term in terms[:limit]]
+
+
+_index = None
+_index_versions = None  # tag versions the index has caught up with
+_log_version = None  # products change-log version the index reflects
+_lock = threading.Lock()
+
+
+def _product_rows(pks=None):
+    from .models import Product
+
+    qs = Product.objects.all()
+    if pks is not None:
+        qs = qs.filter(pk__in=pks)
+    return qs.values_list("pk", "name", "brand__name", "technical_specs", "description").iterator()
+
+
+def _build_index():
+    """A fresh index and the change-log version it is current with"""
+    from .change_log import current_version
+
+    # Read first: changes committed during the build are applied again later, which is harmless
+    log_version = current_version("products")
+    index = SearchIndex()
+    for pk, name, brand_name, specs, description in _product_rows():
+        index.add(pk, name, brand_name, specs, description)
+    return index, log_version
+
+
+def _catch_up(index, since):
+    """
+    Re-read the products changed after change-log version ``since``; returns
+    the version now reflected, or ``None`` if the log cannot tell (rebuild).
+    """
+    from .change_log import changes_since
+
+    delta = changes_since("products", since)
+    if delta is None:
+        return None
+    version, changes = delta
+    found = set()
+    for pk, name, brand_name, specs, description in _product_rows(list(changes)):
+        index.add(pk, name, brand_name, specs, description)
+        found.add(pk)
+    for pk in set(changes) - found:
+        index.remove(pk)
+    return version
+
+
+def _current_index():
+    """
+    The current index, caught up with changes made in other workers.
+    Callers hold ``_lock``.
+    """
+    global _index, _index_versions, _log_version
+    # Read before catching up, so a bump made meanwhile is noticed next time
+    versions = get_tag_versions([SEARCH_INDEX_TAG, SEARCH_DELTA_TAG])
+    if _index is not None and versions == _index_versions:
+        return _index
+    if _index is not None and versions[SEARCH_INDEX_TAG] == _index_versions[SEARCH_INDEX_TAG]:
+        log_version = _catch_up(_index, _log_version)
+        if log_version is not None:
+            _index_versions, _log_version = versions, log_version
+            return _index
+    _index, _log_version = _build_index()
+    _index_versions = versions
+    logger.debug(f"Rebuilt product search index ({len(_index.names)} products)")
+    return _index
+
+
+def mark_products_changed():
+    """Have every worker pick up product changes from the change log on its next query"""
+    bump_tag_version(SEARCH_DELTA_TAG)
+
+
+def mark_search_index_stale():
+    """Force every worker to rebuild on its next query"""
+    bump_tag_version(SEARCH_INDEX_TAG)
+
+
+def search_products(query, limit=None):
+    """Ranked product ids for ``query``"""
+    with _lock:
+        return _current_index().search(query, limit)
+
+
+def suggest(query, limit=8):
+    """Autocomplete payload for the storefront search box"""
+    with _lock:
+        index = _current_index()
+        return {
+            "query": query,
+            "completions": index.complete(query, limit=5),
+            "products": [{"id": pk, "name": index.names[pk]} for pk in index.search(query, limit)],
+        }
@@ -1,6 +1,9 @@
 from rest_framework import serializers
 from django.db import IntegrityError, transaction
+from django.db.models import Avg
 from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
+from .image_variants import build_srcset
 from .models import (
     Brand, Category, Product, ProductImage,
     Service, ServiceImage, ServiceInquiry, ServiceQuery, ServiceCategory,
@@ -27,14 +30,51 @@ class SafeModelSerializer(serializers.ModelSerializer):
         except IntegrityError as e:
             raise serializers.ValidationError({"detail": str(e).splitlines()[-1]})
 
+class DynamicFieldsMixin:
+    """
+    Lets callers restrict output to a subset of fields via a ``fields`` kwarg,
+    e.g. ``ProductSerializer(qs, many=True, fields=["id", "name"])``.
+    Unknown names are ignored and ``id`` is always kept. Dropped fields are
+    never evaluated, so expensive method fields cost nothing when not asked for.
+    """
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop("fields", None)
+        super().__init__(*args, **kwargs)
+        if fields:
+            allowed = set(fields) | {"id"}
+            for name in set(self.fields) - allowed:
+                self.fields.pop(name)
+
+class ImageVariantsMixin:
+    """
+    ``get_srcset``/``get_jpeg_srcset`` for serializers of models with resized
+    image derivatives (see image_variants). Declare ``srcset`` and
+    ``jpeg_srcset`` as SerializerMethodFields and set ``variants_field``.
+    """
+    variants_field = "variants"
+
+    def _variant_url(self, name):
+        url = default_storage.url(name)
+        request = self.context.get("request")
+        return request.build_absolute_uri(url) if request else url
+
+    def get_srcset(self, obj):
+        return build_srcset(getattr(obj, self.variants_field), "webp", self._variant_url)
+
+    def get_jpeg_srcset(self, obj):
+        return build_srcset(getattr(obj, self.variants_field), "jpeg", self._variant_url)
+
 # --- Attributes ---
-class BrandSerializer(SafeModelSerializer):
+class BrandSerializer(ImageVariantsMixin, SafeModelSerializer):
     name = serializers.CharField(max_length=120)
+    srcset = serializers.SerializerMethodField()
+    jpeg_srcset = serializers.SerializerMethodField()
+    variants_field = "image_variants"
 
     class Meta:
         model = Brand
-        fields = ["id", "name", "slug", "image", "created_at"]
-        read_only_fields = ["id", "slug", "created_at"]
+        fields = ["id", "name", "slug", "image", "image_width", "image_height", "srcset", "jpeg_srcset", "created_at"]
+        read_only_fields = ["id", "slug", "image_width", "image_height", "created_at"]
 
     def validate_name(self, value):
         v = value.strip()
@@ -42,13 +82,16 @@ class BrandSerializer(SafeModelSerializer):
             raise serializers.ValidationError("Brand name is required.")
         return v
 
-class CategorySerializer(SafeModelSerializer):
+class CategorySerializer(ImageVariantsMixin, SafeModelSerializer):
     parent = serializers.PrimaryKeyRelatedField(
         queryset=Category.objects.all(),
         allow_null=True,
         required=False,
     )
     name = serializers.CharField(max_length=120)
+    srcset = serializers.SerializerMethodField()
+    jpeg_srcset = serializers.SerializerMethodField()
+    variants_field = "image_variants"
     
     # Additional hierarchical fields
     depth = serializers.SerializerMethodField()
@@ -62,11 +105,12 @@ class CategorySerializer(SafeModelSerializer):
     class Meta:
         model = Category
         fields = [
-            "id", "name", "slug", "slogan", "parent", "image", "created_at",
+            "id", "name", "slug", "slogan", "parent", "image", "image_width", "image_height",
+            "srcset", "jpeg_srcset", "created_at",
             "depth", "level", "level_name", "full_path", 
             "can_have_children", "children_count", "children"
         ]
-        read_only_fields = ["id", "slug", "created_at", "depth", "level", "level_name", "full_path", "can_have_children", "children_count", "children"]
+        read_only_fields = ["id", "slug", "image_width", "image_height", "created_at", "depth", "level", "level_name", "full_path", "can_have_children", "children_count", "children"]
 
     def get_depth(self, obj):
         return obj.get_depth()
@@ -91,7 +135,7 @@ class CategorySerializer(SafeModelSerializer):
         children = obj.children.all()
         return CategorySerializer(children, many=True, context=self.context).data
 
-class CategoryListSerializer(SafeModelSerializer):
+class CategoryListSerializer(ImageVariantsMixin, SafeModelSerializer):
     """Lightweight serializer for category lists - no nested children"""
     parent = serializers.PrimaryKeyRelatedField(
         queryset=Category.objects.all(),
@@ -99,6 +143,9 @@ class CategoryListSerializer(SafeModelSerializer):
         required=False,
     )
     name = serializers.CharField(max_length=120)
+    srcset = serializers.SerializerMethodField()
+    jpeg_srcset = serializers.SerializerMethodField()
+    variants_field = "image_variants"
     
     # Only essential hierarchical fields
     depth = serializers.SerializerMethodField()
@@ -108,10 +155,11 @@ class CategoryListSerializer(SafeModelSerializer):
     class Meta:
         model = Category
         fields = [
-            "id", "name", "slug", "slogan", "parent", "image", "created_at",
+            "id", "name", "slug", "slogan", "parent", "image", "image_width", "image_height",
+            "srcset", "jpeg_srcset", "created_at",
             "depth", "level", "children_count"
         ]
-        read_only_fields = ["id", "slug", "created_at", "depth", "level", "children_count"]
+        read_only_fields = ["id", "slug", "image_width", "image_height", "created_at", "depth", "level", "children_count"]
 
     def get_depth(self, obj):
         return obj.get_depth()
@@ -187,13 +235,16 @@ class CategoryListSerializer(SafeModelSerializer):
             return []
         return CategorySerializer(children, many=True, context=self.context).data
 
-class ProductImageSerializer(serializers.ModelSerializer):
+class ProductImageSerializer(ImageVariantsMixin, serializers.ModelSerializer):
+    srcset = serializers.SerializerMethodField()
+    jpeg_srcset = serializers.SerializerMethodField()
+
     class Meta:
         model = ProductImage
-        fields = ["id", "image", "is_main", "created_at"]
-        read_only_fields = ["id", "created_at"]
+        fields = ["id", "image", "is_main", "width", "height", "srcset", "jpeg_srcset", "created_at"]
+        read_only_fields = ["id", "width", "height", "created_at"]
 
-class ProductSerializer(SafeModelSerializer):
+class ProductSerializer(DynamicFieldsMixin, SafeModelSerializer):
     # Accept brand & category by PK (strings will be coerced to ints by DRF)
     brand = serializers.PrimaryKeyRelatedField(queryset=Brand.objects.all())
     category = serializers.PrimaryKeyRelatedField(queryset=Category.objects.all())
@@ -207,7 +258,8 @@ class ProductSerializer(SafeModelSerializer):
     
     # Add nested serializers for read-only brand and category data
     brand_data = BrandSerializer(source='brand', read_only=True)
-    category_data = CategorySerializer(source='category', read_only=True)
+    # Flat: the category's own fields and children_count, not its whole subtree
+    category_data = CategoryListSerializer(source='category', read_only=True)
     
     # Add calculated rating fields
     average_rating = serializers.SerializerMethodField()
@@ -281,29 +333,42 @@ class ProductSerializer(SafeModelSerializer):
         # Normalize all values to strings for consistency
         return {str(k): ("" if v[k] is None else str(v[k])) for k in v}
     
+    # The three getters below read the SQL annotations added by
+    # performance_optimizations.get_optimized_product_queryset() and only fall
+    # back to per-row queries for instances loaded some other way.
     def get_main_image(self, obj):
         """Get the main image URL for the product"""
-        main_image = obj.images.filter(is_main=True).first()
-        if main_image:
-            return main_image.image.url if main_image.image else None
-        # If no main image is set, return the first image
-        first_image = obj.images.first()
-        if first_image:
-            return first_image.image.url if first_image.image else None
+        if hasattr(obj, "main_image_path"):
+            path = obj.main_image_path
+            return ProductImage._meta.get_field("image").storage.url(path) if path else None
+        # images.all() is served from the prefetch cache when available and is
+        # ordered main image first, then newest
+        for image in obj.images.all():
+            return image.image.url if image.image else None
         return None
     
     def get_average_rating(self, obj):
         """Calculate average rating from reviews"""
-        reviews = obj.reviews.all()
-        if not reviews.exists():
-            return 0.0
-        total_rating = sum(review.rating for review in reviews)
-        return round(total_rating / reviews.count(), 1)
+        if hasattr(obj, "annotated_average_rating"):
+            average = obj.annotated_average_rating
+        else:
+            average = obj.reviews.aggregate(average=Avg("rating"))["average"]
+        return round(float(average), 1) if average is not None else 0.0
     
     def get_review_count(self, obj):
         """Get the count of reviews for this product"""
+        if hasattr(obj, "annotated_review_count"):
+            return obj.annotated_review_count
         return obj.reviews.count()
 
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        # Include views still buffered in memory (see view_counters)
+        if "view_count" in data:
+            from .view_counters import current_view_count
+            data["view_count"] = current_view_count(instance)
+        return data
+
 # --- Orders ---
 class OrderItemSerializer(serializers.ModelSerializer):
     product_name = serializers.SerializerMethodField(read_only=True)
@@ -382,10 +447,14 @@ class ServiceCategorySerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("A category cannot be its own parent.")
         return value
 
-class ServiceImageSerializer(serializers.ModelSerializer):
+class ServiceImageSerializer(ImageVariantsMixin, serializers.ModelSerializer):
+    srcset = serializers.SerializerMethodField()
+    jpeg_srcset = serializers.SerializerMethodField()
+
     class Meta:
         model = ServiceImage
-        fields = ["id","image","is_main","created_at"]
+        fields = ["id","image","is_main","width","height","srcset","jpeg_srcset","created_at"]
+        read_only_fields = ["width","height"]
 
 class ServiceSerializer(serializers.ModelSerializer):
     images = ServiceImageSerializer(many=True, read_only=True)
@@ -397,16 +466,10 @@ class ServiceSerializer(serializers.ModelSerializer):
     # Custom serialization methods for JSON fields
     def to_representation(self, instance):
         data = super().to_representation(instance)
-        
-        # Generate random view count that's always higher than review count
-        import random
-        review_count = instance.review_count or 0
-        # Generate random view count between review_count + 10 and review_count + 100
-        min_views = review_count + 10
-        max_views = review_count + 100
-        # Ensure minimum of 50 views if review_count is very low
-        min_views = max(min_views, 50)
-        data['view_count'] = random.randint(min_views, max_views)
+        # Include views still buffered in memory (see view_counters)
+        if "view_count" in data:
+            from .view_counters import current_view_count
+            data["view_count"] = current_view_count(instance)
         
         # Parse JSON string fields to proper objects/arrays
         import json
@@ -753,9 +816,10 @@ class ChatRoomListSerializer(SafeModelSerializer):
         fields = [
             "id", "customer_name", "customer_email", "customer_phone",
             "status", "display_name", "unread_count",
+            "unread_by_customer", "last_message_preview",
             "created_at", "updated_at", "last_message_at"
         ]
-        read_only_fields = ["id", "created_at", "updated_at", "last_message_at"]
+        read_only_fields = ["id", "created_at", "updated_at", "last_message_at", "unread_by_customer", "last_message_preview"]
 
 class ChatMessageCreateSerializer(SafeModelSerializer):
     """Serializer for creating chat messages"""
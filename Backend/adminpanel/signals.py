@@ -1,10 +1,23 @@
 """
 Production-safe Django signals for automatic folder management.
-This module handles automatic folder creation when new content is added.
+This module handles automatic folder creation when new content is added,
+and keeps the product search index, cached singletons, sales rollups and
+resized image variants and media blob reference counts in step with the
+database.
 """
-from django.db.models.signals import post_save
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
 from django.dispatch import receiver
-from adminpanel.models import Category, ServiceCategory
+from adminpanel.models import (
+    Brand, Category, Order, OrderItem, Payment, Product, ProductImage, ServiceCategory, ServiceImage,
+    StoreSettings, WebsiteContent,
+)
+from adminpanel import content_storage, sales_rollups
+from adminpanel.image_variants import discard_variants, schedule_variants
+from adminpanel.jwt_user_cache import invalidate_token_user
+from adminpanel.search_index import mark_products_changed, mark_search_index_stale
+from adminpanel.singletons import invalidate_singleton
 from adminpanel.upload_paths import create_production_folders
 import logging
 
@@ -38,4 +51,115 @@ def create_service_category_folders_signal(sender, instance, created, **kwargs):
             create_production_folders()
             logger.info(f"Production folders ensured for new service category: {instance.name}")
         except Exception as e:
-            logger.error(f"Failed to ensure folders for service category {instance.name}: {e}")
\ No newline at end of file
+            logger.error(f"Failed to ensure folders for service category {instance.name}: {e}")
+
+# --- Product search index ---
+# Applied after commit so the index never sees rows that are rolled back.
+# Workers read which products changed from the change log, so only the version is announced.
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def product_search_index_signal(sender, instance, **kwargs):
+    """Have every worker refresh this product's search index entry"""
+    transaction.on_commit(_safe_mark_products_changed)
+
+
+@receiver(post_save, sender=Brand)
+@receiver(post_delete, sender=Brand)
+def brand_search_index_signal(sender, instance, **kwargs):
+    """Brand names are indexed on every product, so rebuild rather than patch"""
+    transaction.on_commit(mark_search_index_stale)
+
+
+def _safe_mark_products_changed():
+    try:
+        mark_products_changed()
+    except Exception as e:
+        logger.error(f"Failed to announce product search index changes: {e}")
+
+
+# --- Cached singletons ---
+
+@receiver(post_save, sender=StoreSettings)
+@receiver(post_delete, sender=StoreSettings)
+@receiver(post_save, sender=WebsiteContent)
+@receiver(post_delete, sender=WebsiteContent)
+def invalidate_singleton_signal(sender, instance, **kwargs):
+    """Drop the cached StoreSettings/WebsiteContent row after an edit"""
+    invalidate_singleton(sender)
+
+
+# --- Sales rollups ---
+# Each receiver only marks the affected day dirty; the rollups for it are
+# recomputed once after the transaction commits.
+
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+def order_sales_rollup_signal(sender, instance, **kwargs):
+    sales_rollups.order_changed(instance)
+
+
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+def order_rows_sales_rollup_signal(sender, instance, **kwargs):
+    sales_rollups.order_rows_changed(instance.order_id)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_registration_rollup_signal(sender, instance, created=True, **kwargs):
+    # Only creation and deletion move the counts; logins also save the user
+    if created:
+        sales_rollups.user_changed(instance)
+
+
+# --- JWT user cache ---
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_token_user_signal(sender, instance, **kwargs):
+    """Make the next request with any of the user's tokens reload the row (suspension, role changes)"""
+    invalidate_token_user(instance.pk)
+
+
+# --- Image variants ---
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_save, sender=ServiceImage)
+@receiver(post_save, sender=Brand)
+@receiver(post_save, sender=Category)
+def image_variants_signal(sender, instance, **kwargs):
+    """Render thumbnails/WebP for a new or replaced image, off the request path"""
+    schedule_variants(instance)
+
+
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_delete, sender=ServiceImage)
+@receiver(post_delete, sender=Brand)
+@receiver(post_delete, sender=Category)
+def discard_image_variants_signal(sender, instance, **kwargs):
+    discard_variants(instance)
+
+
+# --- Content-addressed media ---
+# Reference counts change in the same transaction as the row, so a blob is
+# only ever collectable once no committed row points at it.
+
+def blob_snapshot_signal(sender, instance, **kwargs):
+    content_storage.remember_blobs(instance)
+
+
+def blob_saved_signal(sender, instance, created, **kwargs):
+    content_storage.row_saved(instance, created)
+
+
+def blob_deleted_signal(sender, instance, **kwargs):
+    content_storage.row_deleted(instance)
+
+
+for _model in content_storage.referencing_models():
+    post_init.connect(blob_snapshot_signal, sender=_model)
+    post_save.connect(blob_saved_signal, sender=_model)
+    post_delete.connect(blob_deleted_signal, sender=_model)
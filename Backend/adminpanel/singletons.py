@@ -0,0 +1,68 @@
+"""
+Cached accessors for the single-row StoreSettings and WebsiteContent models.
+
+Both are read on every storefront page load and checkout but change only
+when an admin edits them. Each worker keeps the row in process memory,
+backed by the shared cache, and both layers are keyed by a per-model cache
+tag that the post_save/post_delete handlers in signals.py bump on commit.
+In steady state a read costs one cache lookup and no database queries.
+
+Callers get a copy of the cached instance, so they may modify it freely;
+writes must still go through a row loaded from the database.
+"""
+import copy
+import logging
+import threading
+
+from django.core.cache import cache
+
+from .cache_utils import get_tag_versions, invalidate_tags_on_commit
+
+logger = logging.getLogger(__name__)
+
+SINGLETON_PK = 1
+SINGLETON_CACHE_TIMEOUT = 60 * 60
+
+_local = {}  # model label -> (tag version, instance)
+_lock = threading.Lock()
+
+
+def singleton_tag(model):
+    return f"singleton:{model._meta.label_lower}"
+
+
+def _load(model):
+    tag = singleton_tag(model)
+    version = get_tag_versions([tag])[tag]
+
+    cached = _local.get(tag)
+    if cached is not None and cached[0] == version:
+        return copy.copy(cached[1])
+
+    cache_key = f"{tag}|{version}"
+    instance = cache.get(cache_key)
+    if instance is None:
+        instance, _ = model.objects.get_or_create(id=SINGLETON_PK)
+        cache.set(cache_key, instance, SINGLETON_CACHE_TIMEOUT)
+        logger.debug(f"Loaded {model.__name__} singleton from the database")
+
+    with _lock:
+        _local[tag] = (version, instance)
+    return copy.copy(instance)
+
+
+def get_store_settings():
+    """The StoreSettings row (created with defaults if missing)"""
+    from .models import StoreSettings
+    return _load(StoreSettings)
+
+
+def get_website_content():
+    """The WebsiteContent row (created with defaults if missing)"""
+    from .models import WebsiteContent
+    return _load(WebsiteContent)
+
+
+def invalidate_singleton(model):
+    """Drop the cached row once the current transaction commits"""
+    invalidate_tags_on_commit(singleton_tag(model))
@@ -0,0 +1,218 @@
+"""
+Durable queue for Stripe webhook events.
+
+The webhook only verifies the signature and inserts the event into
+``StripeEvent`` (the unique event id makes Stripe's redeliveries no-ops),
+then answers 200. Events are processed in batches by workers that claim
+rows with ``SELECT ... FOR UPDATE SKIP LOCKED`` and a lease, so several
+workers and processes can share the queue and a crashed worker's claim
+expires. A failed event is retried with exponential backoff until
+``MAX_ATTEMPTS``, then left as ``failed`` for inspection.
+
+Each handler runs in one transaction with the event row locked. A failure
+therefore leaves no partial order behind, and notifications go out on
+commit only. A worker that outlives its lease keeps the row locked, so
+``claim_batch`` skips it rather than running the event a second time.
+
+Workers run in-process (``STRIPE_EVENT_WORKERS`` threads, woken on each
+insert; 0 disables them) and/or as ``python manage.py process_stripe_events``.
+"""
+import logging
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connection, transaction
+from django.db.models import Count, Min, Q
+from django.utils import timezone
+
+from .models import StripeEvent
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 20
+MAX_ATTEMPTS = 8
+BACKOFF_BASE = 30  # seconds; doubles per attempt
+BACKOFF_MAX = 6 * 60 * 60
+LEASE = timedelta(minutes=5)
+
+_lock = threading.Lock()
+_executor = None
+_timer = None
+_timer_due = None
+
+
+def _workers():
+    return getattr(settings, "STRIPE_EVENT_WORKERS", 2)
+
+
+def enqueue_event(event):
+    """Persist a verified Stripe event; returns False if it was already queued"""
+    event_id = event.get("id")
+    if not event_id:
+        raise ValueError("Stripe event has no id")
+    try:
+        with transaction.atomic():
+            StripeEvent.objects.create(event_id=event_id, event_type=event.get("type", ""), payload=event)
+    except IntegrityError:
+        # Stripe redelivered an event we already have
+        return False
+    transaction.on_commit(wake_workers)
+    return True
+
+
+def _handlers():
+    from . import views_stripe
+
+    return {
+        "payment_intent.succeeded": views_stripe.handle_payment_succeeded,
+        "payment_intent.payment_failed": views_stripe.handle_payment_failed,
+        "payment_intent.canceled": views_stripe.handle_payment_canceled,
+        "checkout.session.completed": views_stripe.handle_checkout_session_completed,
+    }
+
+
+def backoff(attempts):
+    """Delay before retry number ``attempts``, with jitter"""
+    delay = min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def claim_batch(limit=BATCH_SIZE):
+    """Lease up to ``limit`` due events to the caller"""
+    now = timezone.now()
+    due = Q(status="pending", next_attempt_at__lte=now) | Q(status="processing", locked_until__lt=now)
+    with transaction.atomic():
+        qs = StripeEvent.objects.filter(due).order_by("next_attempt_at", "id")
+        if connection.features.has_select_for_update_skip_locked:
+            qs = qs.select_for_update(skip_locked=True)
+        events = list(qs[:limit])
+        if events:
+            # Re-checked: without SKIP LOCKED a row can finish between the read and this update
+            StripeEvent.objects.filter(due, pk__in=[e.pk for e in events]).update(
+                status="processing", locked_until=now + LEASE
+            )
+    return events
+
+
+def process_event(event):
+    """Run the handler for one claimed event and record the outcome"""
+    handler = _handlers().get(event.event_type)
+    attempts = event.attempts + 1
+    try:
+        with transaction.atomic():
+            # Held until the outcome is recorded; a second runner waits here and then sees it done
+            locked = StripeEvent.objects.select_for_update().filter(pk=event.pk)
+            status = locked.values_list("status", flat=True).first()
+            if status != "processing":
+                logger.info(f"Stripe event {event.event_id} is {status} already, skipping")
+                return False
+            if handler is None:
+                logger.info(f"Unhandled Stripe event type: {event.event_type}")
+            else:
+                handler(event.payload["data"]["object"])
+            StripeEvent.objects.filter(pk=event.pk).update(
+                status="done", attempts=attempts, locked_until=None, last_error="", processed_at=timezone.now()
+            )
+        return True
+    except Exception as e:
+        failed = attempts >= MAX_ATTEMPTS
+        StripeEvent.objects.filter(pk=event.pk).update(
+            status="failed" if failed else "pending",
+            attempts=attempts,
+            next_attempt_at=timezone.now() + backoff(attempts),
+            locked_until=None,
+            last_error=f"{type(e).__name__}: {e}"[:2000],
+        )
+        log = logger.error if failed else logger.warning
+        log(f"Stripe event {event.event_id} ({event.event_type}) attempt {attempts} failed: {e}")
+        return False
+
+
+def process_batch(limit=BATCH_SIZE):
+    """Claim and process one batch; returns the number of events handled"""
+    events = claim_batch(limit)
+    for event in events:
+        process_event(event)
+    return len(events)
+
+
+def drain(limit=BATCH_SIZE):
+    """Process batches until nothing is due"""
+    total = 0
+    while True:
+        handled = process_batch(limit)
+        total += handled
+        if handled < limit:
+            return total
+
+
+def _drain_in_thread():
+    close_old_connections()
+    try:
+        drain()
+        _schedule_retry_wakeup()
+    except Exception as e:
+        logger.error(f"Stripe event worker failed: {e}")
+    finally:
+        close_old_connections()
+
+
+def _schedule_retry_wakeup():
+    """Arm one timer for the next event waiting out its backoff"""
+    global _timer, _timer_due
+    due = StripeEvent.objects.filter(status="pending").aggregate(due=Min("next_attempt_at"))["due"]
+    if due is None:
+        return
+    with _lock:
+        if _timer is not None and _timer.is_alive() and _timer_due <= due:
+            return
+        if _timer is not None:
+            _timer.cancel()
+        _timer_due = due
+        _timer = threading.Timer(max(0.0, (due - timezone.now()).total_seconds()), wake_workers)
+        _timer.daemon = True
+        _timer.start()
+
+
+def wake_workers():
+    """Have the in-process worker pool pick up newly queued events"""
+    global _executor
+    if _workers() <= 0:
+        return
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=_workers(), thread_name_prefix="stripe-events")
+    _executor.submit(_drain_in_thread)
+
+
+def retry_event(event_id):
+    """Put a failed event back in the queue immediately"""
+    updated = StripeEvent.objects.filter(event_id=event_id).exclude(status="done").update(
+        status="pending", next_attempt_at=timezone.now(), locked_until=None
+    )
+    if updated:
+        transaction.on_commit(wake_workers)
+    return bool(updated)
+
+
+def queue_stats():
+    """Queue depth per status, lag of the oldest due event and recent failures"""
+    now = timezone.now()
+    counts = dict(StripeEvent.objects.order_by().values_list("status").annotate(n=Count("id")))
+    oldest = StripeEvent.objects.filter(status__in=["pending", "processing"]).aggregate(
+        received=Min("received_at"), due=Min("next_attempt_at")
+    )
+    failures = list(
+        StripeEvent.objects.filter(Q(status="failed") | Q(status="pending", attempts__gt=0))
+        .order_by("-next_attempt_at")
+        .values("event_id", "event_type", "status", "attempts", "last_error", "next_attempt_at")[:20]
+    )
+    return {
+        "depth": {status: counts.get(status, 0) for status, _ in StripeEvent.STATUS_CHOICES},
+        "lag_seconds": (now - oldest["received"]).total_seconds() if oldest["received"] else 0,
+        "next_due_at": oldest["due"],
+        "recent_failures": failures,
+    }
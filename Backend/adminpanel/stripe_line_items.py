@@ -0,0 +1,94 @@
+"""
+Stripe Checkout line items that carry their catalogue product.
+
+Line items are created with ``product_data.metadata`` holding the product
+id and the exact unit price, so orders rebuilt from a completed session
+(webhook or confirmation-page fallback) resolve every product with one
+``in_bulk`` lookup instead of guessing from the display name. Line items
+without a product id (shipping, sessions created before this) are skipped.
+"""
+import logging
+from decimal import Decimal, InvalidOperation
+
+import stripe
+
+from .models import OrderItem, Product
+
+logger = logging.getLogger(__name__)
+
+
+def to_minor_units(amount):
+    """Pounds (Decimal, float or str) to integer pence"""
+    return int((Decimal(str(amount)) * 100).quantize(Decimal("1")))
+
+
+def line_item(name, unit_price, quantity=1, product_id=None, description=None, currency="gbp"):
+    """One ``line_items`` entry for ``stripe.checkout.Session.create``"""
+    product_data = {"name": name}
+    if description:
+        product_data["description"] = description
+    if product_id is not None:
+        product_data["metadata"] = {"product_id": str(product_id), "unit_price": str(unit_price)}
+    return {
+        "price_data": {
+            "currency": currency,
+            "product_data": product_data,
+            "unit_amount": to_minor_units(unit_price),
+        },
+        "quantity": quantity,
+    }
+
+
+def fetch_line_items(session_id):
+    """All line items of a session, with their Stripe product (and its metadata) expanded"""
+    return list(
+        stripe.checkout.Session.list_line_items(
+            session_id, limit=100, expand=["data.price.product"]
+        ).auto_paging_iter()
+    )
+
+
+def _product_metadata(item):
+    price = item.get("price") or {}
+    product = price.get("product")
+    # Unexpanded, ``product`` is just the Stripe product id
+    return (product.get("metadata") or {}) if isinstance(product, dict) else {}
+
+
+def _unit_price(item, metadata):
+    try:
+        return Decimal(metadata["unit_price"])
+    except (KeyError, InvalidOperation):
+        price = item.get("price") or {}
+        return Decimal(price.get("unit_amount") or 0) / 100
+
+
+def resolve_line_items(line_items):
+    """``[(product, quantity, unit_price)]`` for the catalogue items among ``line_items``"""
+    wanted = []
+    for item in line_items:
+        metadata = _product_metadata(item)
+        product_id = metadata.get("product_id", "")
+        if not product_id.isdigit():
+            logger.info(f"Skipping Stripe line item without product id: {item.get('description')}")
+            continue
+        wanted.append((int(product_id), item.get("quantity") or 1, _unit_price(item, metadata)))
+
+    products = Product.objects.in_bulk({product_id for product_id, _, _ in wanted})
+    resolved = []
+    for product_id, quantity, unit_price in wanted:
+        product = products.get(product_id)
+        if product is None:
+            logger.warning(f"Product {product_id} from Stripe line item no longer exists")
+            continue
+        resolved.append((product, quantity, unit_price))
+    return resolved
+
+
+def create_order_items(order, line_items):
+    """Create the order's items from Stripe line items; returns how many were created"""
+    resolved = resolve_line_items(line_items)
+    # Saved one by one so the OrderItem signals (sales rollups) still fire
+    for product, quantity, unit_price in resolved:
+        OrderItem.objects.create(order=order, product=product, quantity=quantity, unit_price=unit_price)
+    return len(resolved)
@@ -0,0 +1,73 @@
+"""Materialized-path moves: cycles and the 3-level limit are rejected on save."""
+from django.test import TestCase
+
+from adminpanel.models import Category, ServiceCategory
+
+
+class CategoryMoveTests(TestCase):
+    model = Category
+    label = "Category"
+
+    def create(self, name, parent=None):
+        return self.model.objects.create(name=name, parent=parent)
+
+    def assert_unchanged(self, *nodes):
+        for node in nodes:
+            stored = self.model.objects.get(pk=node.pk)
+            self.assertEqual((stored.parent_id, stored.tree_path), (node.parent_id, node.tree_path))
+
+    def test_cannot_move_under_own_child(self):
+        a = self.create("A")
+        b = self.create("B", a)
+        moved = self.model.objects.get(pk=a.pk)
+        moved.parent = b
+        with self.assertRaisesMessage(ValueError, "cannot be moved under one of its own subcategories"):
+            moved.save()
+        self.assert_unchanged(a, b)
+
+    def test_cannot_move_under_own_grandchild(self):
+        a = self.create("A")
+        b = self.create("B", a)
+        c = self.create("C", b)
+        moved = self.model.objects.get(pk=a.pk)
+        moved.parent = c
+        with self.assertRaisesMessage(ValueError, "cannot be moved under one of its own subcategories"):
+            moved.save()
+        self.assert_unchanged(a, b, c)
+
+    def test_cannot_be_own_parent(self):
+        a = self.create("A")
+        a.parent = a
+        with self.assertRaisesMessage(ValueError, "cannot be its own parent"):
+            a.save()
+
+    def test_move_keeping_subtree_within_three_levels(self):
+        a = self.create("A")
+        b = self.create("B")
+        c = self.create("C", b)
+        self.create("D", c)
+        moved = self.model.objects.get(pk=c.pk)
+        moved.parent = a
+        moved.save()
+        self.assertEqual(self.model.objects.get(name="D").tree_names, "A / C / D")
+
+    def test_move_pushing_descendants_too_deep(self):
+        a = self.create("A")
+        b = self.create("B")
+        c = self.create("C", b)
+        self.create("D", c)
+        moved = self.model.objects.get(pk=b.pk)
+        moved.parent = a
+        with self.assertRaisesMessage(ValueError, f"{self.label} hierarchy cannot exceed 3 levels"):
+            moved.save()
+        self.assert_unchanged(b, c)
+
+    def test_new_node_too_deep(self):
+        c = self.create("C", self.create("B", self.create("A")))
+        with self.assertRaisesMessage(ValueError, f"{self.label} hierarchy cannot exceed 3 levels"):
+            self.create("D", c)
+
+
+class ServiceCategoryMoveTests(CategoryMoveTests):
+    model = ServiceCategory
+    label = "Service category"
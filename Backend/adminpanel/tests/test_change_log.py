@@ -0,0 +1,58 @@
+"""
+Writes that bypass model signals still reach the delta-sync change log and
+the realtime broadcast buffer.
+"""
+from unittest import mock
+
+from django.db import transaction
+from django.test import TestCase
+
+from adminpanel import realtime_broadcast
+from adminpanel.change_log import changes_since, current_version
+from adminpanel.inventory import reserve_inventory
+from adminpanel.models import Category, Product
+
+
+class SignalFreeChangeTests(TestCase):
+    def changes(self, resource, write):
+        since = current_version(resource)
+        with mock.patch.object(realtime_broadcast, "_buffer") as buffered:
+            with self.captureOnCommitCallbacks(execute=True):
+                with transaction.atomic():
+                    write()
+        version, changes = changes_since(resource, since)
+        broadcast = {call.args[2]: call.args[1] for call in buffered.call_args_list if call.args[0] == resource}
+        return changes, broadcast
+
+    def test_checkout_stock_reservation(self):
+        category = Category.objects.create(name="Lighting")
+        lamps = [Product.objects.create(name=f"Lamp {i}", price=10, stock=5, category=category) for i in range(3)]
+        cart = [{"product_id": lamps[0].pk, "quantity": 2}, {"product_id": lamps[2].pk, "quantity": 1}]
+
+        def reserve():
+            version = current_version("products")
+            reserve_inventory(cart)
+            # Recorded on commit, so the products version row is not locked during checkout
+            self.assertEqual(current_version("products"), version)
+
+        changes, broadcast = self.changes("products", reserve)
+
+        expected = {lamps[0].pk: "updated", lamps[2].pk: "updated"}
+        self.assertEqual(changes, expected)
+        self.assertEqual(broadcast, expected)
+
+    def test_category_move_repaths_descendants(self):
+        lighting = Category.objects.create(name="Lighting")
+        indoor = Category.objects.create(name="Indoor")
+        ceiling = Category.objects.create(name="Ceiling", parent=indoor)
+
+        def move():
+            moved = Category.objects.get(pk=indoor.pk)
+            moved.parent = lighting
+            moved.save()
+
+        changes, broadcast = self.changes("categories", move)
+
+        self.assertEqual(changes, {indoor.pk: "updated", ceiling.pk: "updated"})
+        self.assertEqual(broadcast, changes)
+        self.assertEqual(Category.objects.get(pk=ceiling.pk).tree_names, "Lighting / Indoor / Ceiling")
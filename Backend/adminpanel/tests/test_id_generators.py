@@ -0,0 +1,84 @@
+"""
+Snowflake ids must never collide: not across processes holding different
+worker leases, and not when one millisecond runs out of sequence numbers.
+"""
+import multiprocessing
+from unittest import mock
+
+from django.db import connection, connections
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+
+from adminpanel import id_generators
+from adminpanel.id_generators import MAX_SEQUENCE, SEQUENCE_BITS, WORKER_BITS, IdAllocator
+
+
+def _worker_id(value):
+    return (value >> SEQUENCE_BITS) & ((1 << WORKER_BITS) - 1)
+
+
+def _timestamp(value):
+    return value >> (WORKER_BITS + SEQUENCE_BITS)
+
+
+def _issue_ids(count, results):
+    # Runs in a forked child, which leases its own worker id on first use
+    results.put([id_generators.next_id() for _ in range(count)])
+
+
+class IdAllocatorSequenceTests(SimpleTestCase):
+    @override_settings(ID_WORKER_ID=3)
+    def test_sequence_exhaustion_within_one_millisecond(self):
+        allocator = IdAllocator()
+        frozen_ns = (id_generators.EPOCH_MS + 10_000) * 1_000_000
+        count = (MAX_SEQUENCE + 1) * 4 + 7
+        with mock.patch.object(id_generators.time, "time_ns", return_value=frozen_ns):
+            ids = [allocator.next_id() for _ in range(count)]
+
+        self.assertEqual(len(set(ids)), count)
+        self.assertEqual(ids, sorted(ids))
+        self.assertEqual({_worker_id(value) for value in ids}, {3})
+        # Each exhausted millisecond borrows the next one
+        first_ms = _timestamp(ids[0])
+        self.assertEqual(_timestamp(ids[-1]) - first_ms, count // (MAX_SEQUENCE + 1))
+
+    @override_settings(ID_WORKER_ID=3)
+    def test_clock_stepping_back_does_not_repeat_ids(self):
+        allocator = IdAllocator()
+        start_ns = (id_generators.EPOCH_MS + 10_000) * 1_000_000
+        ids = []
+        for now_ns in (start_ns, start_ns + 5_000_000, start_ns, start_ns - 60_000_000_000):
+            with mock.patch.object(id_generators.time, "time_ns", return_value=now_ns):
+                ids.extend(allocator.next_id() for _ in range(MAX_SEQUENCE * 2))
+        self.assertEqual(len(set(ids)), len(ids))
+        self.assertEqual(ids, sorted(ids))
+
+
+class IdAllocatorProcessTests(TransactionTestCase):
+    PROCESSES = 4
+    IDS_PER_PROCESS = 500_000
+
+    def setUp(self):
+        if connection.vendor == "sqlite" and connection.is_in_memory_db():
+            self.skipTest("forked processes cannot share an in-memory SQLite database")
+
+    def test_ids_unique_across_processes(self):
+        # Children must open their own connections rather than share the parent's socket
+        connections.close_all()
+        context = multiprocessing.get_context("fork")
+        results = context.Queue()
+        processes = [context.Process(target=_issue_ids, args=(self.IDS_PER_PROCESS, results)) for _ in range(self.PROCESSES)]
+        for process in processes:
+            process.start()
+        batches = [results.get(timeout=300) for _ in processes]
+        for process in processes:
+            process.join(timeout=60)
+            self.assertEqual(process.exitcode, 0)
+
+        ids = [value for batch in batches for value in batch]
+        self.assertEqual(len(ids), self.PROCESSES * self.IDS_PER_PROCESS)
+        self.assertEqual(len(set(ids)), len(ids), "id collision across processes")
+        # Each process leased its own worker id and issued ids in order
+        self.assertEqual(len({_worker_id(batch[0]) for batch in batches}), self.PROCESSES)
+        for batch in batches:
+            self.assertEqual(len({_worker_id(value) for value in batch}), 1)
+            self.assertEqual(batch, sorted(batch))
@@ -0,0 +1,143 @@
+"""
+Concurrent checkouts over the same products must neither deadlock nor
+oversell (see reserve_inventory), and checkout orders exactly what it
+reserved.
+"""
+import itertools
+import random
+import threading
+import time
+from types import SimpleNamespace
+from unittest import mock
+
+from django.db import OperationalError, connection, transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, skipUnlessDBFeature
+
+from adminpanel.inventory import InsufficientInventory, cart_quantities, reserve_inventory
+from adminpanel.models import Category, Order, Product
+from adminpanel.views_public import CreateOrderAndCheckoutViewSet
+
+
+class CartQuantitiesTests(SimpleTestCase):
+    def test_merges_and_orders_by_product_id(self):
+        cart = [{"product_id": 9, "quantity": 1}, {"product_id": "3", "quantity": 2}, {"product_id": 9, "quantity": 4},
+                {"product_id": 5, "quantity": 0}, {"product_id": None, "quantity": 1}]
+        self.assertEqual(list(cart_quantities(cart).items()), [(3, 2), (9, 5)])
+
+
+@mock.patch.object(
+    CreateOrderAndCheckoutViewSet, "_create_stripe_checkout_session",
+    return_value=SimpleNamespace(id="cs_test", url="https://checkout.stripe.test/cs_test"),
+)
+class CheckoutOrderItemsTests(TestCase):
+    URL = "/api/public/create-order-checkout/"
+
+    def setUp(self):
+        # The id allocator claims its lease on a connection of its own, which in-memory sqlite cannot share
+        ids = mock.patch("adminpanel.id_generators.next_id", side_effect=itertools.count(1 << 40))
+        ids.start()
+        self.addCleanup(ids.stop)
+        category = Category.objects.create(name="Lighting")
+        self.lamp = Product.objects.create(name="Lamp", price=10, stock=5, category=category)
+        self.shade = Product.objects.create(name="Shade", price=4, stock=5, category=category)
+
+    def checkout(self, cart):
+        return self.client.post(
+            self.URL, {"customer_email": "a@example.com", "cart_items": cart}, content_type="application/json"
+        )
+
+    def test_duplicate_lines_become_one_item(self, stripe_session):
+        response = self.checkout([
+            {"product_id": self.lamp.pk, "quantity": 2, "price": "10"},
+            {"product_id": self.shade.pk, "quantity": 1, "price": "4"},
+            {"product_id": self.lamp.pk, "quantity": 1, "price": "10"},
+        ])
+
+        self.assertEqual(response.status_code, 200, response.content)
+        order = Order.objects.get(pk=response.json()["order_id"])
+        self.assertEqual(
+            sorted(order.order_items.values_list("product_id", "quantity")),
+            [(self.lamp.pk, 3), (self.shade.pk, 1)],
+        )
+        self.assertEqual(float(order.subtotal), 34)
+        self.lamp.refresh_from_db()
+        self.assertEqual(self.lamp.stock, 2)
+
+    def test_non_positive_quantities_are_rejected(self, stripe_session):
+        for quantity in (0, -2, "two"):
+            response = self.checkout([
+                {"product_id": self.lamp.pk, "quantity": 1, "price": "10"},
+                {"product_id": self.shade.pk, "quantity": quantity, "price": "4"},
+            ])
+            self.assertEqual(response.status_code, 400, quantity)
+            self.assertEqual(response.json()["error"], "Invalid cart items")
+
+        self.assertFalse(Order.objects.exists())
+        stripe_session.assert_not_called()
+        self.lamp.refresh_from_db()
+        self.assertEqual(self.lamp.stock, 5)
+
+
+@skipUnlessDBFeature("has_select_for_update")
+class ConcurrentReservationTests(TransactionTestCase):
+    """
+    Needs a row-locking database: it runs on PostgreSQL and MySQL/InnoDB and
+    is skipped on SQLite, which locks the whole file. Point DATABASES at the
+    MySQL server production uses to check that backend.
+    """
+
+    THREADS = 8
+    CHECKOUTS_PER_THREAD = 15
+    INITIAL_STOCK = 60
+
+    def setUp(self):
+        category = Category.objects.create(name="Lighting")
+        self.products = [
+            Product.objects.create(name=f"Lamp {i}", price=10, stock=self.INITIAL_STOCK, category=category)
+            for i in range(4)
+        ]
+
+    def checkout_worker(self, seed, start, results):
+        rng = random.Random(seed)
+        ids = [product.pk for product in self.products]
+        try:
+            start.wait()
+            for _ in range(self.CHECKOUTS_PER_THREAD):
+                # Every cart names the same products, half of them in reverse order
+                order = ids if rng.random() < 0.5 else ids[::-1]
+                cart = [{"product_id": pk, "quantity": rng.randint(1, 3)} for pk in order]
+                try:
+                    with transaction.atomic():
+                        reserve_inventory(cart)
+                        # Hold the locks a moment so checkouts overlap
+                        time.sleep(0.002)
+                    results["reserved"].append(cart)
+                except InsufficientInventory:
+                    results["rejected"] += 1
+                except OperationalError as e:
+                    results["errors"].append(e)
+        finally:
+            connection.close()
+
+    def test_overlapping_checkouts(self):
+        results = {"reserved": [], "rejected": 0, "errors": []}
+        start = threading.Barrier(self.THREADS)
+        threads = [
+            threading.Thread(target=self.checkout_worker, args=(seed, start, results)) for seed in range(self.THREADS)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=120)
+        self.assertFalse(any(thread.is_alive() for thread in threads), "checkout threads hung")
+
+        self.assertEqual(results["errors"], [], "deadlocks or lock timeouts during checkout")
+        self.assertEqual(len(results["reserved"]) + results["rejected"], self.THREADS * self.CHECKOUTS_PER_THREAD)
+        # Demand exceeds stock, so some checkouts must have been turned away
+        self.assertGreater(results["rejected"], 0)
+
+        for product in self.products:
+            sold = sum(item["quantity"] for cart in results["reserved"] for item in cart if item["product_id"] == product.pk)
+            product.refresh_from_db()
+            self.assertGreaterEqual(product.stock, 0)
+            self.assertEqual(product.stock, self.INITIAL_STOCK - sold)
@@ -0,0 +1,55 @@
+"""
+The public product list must cost the same number of queries however many
+products, reviews and images it returns (see get_optimized_product_queryset).
+"""
+from django.core.cache import cache
+from django.test import TestCase
+
+from adminpanel.models import Brand, Category, Product, ProductImage, Review
+
+# Products (annotated), their images, and the children of their categories
+LIST_QUERIES = 3
+
+
+class PublicProductListQueryCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.brand = Brand.objects.create(name="Acme")
+        cls.category = Category.objects.create(name="Lighting")
+        # Only the children count is listed; the grandchildren must not be loaded
+        indoor = Category.objects.create(name="Indoor", parent=cls.category)
+        Category.objects.create(name="Ceiling", parent=indoor)
+
+    def add_products(self, count):
+        for _ in range(count):
+            product = Product.objects.create(
+                name=f"Lamp {Product.objects.count()}", price=10, stock=5, brand=self.brand, category=self.category,
+            )
+            ProductImage.objects.create(product=product, image=f"products/{product.pk}-main.jpg", is_main=True)
+            ProductImage.objects.create(product=product, image=f"products/{product.pk}-side.jpg")
+            for rating in (3, 5):
+                Review.objects.create(product=product, author_name=f"Reviewer {rating}", rating=rating)
+
+    def list_products(self, params):
+        cache.clear()  # the list response is cached
+        with self.assertNumQueries(LIST_QUERIES):
+            response = self.client.get("/api/public/products/", params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_unpaginated_list(self):
+        self.add_products(5)
+        self.assertEqual(len(self.list_products({"paginate": "false"})), 5)
+        self.add_products(10)
+        products = self.list_products({"paginate": "false"})
+        self.assertEqual(len(products), 15)
+        self.assertEqual(products[0]["average_rating"], 4.0)
+        self.assertEqual(products[0]["review_count"], 2)
+        self.assertTrue(products[0]["main_image"])
+        self.assertEqual(products[0]["category_data"]["children_count"], 1)
+
+    def test_keyset_page(self):
+        self.add_products(5)
+        self.assertEqual(len(self.list_products({"page_size": 50})["results"]), 5)
+        self.add_products(10)
+        self.assertEqual(len(self.list_products({"page_size": 50})["results"]), 15)
@@ -0,0 +1,75 @@
+"""Ranked product search: best match first, storefront filters applied, bounded result."""
+from unittest import mock
+
+from django.test import TestCase
+
+from adminpanel import search_index
+from adminpanel.models import Brand, Category, Product
+from adminpanel.search_index import mark_search_index_stale, search_products
+from adminpanel.views_public import PublicProductViewSet
+
+
+class ProductSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.lighting = Category.objects.create(name="Lighting")
+        cls.cables = Category.objects.create(name="Cables")
+        brand = Brand.objects.create(name="Acme")
+        # Name matches outrank description-only matches
+        cls.by_name = [
+            Product.objects.create(name=f"Lamp {i}", price=10, category=cls.lighting, brand=brand) for i in range(6)
+        ]
+        cls.by_description = [
+            Product.objects.create(name=f"Cable {i}", description="for a lamp", price=5, category=cls.cables, brand=brand)
+            for i in range(6)
+        ]
+
+    def setUp(self):
+        # The index is per process; rebuild it from this test's rows
+        mark_search_index_stale()
+
+    def ids(self, response):
+        self.assertEqual(response.status_code, 200)
+        return [product["id"] for product in response.json()]
+
+    def test_search_is_ranked_and_limited(self):
+        ids = self.ids(self.client.get("/api/public/products/search/", {"q": "lamp", "limit": 8}))
+        self.assertEqual(len(ids), 8)
+        self.assertEqual(set(ids[:6]), {product.pk for product in self.by_name})
+        self.assertTrue(set(ids[6:]) <= {product.pk for product in self.by_description})
+
+    def test_search_fills_limit_past_filtered_out_matches(self):
+        # The best matches are all in Lighting; the window has to widen to find Cables
+        ids = self.ids(self.client.get(
+            "/api/public/products/search/", {"q": "lamp", "limit": 1, "category": self.cables.pk}
+        ))
+        self.assertEqual(len(ids), 1)
+        self.assertIn(ids[0], {product.pk for product in self.by_description})
+
+    def test_unpaginated_search_filter_is_ranked(self):
+        ids = self.ids(self.client.get("/api/public/products/", {"search": "lamp", "paginate": "false"}))
+        self.assertEqual(len(ids), 12)
+        self.assertEqual(set(ids[:6]), {product.pk for product in self.by_name})
+
+    def test_search_filter_keeps_best_matches(self):
+        with mock.patch.object(PublicProductViewSet, "SEARCH_MATCH_LIMIT", 6):
+            ids = self.ids(self.client.get("/api/public/products/", {"search": "lamp", "paginate": "false"}))
+        self.assertEqual(set(ids), {product.pk for product in self.by_name})
+
+    def test_product_changes_are_applied_without_rebuilding(self):
+        self.assertEqual(len(search_products("lamp")), 12)
+        with mock.patch.object(search_index, "_build_index", wraps=search_index._build_index) as build:
+            with self.captureOnCommitCallbacks(execute=True):
+                renamed = Product.objects.get(pk=self.by_name[0].pk)
+                renamed.name = "Lantern"
+                renamed.save()
+                Product.objects.get(pk=self.by_name[1].pk).delete()
+                Product.objects.create(name="Lamp 9", price=10, category=self.lighting)
+
+            self.assertEqual(search_products("lantern"), [renamed.pk])
+            self.assertEqual(len(search_products("lamp")), 11)
+            build.assert_not_called()
+
+            mark_search_index_stale()
+            self.assertEqual(len(search_products("lamp")), 11)
+            build.assert_called_once()
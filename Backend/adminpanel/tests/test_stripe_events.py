@@ -0,0 +1,88 @@
+"""
+A Stripe event handler runs in one transaction with its event row locked:
+a failure leaves nothing behind and the admin is notified once, on commit.
+"""
+import itertools
+import threading
+from datetime import timedelta
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
+from django.utils import timezone
+
+from adminpanel import stripe_events
+from adminpanel.models import Order, Payment, StripeEvent
+from adminpanel.stripe_events import claim_batch, process_event
+
+
+@mock.patch("adminpanel.views_stripe.send_order_notification_to_admin")
+class CheckoutCompletedEventTests(TestCase):
+    def setUp(self):
+        # The id allocator claims its lease on a connection of its own, which in-memory sqlite cannot share
+        ids = mock.patch("adminpanel.id_generators.next_id", side_effect=itertools.count(1 << 40))
+        ids.start()
+        self.addCleanup(ids.stop)
+        session = {
+            "id": "cs_test_1", "payment_intent": "pi_test_1", "amount_total": 2500, "currency": "gbp",
+            "customer_email": "a@example.com", "metadata": {},
+        }
+        self.event = StripeEvent.objects.create(
+            event_id="evt_1", event_type="checkout.session.completed", status="processing",
+            payload={"data": {"object": session}},
+        )
+
+    def test_failure_leaves_no_partial_order(self, notify):
+        with mock.patch("adminpanel.views_stripe.fetch_line_items", side_effect=RuntimeError("Stripe is down")):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertFalse(process_event(self.event))
+
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(Payment.objects.exists())
+        notify.assert_not_called()
+        self.event.refresh_from_db()
+        self.assertEqual((self.event.status, self.event.attempts), ("pending", 1))
+
+    def test_processed_once(self, notify):
+        with mock.patch("adminpanel.views_stripe.fetch_line_items", return_value=[]):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertTrue(process_event(self.event))
+                notify.assert_not_called()
+            # A worker that reclaimed the event meanwhile finds it done
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertFalse(process_event(self.event))
+
+        self.assertEqual(Order.objects.filter(tracking_id="cs_test_1").count(), 1)
+        self.assertEqual(Payment.objects.get().status, "completed")
+        notify.assert_called_once()
+        self.event.refresh_from_db()
+        self.assertEqual((self.event.status, self.event.attempts), ("done", 1))
+
+
+@skipUnlessDBFeature("has_select_for_update_skip_locked")
+class ExpiredLeaseTests(TransactionTestCase):
+    def test_running_event_is_not_reclaimed(self):
+        event = StripeEvent.objects.create(
+            event_id="evt_slow", event_type="payment_intent.succeeded", status="processing",
+            locked_until=timezone.now() - timedelta(minutes=1), payload={"data": {"object": {}}},
+        )
+        claimed = []
+
+        def claim():
+            try:
+                claimed.extend(claim_batch())
+            finally:
+                connection.close()
+
+        def slow_handler(payload):
+            # The lease has run out, but the row is still locked by this run
+            worker = threading.Thread(target=claim)
+            worker.start()
+            worker.join(timeout=30)
+
+        with mock.patch.object(stripe_events, "_handlers", return_value={"payment_intent.succeeded": slow_handler}):
+            self.assertTrue(process_event(event))
+
+        self.assertEqual(claimed, [])
+        event.refresh_from_db()
+        self.assertEqual(event.status, "done")
@@ -0,0 +1,35 @@
+"""Reads return the stored view count plus the views still buffered in memory."""
+from django.test import TestCase, override_settings
+
+from adminpanel.models import Brand, Category, Product, Service
+from adminpanel.view_counters import flush_view_counts
+
+
+@override_settings(VIEW_COUNT_FLUSH_INTERVAL=3600)
+class BufferedViewCountTests(TestCase):
+    def tearDown(self):
+        flush_view_counts()
+
+    def assert_counts_views(self, detail_url, increment_url, model, pk):
+        model.objects.filter(pk=pk).update(view_count=7)
+        for expected in (8, 9):
+            self.assertEqual(self.client.post(increment_url).json()["view_count"], expected)
+        self.assertEqual(self.client.get(detail_url).json()["view_count"], 9)
+        self.assertEqual(model.objects.get(pk=pk).view_count, 7)
+
+        self.assertEqual(flush_view_counts(), 2)
+        self.assertEqual(model.objects.get(pk=pk).view_count, 9)
+        self.assertEqual(self.client.get(detail_url).json()["view_count"], 9)
+
+    def test_product(self):
+        product = Product.objects.create(
+            name="Lamp", price=10, category=Category.objects.create(name="Lighting"),
+            brand=Brand.objects.create(name="Acme"),
+        )
+        url = f"/api/public/products/{product.pk}/"
+        self.assert_counts_views(url, f"{url}increment_view/", Product, product.pk)
+
+    def test_service(self):
+        service = Service.objects.create(name="Wiring check", price=50)
+        url = f"/api/public/services/{service.pk}/"
+        self.assert_counts_views(url, f"{url}increment_view/", Service, service.pk)
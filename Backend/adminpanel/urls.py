@@ -5,6 +5,8 @@ from rest_framework.routers import DefaultRouter
 from .views_auth import AdminLoginView, AdminRefreshView, MeView, AdminProfileUpdateView, AdminPasswordChangeView
 from .views_debug import health_ping, request_echo  # same paths as before
 from .views_dashboard import DashboardStatsView, ProfileView, ChangePasswordView
+from .views_stripe import stripe_event_queue, retry_stripe_event
+from .views_catalog import export_catalog, import_catalog_upload
 
 log = logging.getLogger("adminpanel")
 router = DefaultRouter()
@@ -71,6 +73,14 @@ urlpatterns = [
     path("admin/profile/", ProfileView.as_view(), name="admin-profile"),
     path("admin/password/", ChangePasswordView.as_view(), name="admin-password"),
 
+    # ---- PAYMENTS ----
+    path("admin/stripe-events/", stripe_event_queue, name="stripe-event-queue"),
+    path("admin/stripe-events/<str:event_id>/retry/", retry_stripe_event, name="stripe-event-retry"),
+
+    # ---- CATALOG ----
+    path("admin/catalog/export/", export_catalog, name="catalog-export"),
+    path("admin/catalog/import/", import_catalog_upload, name="catalog-import"),
+
     # ---- DEBUG (unchanged paths) ----
     path("admin/health/ping/", health_ping),
     path("admin/debug/request-echo/", request_echo),
@@ -10,7 +10,7 @@ from .views_public import (
     PublicServiceViewSet, PublicServiceCategoryViewSet, PublicServiceReviewViewSet, PublicReviewViewSet, PublicWebsiteContentViewSet, PublicStoreSettingsViewSet,
     PublicContactViewSet, PublicServiceQueryViewSet, PublicOrderCreateViewSet, PublicOrderTrackingViewSet,
     PaymentIntentViewSet, StripeCheckoutViewSet, StripeCheckoutSessionViewSet,
-    CreateOrderAndCheckoutViewSet, PublicOrderDetailViewSet
+    CreateOrderAndCheckoutViewSet, PublicOrderDetailViewSet, search_suggest
 )
 from .views_chat import PublicChatRoomViewSet, UserChatRoomViewSet
 from .views_stripe import stripe_webhook, get_payment_intent
@@ -43,6 +43,7 @@ router.register(r"order-details", PublicOrderDetailViewSet, basename="public-ord
 urlpatterns = [
     path("", include(router.urls)),
     path("health/", lambda r: JsonResponse({"status": "ok"}), name="public-health"),
+    path("search/suggest/", search_suggest, name="public-search-suggest"),
     path("stripe/webhook/", stripe_webhook, name="stripe-webhook"),
     path("payment-intent/<str:payment_intent_id>/", get_payment_intent, name="get-payment-intent"),
     path("debug/test-webhook/", lambda r: JsonResponse({"message": "Use POST with session_data"}), name="test-webhook-debug"),
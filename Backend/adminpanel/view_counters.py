@@ -0,0 +1,113 @@
+"""
+Buffered view counters for products and services.
+
+Page views are aggregated in process memory and written back periodically as
+one ``UPDATE ... SET view_count = view_count + n`` per distinct delta, instead
+of a read-modify-write and a row lock on every hit. A daemon thread flushes
+the buffer every ``VIEW_COUNT_FLUSH_INTERVAL`` seconds, a request flushes it
+inline once ``VIEW_COUNT_MAX_PENDING`` objects are pending, and whatever is
+left is flushed when the process exits. Reads add the pending delta to the
+stored value so a visitor never sees their own view go missing.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import F
+
+logger = logging.getLogger(__name__)
+
+_pending = defaultdict(int)  # (model, pk) -> views not yet written
+_lock = threading.Lock()
+_flusher = None
+
+
+def _flush_interval():
+    return getattr(settings, "VIEW_COUNT_FLUSH_INTERVAL", 10)
+
+
+def _max_pending():
+    return getattr(settings, "VIEW_COUNT_MAX_PENDING", 500)
+
+
+def record_view(instance):
+    """Buffer one view of a Product or Service"""
+    key = (type(instance), instance.pk)
+    with _lock:
+        _pending[key] += 1
+        too_many = len(_pending) >= _max_pending()
+    _ensure_flusher()
+    if too_many:
+        flush_view_counts()
+
+
+def pending_views(instance):
+    """Views recorded for ``instance`` that have not been written yet"""
+    return _pending.get((type(instance), instance.pk), 0)
+
+
+def current_view_count(instance):
+    """Stored view count plus the pending delta"""
+    return (instance.view_count or 0) + pending_views(instance)
+
+
+def flush_view_counts():
+    """
+    Write all pending views to the database. Returns the number of views
+    flushed; on a database error the deltas are put back for the next flush.
+    """
+    with _lock:
+        if not _pending:
+            return 0
+        batch = dict(_pending)
+        _pending.clear()
+
+    # Group pks by (model, delta) so each group is a single UPDATE
+    groups = defaultdict(list)
+    for (model, pk), delta in batch.items():
+        groups[(model, delta)].append(pk)
+
+    written = {}
+    try:
+        for (model, delta), pks in groups.items():
+            model.objects.filter(pk__in=pks).update(view_count=F("view_count") + delta)
+            for pk in pks:
+                written[(model, pk)] = delta
+    except Exception as e:
+        logger.error(f"Error flushing view counts: {e}")
+        with _lock:
+            for key, delta in batch.items():
+                if key not in written:
+                    _pending[key] += delta
+
+    total = sum(written.values())
+    if total:
+        logger.debug(f"Flushed {total} buffered views for {len(written)} objects")
+    return total
+
+
+def _run_flusher():
+    while True:
+        time.sleep(_flush_interval())
+        try:
+            flush_view_counts()
+        finally:
+            # This thread owns its own connection; don't keep it open between flushes
+            connections.close_all()
+
+
+def _ensure_flusher():
+    global _flusher
+    if _flusher is not None:
+        return
+    with _lock:
+        if _flusher is not None:
+            return
+        thread = threading.Thread(target=_run_flusher, name="view-count-flusher", daemon=True)
+        thread.start()
+        atexit.register(flush_view_counts)
+        _flusher = thread
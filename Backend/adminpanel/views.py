@@ -6,7 +6,7 @@ from django.db.models.deletion import ProtectedError
 from rest_framework import viewsets, mixins, permissions, status, serializers
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.exceptions import ValidationError
+from rest_framework.exceptions import MethodNotAllowed, ValidationError
 from rest_framework.parsers import MultiPartParser, FormParser
 from django_filters.rest_framework import DjangoFilterBackend
 from django.contrib.auth.models import User
@@ -22,6 +22,8 @@ from .serializers import (
     OrderSerializer, ReviewSerializer, ServiceReviewSerializer, WebsiteContentSerializer, StoreSettingsSerializer,
     AdminUserSerializer, ContactSerializer
 )
+from .cache_utils import tagged_cache_key
+from .performance_optimizations import get_optimized_product_queryset
 from .views_dashboard import DashboardStatsView, ProfileView, ChangePasswordView  # re-use from your existing file
 
 log = logging.getLogger("adminpanel")
@@ -41,8 +43,8 @@ class BrandViewSet(viewsets.ModelViewSet):
         """Cached list view for brands to improve performance"""
         from django.core.cache import cache
         
-        # Create cache key based on query parameters
-        cache_key = f"admin_brands_{hash(str(request.query_params))}"
+        # Create cache key based on query parameters, versioned by the "brands" tag
+        cache_key = tagged_cache_key(f"admin_brands_{request.query_params.urlencode()}", ["brands"])
         cached_data = cache.get(cache_key)
         
         if cached_data is not None:
@@ -57,26 +59,6 @@ class BrandViewSet(viewsets.ModelViewSet):
         cache.set(cache_key, data, 120)
         return Response(data)
 
-    def create(self, request, *args, **kwargs):
-        """Create brand with cache invalidation"""
-        response = super().create(request, *args, **kwargs)
-        
-        # Clear cache after creating
-        from django.core.cache import cache
-        cache.clear()
-        
-        return response
-
-    def update(self, request, *args, **kwargs):
-        """Update brand with cache invalidation"""
-        response = super().update(request, *args, **kwargs)
-        
-        # Clear cache after updating
-        from django.core.cache import cache
-        cache.clear()
-        
-        return response
-
     def destroy(self, request, *args, **kwargs):
         """Custom destroy method to handle ProtectedError when brand has products"""
         instance = self.get_object()
@@ -90,13 +72,8 @@ class BrandViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            # Safe to delete
+            # Safe to delete (cache tags are invalidated by the post_delete signal)
             self.perform_destroy(instance)
-            
-            # Clear cache after deleting
-            from django.core.cache import cache
-            cache.clear()
-            
             return Response(status=status.HTTP_204_NO_CONTENT)
             
         except ProtectedError as e:
@@ -129,8 +106,8 @@ class CategoryViewSet(viewsets.ModelViewSet):
         """Cached list view for categories to improve performance"""
         from django.core.cache import cache
         
-        # Create cache key based on query parameters
-        cache_key = f"admin_categories_{hash(str(request.query_params))}"
+        # Create cache key based on query parameters, versioned by the "categories" tag
+        cache_key = tagged_cache_key(f"admin_categories_{request.query_params.urlencode()}", ["categories"])
         cached_data = cache.get(cache_key)
         
         if cached_data is not None:
@@ -160,12 +137,8 @@ class CategoryViewSet(viewsets.ModelViewSet):
         if level is not None:
             try:
                 level_int = int(level)
-                if level_int == 0:
-                    qs = qs.filter(parent__isnull=True)
-                elif level_int == 1:
-                    qs = qs.filter(parent__isnull=False, parent__parent__isnull=True)
-                elif level_int == 2:
-                    qs = qs.filter(parent__parent__isnull=False)
+                if level_int in (0, 1, 2):
+                    qs = qs.filter(tree_depth=level_int)
             except ValueError:
                 pass
         
@@ -186,23 +159,8 @@ class CategoryViewSet(viewsets.ModelViewSet):
         ser = self.get_serializer(data=data)
         ser.is_valid(raise_exception=True)
         self.perform_create(ser)
-        
-        # Clear cache after creating
-        from django.core.cache import cache
-        cache.clear()
-        
         return Response(ser.data, status=201)
 
-    def update(self, request, *args, **kwargs):
-        """Update category with cache invalidation"""
-        response = super().update(request, *args, **kwargs)
-        
-        # Clear cache after updating
-        from django.core.cache import cache
-        cache.clear()
-        
-        return response
-
     def destroy(self, request, *args, **kwargs):
         """Custom destroy method to handle ProtectedError when category has products"""
         instance = self.get_object()
@@ -244,7 +202,7 @@ class CategoryViewSet(viewsets.ModelViewSet):
             )
 
 class ProductViewSet(viewsets.ModelViewSet):
-    queryset = Product.objects.all().select_related("brand", "category").prefetch_related("images").order_by("-created_at")
+    queryset = get_optimized_product_queryset()
     serializer_class = ProductSerializer
     permission_classes = [IsAdmin]
     pagination_class = None  # Disable pagination for admin products
@@ -339,9 +297,7 @@ class ProductViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'], permission_classes=[])
     def top_selling(self, request):
         """Get top selling products for public display"""
-        top_selling_products = Product.objects.filter(
-            is_top_selling=True
-        ).select_related("brand", "category").prefetch_related("images").order_by("-created_at")
+        top_selling_products = get_optimized_product_queryset().filter(is_top_selling=True)
         
         serializer = self.get_serializer(top_selling_products, many=True)
         return Response(serializer.data)
@@ -377,15 +333,9 @@ class ServiceCategoryViewSet(viewsets.ModelViewSet):
         if depth is not None:
             try:
                 depth_int = int(depth)
-                if depth_int == 0:
-                    # Root level categories
-                    qs = qs.filter(parent__isnull=True)
-                elif depth_int == 1:
-                    # First level subcategories
-                    qs = qs.filter(parent__isnull=False, parent__parent__isnull=True)
-                elif depth_int == 2:
-                    # Second level subcategories
-                    qs = qs.filter(parent__isnull=False, parent__parent__isnull=False)
+                if depth_int in (0, 1, 2):
+                    # 0 = root level, 1 = first level, 2 = second level subcategories
+                    qs = qs.filter(tree_depth=depth_int)
             except ValueError:
                 pass
         
@@ -508,11 +458,16 @@ class AdminUserViewSet(viewsets.ModelViewSet):
     queryset = User.objects.all().order_by("id")
     serializer_class = AdminUserSerializer
     permission_classes = [IsAdmin]
-    http_method_names = ["get","delete","patch","put","head","options","trace"]
+    # POST only for the suspend/unsuspend actions; users are not created here
+    http_method_names = ["get","post","delete","patch","put","head","options","trace"]
+
+    def create(self, request, *args, **kwargs):
+        raise MethodNotAllowed(request.method)
 
     @action(detail=True, methods=["post"])
     def suspend(self, request, pk=None):
         u = self.get_object()
+        # save() also drops the cached user behind their tokens (jwt_user_cache)
         u.is_active = False; u.save()
         return Response({"ok": True})
 
@@ -0,0 +1,75 @@
+"""
+Admin API for bulk catalog import/export (see adminpanel.catalog_io).
+
+    GET  /api/admin/catalog/export/?fmt=jsonl   streamed CSV (default) or JSONL
+    POST /api/admin/catalog/import/             multipart ``file`` (.csv/.jsonl), optional ``fmt``
+
+The query parameter is ``fmt`` because DRF reserves ``format``.
+"""
+import io
+import logging
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from rest_framework import status
+from rest_framework.decorators import api_view, parser_classes, permission_classes
+from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+
+from .catalog_io import FORMATS, export_lines, format_for, import_catalog
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPES = {"csv": "text/csv; charset=utf-8", "jsonl": "application/x-ndjson; charset=utf-8"}
+
+
+async def _pull(pieces):
+    # Django buffers a sync iterator whole under ASGI; pull one chunk per thread hop instead
+    pieces = iter(pieces)
+    while (piece := await sync_to_async(next)(pieces, None)) is not None:
+        yield piece
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def export_catalog(request):
+    """Stream the whole catalog, one query per chunk of products"""
+    fmt = request.query_params.get('fmt', 'csv')
+    if fmt not in FORMATS:
+        return Response({'error': f"fmt must be one of {', '.join(FORMATS)}"}, status=status.HTTP_400_BAD_REQUEST)
+
+    pieces = export_lines(fmt)
+    if isinstance(request._request, ASGIRequest):
+        pieces = _pull(pieces)
+    response = StreamingHttpResponse(pieces, content_type=CONTENT_TYPES[fmt])
+    response['Content-Disposition'] = f'attachment; filename="catalog.{fmt}"'
+    return response
+
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+@parser_classes([MultiPartParser])
+def import_catalog_upload(request):
+    """Import an uploaded catalog file and return the import report"""
+    upload = request.FILES.get('file')
+    if upload is None:
+        return Response({'error': 'Upload the catalog as "file"'}, status=status.HTTP_400_BAD_REQUEST)
+    fmt = request.data.get('fmt') or format_for(upload.name)
+    if fmt not in FORMATS:
+        return Response(
+            {'error': f"Name the file .csv or .jsonl, or pass fmt ({', '.join(FORMATS)})"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    # Decoded as it is read; the upload is never held in memory as text
+    stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+    try:
+        report = import_catalog(stream, fmt)
+    except UnicodeDecodeError as e:
+        return Response({'error': f'Catalog is not UTF-8: {e}'}, status=status.HTTP_400_BAD_REQUEST)
+    finally:
+        stream.detach()
+    logger.info(f"Catalog import by {request.user}: {report['rows']} rows, {report['errors']} errors")
+    return Response(report)
@@ -14,10 +14,33 @@ from .serializers import (
     ChatRoomSerializer, ChatRoomListSerializer, 
     ChatMessageSerializer, ChatMessageCreateSerializer
 )
+from .chat_history import get_message_page, parse_message_id
 
 logger = logging.getLogger(__name__)
 
 
+def message_page_response(room, request):
+    """
+    One page of a room's messages, oldest first.
+    ``?before=<id>`` pages back through history, ``?after=<id>`` fetches
+    what arrived since a message, ``?limit=`` caps the page size. Without a
+    cursor the latest page is returned. Whether more messages exist beyond
+    the page is reported in the X-Has-More header.
+    """
+    params = request.query_params
+    cursors = {}
+    for name in ("before", "after"):
+        if params.get(name):
+            cursors[name] = parse_message_id(params[name])
+            if cursors[name] is None:
+                return Response({'error': f'Invalid {name} cursor'}, status=status.HTTP_400_BAD_REQUEST)
+
+    messages, has_more = get_message_page(room.id, limit=params.get("limit"), **cursors)
+    response = Response(ChatMessageSerializer(messages, many=True).data)
+    response['X-Has-More'] = 'true' if has_more else 'false'
+    return response
+
+
 class PublicChatRoomViewSet(viewsets.ModelViewSet):
     """Public chat room endpoint for customers to chat with admin"""
     serializer_class = ChatRoomSerializer
@@ -132,12 +155,10 @@ class PublicChatRoomViewSet(viewsets.ModelViewSet):
     
     @action(detail=True, methods=['get'])
     def get_messages(self, request, pk=None):
-        """Get messages for a specific chat room"""
+        """Get a page of messages for a specific chat room (see message_page_response)"""
         try:
             room = self.get_object()
-            messages = room.messages.all().order_by('created_at')
-            serializer = ChatMessageSerializer(messages, many=True)
-            return Response(serializer.data)
+            return message_page_response(room, request)
         except ChatRoom.DoesNotExist:
             logger.error(f"ChatRoom {pk} not found for user {request.user}")
             return Response(
@@ -313,7 +334,7 @@ class AdminChatRoomViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         """Get all chat rooms for admin"""
-        return ChatRoom.objects.all().order_by('-last_message_at')
+        return ChatRoom.objects.all().select_related('user').order_by('-last_message_at')
     
     def get_serializer_class(self):
         """Use detailed serializer for individual room retrieval"""
@@ -323,12 +344,10 @@ class AdminChatRoomViewSet(viewsets.ModelViewSet):
     
     @action(detail=True, methods=['get'])
     def get_messages(self, request, pk=None):
-        """Get messages for a specific chat room"""
+        """Get a page of messages for a specific chat room (see message_page_response)"""
         try:
             room = self.get_object()
-            messages = room.messages.all().order_by('created_at')
-            serializer = ChatMessageSerializer(messages, many=True)
-            return Response(serializer.data)
+            return message_page_response(room, request)
         except Exception as e:
             logger.error(f"Error getting messages: {e}")
             return Response(
@@ -359,7 +378,7 @@ class AdminChatRoomViewSet(viewsets.ModelViewSet):
             message = serializer.save()
             
             # Mark all customer messages as read
-            room.messages.filter(sender_type='customer', is_read=False).update(is_read=True)
+            room.mark_read_by_admin()
             
             logger.info(f"Admin {request.user.username} sent message {message.id} in room {room.id}")
             
@@ -380,7 +399,7 @@ class AdminChatRoomViewSet(viewsets.ModelViewSet):
         """Mark all customer messages in a room as read"""
         try:
             room = self.get_object()
-            updated_count = room.messages.filter(sender_type='customer', is_read=False).update(is_read=True)
+            updated_count = room.mark_read_by_admin()
             
             logger.info(f"Admin marked {updated_count} messages as read in room {room.id}")
             
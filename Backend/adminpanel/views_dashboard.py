@@ -1,53 +1,44 @@
-from datetime import timedelta
-from django.utils import timezone
-from django.contrib.auth.models import User
-from django.db.models import Sum, Count, F
-from django.db.models.functions import TruncDate, Extract
+from django.db.models import Sum, F
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
-from .models import Product, Order, OrderItem
+from .models import DailyProductSales, DailyRegistrations, DailySalesRollup, Product, Order
+from .sales_rollups import dashboard_window
 from .serializers import RecentOrderSerializer
 
 class DashboardStatsView(APIView):
     permission_classes = [IsAdminUser]
 
     def get(self, request):
-        now = timezone.now()
-        start_30 = now - timedelta(days=30)
-        start_90 = now - timedelta(days=90)
-
-        # Totals - Count all orders (not just shipped/delivered)
-        all_orders = Order.objects.all()
-        agg_totals = all_orders.aggregate(
-            revenue=Sum("total_price"), orders=Count("id")
+        window = dashboard_window(30)
+        start_day = window[0]
+        day_names = ['Sunday', 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday']
+
+        # Totals - Count all orders (not just shipped/delivered), from the daily rollups
+        agg_totals = DailySalesRollup.objects.aggregate(
+            revenue=Sum("revenue"), paid_revenue=Sum("paid_revenue"),
+            orders=Sum("orders"), customers=Sum("new_customers"),
         )
         revenue = float(agg_totals["revenue"] or 0)
         orders_count = agg_totals["orders"] or 0
         avg_order_value = (revenue / orders_count) if orders_count else 0
 
         # Count all customers (including guest orders)
-        customers = Order.objects.values("customer_email").distinct().count()
+        customers = agg_totals["customers"] or 0
 
         # Sales by day (last 30) - All orders
-        sales_qs = (
-            Order.objects.filter(created_at__gte=start_30)
-            .annotate(day=TruncDate("created_at"))
-            .values("day")
-            .annotate(revenue=Sum("total_price"), orders=Count("id"))
-            .order_by("day")
-        )
+        sales_rows = list(DailySalesRollup.objects.filter(day__gte=start_day).order_by("day"))
         sales_by_day = [
-            {"date": s["day"].isoformat(), "revenue": float(s["revenue"] or 0), "orders": s["orders"]}
-            for s in sales_qs
+            {"date": s.day.isoformat(), "revenue": float(s.revenue), "orders": s.orders}
+            for s in sales_rows if s.orders
         ]
 
         # Top products (last 30) - All orders
         top_qs = (
-            OrderItem.objects.filter(order__created_at__gte=start_30)
+            DailyProductSales.objects.filter(day__gte=start_day)
             .values(pid=F("product__id"), name=F("product__name"))
-            .annotate(sold_qty=Sum("quantity"), revenue=Sum(F("quantity") * F("unit_price")))
+            .annotate(sold_qty=Sum("units"), revenue=Sum("revenue"))
             .order_by("-sold_qty")[:5]
         )
         top_products = [
@@ -80,81 +71,32 @@ class DashboardStatsView(APIView):
             for p in products_inventory
         ]
 
-        # Weekly sales distribution (last 30 days) - Simple approach
-        weekly_sales = []
-        day_names = ['Sunday', 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday']
-        
-        # Get all orders from last 30 days and group by day of week
-        orders_last_30 = Order.objects.filter(created_at__gte=start_30)
-        
-        # Initialize all days with 0 values
-        for i, day_name in enumerate(day_names):
-            weekly_sales.append({
-                "day": day_name,
-                "day_num": i,
-                "revenue": 0.0,
-                "orders": 0
-            })
-        
-        # Calculate sales for each day
-        for order in orders_last_30:
-            day_of_week = order.created_at.weekday()  # 0=Monday, 6=Sunday
-            # Convert to Sunday=0 format
-            day_index = (day_of_week + 1) % 7
-            weekly_sales[day_index]["revenue"] += float(order.total_price)
-            weekly_sales[day_index]["orders"] += 1
-
-        # User registration analytics (last 30 days)
-        user_registrations_qs = (
-            User.objects.filter(date_joined__gte=start_30)
-            .annotate(date=TruncDate('date_joined'))
-            .values("date")
-            .annotate(count=Count("id"))
-            .order_by("date")
+        # Weekly sales distribution (last 30 days), Sunday first
+        weekly_sales = [
+            {"day": day_name, "day_num": i, "revenue": 0.0, "orders": 0}
+            for i, day_name in enumerate(day_names)
+        ]
+        for s in sales_rows:
+            day_index = (s.day.weekday() + 1) % 7  # 0=Monday -> Sunday=0
+            weekly_sales[day_index]["revenue"] += float(s.revenue)
+            weekly_sales[day_index]["orders"] += s.orders
+
+        # User registration analytics (last 30 days), missing dates filled with 0
+        registrations = dict(
+            DailyRegistrations.objects.filter(day__gte=start_day).values_list("day", "users")
         )
-        
-        user_registrations = [
-            {
-                "date": item["date"].strftime("%Y-%m-%d"),
-                "users": item["count"]
-            }
-            for item in user_registrations_qs
+        filled_user_registrations = [
+            {"date": day.strftime("%Y-%m-%d"), "users": registrations.get(day, 0)}
+            for day in window
         ]
-        
-        # Fill in missing dates with 0 values
-        current_date = start_30.date()
-        end_date = timezone.now().date()
-        filled_user_registrations = []
-        while current_date <= end_date:
-            date_str = current_date.strftime("%Y-%m-%d")
-            existing = next((item for item in user_registrations if item["date"] == date_str), None)
-            filled_user_registrations.append({
-                "date": date_str,
-                "users": existing["users"] if existing else 0
-            })
-            current_date += timedelta(days=1)
-        
-        # Weekly user registrations (last 7 days)
-        weekly_user_registrations = []
-        day_names = ['Sunday', 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday']
-        
-        # Get all users from last 30 days and group by day of week
-        users_last_30 = User.objects.filter(date_joined__gte=start_30)
-        
-        # Initialize all days with 0 values
-        for i, day_name in enumerate(day_names):
-            weekly_user_registrations.append({
-                "day": day_name,
-                "day_num": i,
-                "users": 0
-            })
-        
-        # Calculate registrations for each day
-        for user in users_last_30:
-            day_of_week = user.date_joined.weekday()  # 0=Monday, 6=Sunday
-            # Convert to Sunday=0 format
-            day_index = (day_of_week + 1) % 7
-            weekly_user_registrations[day_index]["users"] += 1
+
+        # Weekly user registrations (last 30 days), Sunday first
+        weekly_user_registrations = [
+            {"day": day_name, "day_num": i, "users": 0}
+            for i, day_name in enumerate(day_names)
+        ]
+        for day, users in registrations.items():
+            weekly_user_registrations[(day.weekday() + 1) % 7]["users"] += users
 
         # Recent orders (10)
         recent = Order.objects.order_by("-created_at")[:10]
@@ -163,6 +105,7 @@ class DashboardStatsView(APIView):
         return Response({
             "totals": {
                 "revenue": revenue,
+                "paid_revenue": float(agg_totals["paid_revenue"] or 0),
                 "orders": orders_count,
                 "customers": customers,
                 "avg_order_value": avg_order_value,
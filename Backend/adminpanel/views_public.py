@@ -4,13 +4,14 @@ These endpoints don't require authentication and are meant for the customer-faci
 """
 import uuid
 import time
+from decimal import Decimal, InvalidOperation
 import stripe  # Import stripe at module level
 import logging
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.http import Http404
-from django.db.models import Q
+from django.http import Http404, HttpResponse, HttpResponseNotModified, JsonResponse
+from django.views.decorators.http import require_GET
 from django.conf import settings
 from django.core.cache import cache
 
@@ -25,7 +26,7 @@ class AllowAnyOrAuthenticated(permissions.BasePermission):
         return True
 from .models import (
     Brand, Category, Product, ProductImage, Order, OrderItem,
-    Service, ServiceImage, ServiceCategory, ServiceReview, Review, WebsiteContent, StoreSettings,
+    Service, ServiceImage, ServiceCategory, ServiceReview, Review,
     Contact, ServiceQuery
 )
 from .serializers import (
@@ -33,6 +34,15 @@ from .serializers import (
     ServiceSerializer, ServiceImageSerializer, ServiceCategorySerializer, ServiceReviewSerializer, ReviewSerializer, WebsiteContentSerializer, StoreSettingsSerializer,
     ContactSerializer, ServiceQuerySerializer, OrderSerializer
 )
+from .cache_utils import tagged_cache_key
+from .inventory import InsufficientInventory, cart_quantities, invalid_cart_items, reserve_inventory
+from .category_menu import get_menu_snapshot
+from .pagination import KeysetPagination
+from .product_facets import compute_product_facets
+from .performance_optimizations import get_optimized_product_queryset
+from .search_index import search_products, suggest
+from .singletons import get_store_settings, get_website_content
+from .view_counters import current_view_count, record_view
 
 class PublicBrandViewSet(viewsets.ReadOnlyModelViewSet):
     """Public read-only access to brands"""
@@ -67,7 +77,7 @@ class PublicCategoryViewSet(viewsets.ReadOnlyModelViewSet):
         
         if top_only:
             # Use cache for top-level categories
-            cache_key = "public_categories_top"
+            cache_key = tagged_cache_key("public_categories_top", ["categories"])
             cached_data = cache.get(cache_key)
             
             if cached_data is not None:
@@ -94,26 +104,82 @@ class PublicCategoryViewSet(viewsets.ReadOnlyModelViewSet):
     
     @action(detail=False, methods=["get"], url_path="with-hierarchy")
     def with_hierarchy(self, request):
-        """Get categories with full hierarchy (children and grandchildren) for hover menus"""
-        # Get top-level categories only
-        top_categories = Category.objects.filter(parent__isnull=True).prefetch_related(
-            "children__children"
-        ).order_by("name")
-        
-        # Serialize with full hierarchy
-        serializer = self.get_serializer(top_categories, many=True)
-        return Response(serializer.data)
+        """
+        Get categories with full hierarchy (children and grandchildren) for hover menus.
+        Served from a prebuilt snapshot; answers 304 when the client's ETag is current.
+        """
+        snapshot = get_menu_snapshot(request)
+        if_none_match = request.headers.get("If-None-Match", "")
+        client_etags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        if snapshot.etag in client_etags or if_none_match.strip() == "*":
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(snapshot.body, content_type="application/json")
+        response["ETag"] = snapshot.etag
+        response["Cache-Control"] = "no-cache"
+        return response
 
 class PublicProductViewSet(viewsets.ReadOnlyModelViewSet):
-    """Public read-only access to products"""
-    queryset = Product.objects.all().select_related("brand", "category").prefetch_related("images").order_by("-created_at")
+    """
+    Public read-only access to products.
+
+    The list endpoint is keyset-paginated (``?cursor=...&page_size=...``) and
+    accepts ``?fields=id,name,price,main_image`` to project only the columns a
+    grid needs. Legacy clients that expect the whole catalog as a plain list
+    must opt in with ``?paginate=false``.
+
+    ``?search=`` keeps the best ``SEARCH_MATCH_LIMIT`` matches. Unpaginated
+    lists come back best match first; keyset pages stay newest first, since
+    the cursor cannot carry a rank.
+    """
+    SEARCH_MATCH_LIMIT = 500
+    # search/ looks at this many ranked ids per wanted result before widening
+    SEARCH_WINDOW_FACTOR = 4
+
+    queryset = get_optimized_product_queryset()
     serializer_class = ProductSerializer
     permission_classes = [permissions.AllowAny]
-    pagination_class = None  # Disable pagination for public products API
+    pagination_class = KeysetPagination
+
+    def paginate_queryset(self, queryset):
+        """Skip pagination for legacy clients that explicitly ask for the full list"""
+        if self.request.query_params.get("paginate", "true").lower() in ("false", "0", "no"):
+            return None
+        return super().paginate_queryset(queryset)
+
+    def get_serializer(self, *args, **kwargs):
+        """Apply the optional ``fields=`` projection to every read"""
+        fields = self.request.query_params.get("fields") if self.request else None
+        if fields:
+            kwargs.setdefault("fields", [f.strip() for f in fields.split(",") if f.strip()])
+        return super().get_serializer(*args, **kwargs)
 
     def get_queryset(self):
-        qs = super().get_queryset()
-        
+        return self.filter_products(super().get_queryset())
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        search = request.query_params.get("search")
+        if search:
+            position = {pk: i for i, pk in enumerate(self.search_ids(search))}
+            queryset = sorted(queryset, key=lambda product: position[product.pk])
+        return Response(self.get_serializer(queryset, many=True).data)
+
+    def search_ids(self, query):
+        """The best ``SEARCH_MATCH_LIMIT`` product ids for ``query``, ranked once per request"""
+        cached = getattr(self, "_search_ids", None)
+        if cached is None or cached[0] != query:
+            self._search_ids = (query, search_products(query, self.SEARCH_MATCH_LIMIT))
+        return self._search_ids[1]
+
+    def filter_products(self, qs, skip=()):
+        """
+        Apply the storefront filters from the query string to ``qs``.
+        Filters named in ``skip`` are left out (used by facet counts).
+        """
         # Handle both DRF Request and WSGIRequest objects
         if hasattr(self.request, 'query_params'):
             params = self.request.query_params
@@ -123,22 +189,34 @@ class PublicProductViewSet(viewsets.ReadOnlyModelViewSet):
         # Search functionality
         search = params.get("search")
         if search:
-            qs = qs.filter(
-                Q(name__icontains=search) | 
-                Q(description__icontains=search) |
-                Q(brand__name__icontains=search)
-            )
+            qs = qs.filter(pk__in=self.search_ids(search))
         
-        # Filter by category
+        # Filter by category, optionally including all of its subcategories
         category = params.get("category")
-        if category:
-            qs = qs.filter(category_id=category)
+        if category and "category" not in skip:
+            if params.get("include_subcategories", "false").lower() in ("true", "1", "yes"):
+                try:
+                    qs = qs.filter(Category.subtree_q(Category.objects.get(pk=category)))
+                except (Category.DoesNotExist, ValueError):
+                    qs = qs.none()
+            else:
+                qs = qs.filter(category_id=category)
         
         # Filter by brand
         brand = params.get("brand")
-        if brand:
+        if brand and "brand" not in skip:
             qs = qs.filter(brand_id=brand)
         
+        # Filter by price range
+        if "price" not in skip:
+            for param, lookup in (("min_price", "price__gte"), ("max_price", "price__lt")):
+                value = params.get(param)
+                if value:
+                    try:
+                        qs = qs.filter(**{lookup: Decimal(value)})
+                    except InvalidOperation:
+                        qs = qs.none()
+        
         # Featured products (products with discount > 0)
         featured = params.get("featured")
         if featured and featured.lower() in ("true", "1", "yes"):
@@ -154,6 +232,29 @@ class PublicProductViewSet(viewsets.ReadOnlyModelViewSet):
         
         return qs
 
+    @action(detail=False, methods=["get"])
+    def facets(self, request):
+        """
+        Facet counts for the current filter set: per brand, per category
+        subtree, per discount band and per price bucket. Brand, category and
+        price counts ignore their own filter so the sidebar can offer the
+        alternatives.
+        """
+        cache_key = tagged_cache_key(
+            f"public_product_facets_{request.query_params.urlencode()}",
+            ["products", "categories", "brands"],
+        )
+        data = cache.get(cache_key)
+        if data is None:
+            data = compute_product_facets(
+                self.filter_products(Product.objects.all()),
+                brand_queryset=self.filter_products(Product.objects.all(), skip=("brand",)),
+                category_queryset=self.filter_products(Product.objects.all(), skip=("category",)),
+                price_queryset=self.filter_products(Product.objects.all(), skip=("price",)),
+            )
+            cache.set(cache_key, data, 300)
+        return Response(data)
+
     @action(detail=False, methods=["get"])
     def featured(self, request):
         """Get featured products (products with discounts)"""
@@ -178,13 +279,57 @@ class PublicProductViewSet(viewsets.ReadOnlyModelViewSet):
         serializer = self.get_serializer(top_selling_products, many=True)
         return Response(serializer.data)
 
+    @action(detail=False, methods=["get"])
+    def search(self, request):
+        """
+        Ranked product search (``?q=...&limit=...``), best match first.
+        The other list filters (category, brand, ...) still apply.
+        """
+        try:
+            limit = min(max(int(request.query_params.get("limit", 24)), 1), 100)
+        except ValueError:
+            limit = 24
+        ranked_ids = search_products(request.query_params.get("q", ""))
+
+        # Find the best ``limit`` ids that pass the filters, checking a widening
+        # window of ranked ids with a plain pk query instead of loading them all
+        allowed = self.filter_products(Product.objects.all())
+        chosen = []
+        start, window = 0, limit * self.SEARCH_WINDOW_FACTOR
+        while start < len(ranked_ids) and len(chosen) < limit:
+            ids = ranked_ids[start:start + window]
+            passing = set(allowed.filter(pk__in=ids).values_list("pk", flat=True))
+            chosen.extend(pk for pk in ids if pk in passing)
+            start, window = start + window, window * self.SEARCH_WINDOW_FACTOR
+        chosen = chosen[:limit]
+
+        # Only the page being returned is loaded with the serializer annotations
+        position = {pk: i for i, pk in enumerate(chosen)}
+        products = sorted(self.get_queryset().filter(pk__in=chosen), key=lambda product: position[product.pk])
+        serializer = self.get_serializer(products, many=True)
+        return Response(serializer.data)
+
     @action(detail=True, methods=["post"])
     def increment_view(self, request, pk=None):
         """Increment view count for a product"""
         product = self.get_object()
-        product.view_count += 1
-        product.save(update_fields=['view_count'])
-        return Response({'view_count': product.view_count})
+        record_view(product)
+        return Response({'view_count': current_view_count(product)})
+
+@require_GET
+def search_suggest(request):
+    """
+    Search-box autocomplete: term completions plus the best matching products.
+    Plain Django view answered straight from the in-memory search index.
+    """
+    query = request.GET.get("q", "").strip()
+    try:
+        limit = min(max(int(request.GET.get("limit", 8)), 1), 20)
+    except ValueError:
+        limit = 8
+    if not query:
+        return JsonResponse({"query": "", "completions": [], "products": []})
+    return JsonResponse(suggest(query, limit))
 
 class PublicServiceCategoryViewSet(viewsets.ReadOnlyModelViewSet):
     """Public read-only access to service categories"""
@@ -202,9 +347,8 @@ class PublicServiceViewSet(viewsets.ReadOnlyModelViewSet):
     def increment_view(self, request, pk=None):
         """Increment view count for a service"""
         service = self.get_object()
-        service.view_count += 1
-        service.save(update_fields=['view_count'])
-        return Response({'view_count': service.view_count})
+        record_view(service)
+        return Response({'view_count': current_view_count(service)})
 
 class PublicServiceReviewViewSet(viewsets.ModelViewSet):
     """Public access to service reviews - read and create"""
@@ -269,8 +413,7 @@ class PublicWebsiteContentViewSet(viewsets.ViewSet):
     permission_classes = [permissions.AllowAny]
 
     def _get_singleton(self):
-        obj, _ = WebsiteContent.objects.get_or_create(id=1)
-        return obj
+        return get_website_content()
 
     def retrieve(self, request, pk=None):
         obj = self._get_singleton()
@@ -281,8 +424,7 @@ class PublicStoreSettingsViewSet(viewsets.ViewSet):
     permission_classes = [permissions.AllowAny]
 
     def _get_singleton(self):
-        obj, _ = StoreSettings.objects.get_or_create(id=1)
-        return obj
+        return get_store_settings()
 
     def list(self, request):
         obj = self._get_singleton()
@@ -314,19 +456,6 @@ class PublicContactViewSet(viewsets.ModelViewSet):
             'status': 'success'
         }, status=status.HTTP_201_CREATED)
 
-class PublicStoreSettingsViewSet(viewsets.ViewSet):
-    """Public read-only access to store settings"""
-    permission_classes = [permissions.AllowAny]
-
-    def _get_singleton(self):
-        obj, _ = StoreSettings.objects.get_or_create(id=1)
-        return obj
-
-    def list(self, request):
-        obj = self._get_singleton()
-        return Response(StoreSettingsSerializer(obj).data)
-
-
 class PublicOrderCreateViewSet(viewsets.ModelViewSet):
     """Public endpoint for creating orders"""
     queryset = Order.objects.all()
@@ -356,10 +485,10 @@ class PublicOrderCreateViewSet(viewsets.ModelViewSet):
             payment_status = 'paid' if payment_id and payment_id.strip() else 'unpaid'
             
             # Create order
-            from .id_generators import generate_unique_tracking_id
+            from .id_generators import generate_tracking_id
             order = Order.objects.create(
                 user=None,  # Guest order
-                tracking_id=generate_unique_tracking_id(),
+                tracking_id=generate_tracking_id(),
                 payment_id=payment_id,
                 customer_email=order_data.get('customer_email', ''),
                 customer_phone=order_data.get('customer_phone', ''),
@@ -425,27 +554,35 @@ class CreateOrderAndCheckoutViewSet(viewsets.ViewSet):
                 if not cart_items:
                     return Response({'error': 'Cart is empty'}, status=status.HTTP_400_BAD_REQUEST)
                 
-                # Check inventory availability with locking
-                inventory_errors = self._check_inventory_availability(cart_items)
-                if inventory_errors:
-                    return Response({'error': 'Insufficient inventory', 'details': inventory_errors}, 
+                errors = invalid_cart_items(cart_items)
+                if errors:
+                    return Response({'error': 'Invalid cart items', 'details': errors},
                                   status=status.HTTP_400_BAD_REQUEST)
                 
+                # Lock all cart products in id order, check and reserve stock
+                products = reserve_inventory(cart_items)
+                
+                # Order exactly what was reserved: one line per product, duplicate cart lines merged
+                quantities = cart_quantities(cart_items)
+                prices = {}
+                for item in cart_items:
+                    prices.setdefault(int(item['product_id']), float(item['price']))
+                
                 # Calculate totals
-                subtotal = sum(float(item['price']) * item['quantity'] for item in cart_items)
+                subtotal = sum(prices[product_id] * quantity for product_id, quantity in quantities.items())
                 shipping_cost = float(data.get('shipping_cost', 0))
                 tax_amount = float(data.get('tax_amount', 0))
                 total_price = subtotal + shipping_cost + tax_amount
                 
                 # Create order with unique number
-                from .id_generators import generate_unique_tracking_id
+                from .id_generators import generate_tracking_id
                 order = Order.objects.create(
                     customer_email=data.get('customer_email'),
                     customer_name=data.get('customer_name', 'Unknown Customer'),
                     customer_phone=data.get('customer_phone', ''),
                     shipping_address=data.get('shipping_address', {}),
                     billing_address=data.get('billing_address', {}),
-                    tracking_id=generate_unique_tracking_id(),
+                    tracking_id=generate_tracking_id(),
                     subtotal=subtotal,
                     shipping_cost=shipping_cost,
                     tax_amount=tax_amount,
@@ -454,27 +591,17 @@ class CreateOrderAndCheckoutViewSet(viewsets.ViewSet):
                     status='pending'
                 )
                 
-                # Generate unique order number after save
-                order.order_number = order.generate_order_number()
-                order.save()
-                
                 # Create order items
                 from .models import OrderItem
-                for item_data in cart_items:
-                    try:
-                        product = Product.objects.get(id=item_data['product_id'])
-                        OrderItem.objects.create(
-                            order=order,
-                            product=product,
-                            quantity=item_data['quantity'],
-                            unit_price=float(item_data['price'])
-                        )
-                    except Product.DoesNotExist:
-                        logger.warning(f"Product {item_data['product_id']} not found, skipping")
-                        continue
-                
-                # Reserve inventory
-                self._reserve_inventory(cart_items)
+                OrderItem.objects.bulk_create([
+                    OrderItem(
+                        order=order,
+                        product=products[product_id],
+                        quantity=quantity,
+                        unit_price=prices[product_id]
+                    )
+                    for product_id, quantity in quantities.items()
+                ])
                 
                 # Create Stripe checkout session
                 checkout_session = self._create_stripe_checkout_session(order, request)
@@ -492,6 +619,9 @@ class CreateOrderAndCheckoutViewSet(viewsets.ViewSet):
                     'stripe_session_id': checkout_session.id
                 })
                 
+        except InsufficientInventory as e:
+            return Response({'error': 'Insufficient inventory', 'details': e.errors},
+                          status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             logger.error(f"Order creation failed: {str(e)}")
             import traceback
@@ -505,27 +635,22 @@ class CreateOrderAndCheckoutViewSet(viewsets.ViewSet):
     def _create_stripe_checkout_session(self, order, request):
         """Create Stripe checkout session for the order"""
         import stripe
-        from .models import Product
+        from .stripe_line_items import line_item
         
         try:
             # Set API key
             stripe.api_key = settings.STRIPE_SECRET_KEY
             
-            # Build line items from order items
-            from .models import OrderItem
-            line_items = []
-            for order_item in order.order_items.all():
-                product = order_item.product
-                line_items.append({
-                    'price_data': {
-                        'currency': 'gbp',
-                        'product_data': {
-                            'name': product.name,
-                        },
-                        'unit_amount': int(float(order_item.unit_price) * 100),  # Convert to cents
-                    },
-                    'quantity': order_item.quantity,
-                })
+            # Build line items from order items; product ids ride along in the metadata
+            line_items = [
+                line_item(
+                    order_item.product.name,
+                    order_item.unit_price,
+                    order_item.quantity,
+                    product_id=order_item.product_id,
+                )
+                for order_item in order.order_items.select_related('product')
+            ]
             
             # Create checkout session
             checkout_session = stripe.checkout.Session.create(
@@ -550,63 +675,6 @@ class CreateOrderAndCheckoutViewSet(viewsets.ViewSet):
             import traceback
             logger.error(f"Stripe error traceback: {traceback.format_exc()}")
             raise e
-    
-    def _check_inventory_availability(self, cart_items):
-        """Check if all items in cart have sufficient inventory"""
-        from .models import Product
-        from django.db.models import F
-        
-        errors = []
-        
-        for item in cart_items:
-            product_id = item.get('product_id')
-            quantity = item.get('quantity', 0)
-            
-            if not product_id or quantity <= 0:
-                continue
-                
-            try:
-                # Use select_for_update to lock the product row
-                product = Product.objects.select_for_update().get(id=product_id)
-                
-                if product.stock < quantity:
-                    errors.append({
-                        'product_id': product_id,
-                        'product_name': product.name,
-                        'requested': quantity,
-                        'available': product.stock
-                    })
-                    
-            except Product.DoesNotExist:
-                errors.append({
-                    'product_id': product_id,
-                    'product_name': 'Unknown Product',
-                    'error': 'Product not found'
-                })
-                
-        return errors
-    
-    def _reserve_inventory(self, cart_items):
-        """Reserve inventory for order items"""
-        from .models import Product
-        from django.db.models import F
-        
-        for item in cart_items:
-            product_id = item.get('product_id')
-            quantity = item.get('quantity', 0)
-            
-            if not product_id or quantity <= 0:
-                continue
-                
-            try:
-                # Use select_for_update to lock and update inventory
-                product = Product.objects.select_for_update().get(id=product_id)
-                product.stock = F('stock') - quantity
-                product.save()
-                
-            except Product.DoesNotExist:
-                # This shouldn't happen if _check_inventory_availability passed
-                logger.warning(f"Product {product_id} not found during inventory reservation")
 
 
 class PublicOrderDetailViewSet(viewsets.ViewSet):
@@ -741,6 +809,7 @@ class StripeCheckoutViewSet(viewsets.ViewSet):
         from stripe.checkout import Session as StripeSession
         import stripe
         from .models import Product
+        from .stripe_line_items import line_item, to_minor_units
         
         try:
             # Check if STRIPE_SECRET_KEY is None
@@ -759,51 +828,34 @@ class StripeCheckoutViewSet(viewsets.ViewSet):
             if not cart_items:
                 return Response({'error': 'No items in cart'}, status=status.HTTP_400_BAD_REQUEST)
             
-            # Build line items from cart data
+            # Build line items from cart data, fetching every product in one query
+            product_ids = {int(item['product_id']) for item in cart_items if str(item.get('product_id', '')).isdigit()}
+            products = Product.objects.only('id', 'name', 'description').in_bulk(product_ids)
             line_items = []
             for item in cart_items:
                 product_id = item.get('product_id')
                 quantity = item.get('quantity', 1)
                 unit_price = item.get('unit_price', 0)
                 
-                # Get product details
-                try:
-                    product = Product.objects.get(id=product_id)
+                product = products.get(int(product_id)) if str(product_id).isdigit() else None
+                if product is not None:
                     product_name = product.name
                     product_description = f"{product.name} - {product.description[:100]}" if product.description else product.name
-                except Product.DoesNotExist:
+                else:
                     product_name = f"Product {product_id}"
                     product_description = f"Product ID: {product_id}"
                 
-                line_items.append({
-                    'price_data': {
-                        'currency': 'gbp',
-                        'product_data': {
-                            'name': product_name,
-                            'description': product_description,
-                            'metadata': {
-                                'product_id': str(product_id)
-                            }
-                        },
-                        'unit_amount': int(float(unit_price) * 100),  # Convert to cents
-                    },
-                    'quantity': quantity,
-                })
+                line_items.append(line_item(
+                    product_name, unit_price, quantity,
+                    product_id=product.id if product is not None else None,
+                    description=product_description,
+                ))
             
             # Add shipping as a separate line item if applicable
             shipping_cost = checkout_data.get('shipping_cost', 0)
-            if shipping_cost > 0:
+            if to_minor_units(shipping_cost) > 0:
                 shipping_name = checkout_data.get('shipping_name', 'Shipping')
-                line_items.append({
-                    'price_data': {
-                        'currency': 'gbp',
-                        'product_data': {
-                            'name': shipping_name,
-                        },
-                        'unit_amount': int(float(shipping_cost) * 100),
-                    },
-                    'quantity': 1,
-                })
+                line_items.append(line_item(shipping_name, shipping_cost))
             
             
             # Create checkout session with actual data
@@ -879,7 +931,8 @@ class StripeCheckoutSessionViewSet(viewsets.ViewSet):
         """Fallback method to create order from Stripe session data"""
         try:
             import stripe
-            from .models import Order, OrderItem, Payment, Product
+            from .models import Order, Payment
+            from .stripe_line_items import create_order_items, fetch_line_items
             
             print(f"Creating fallback order for session: {session_id}")
             
@@ -938,43 +991,12 @@ class StripeCheckoutSessionViewSet(viewsets.ViewSet):
                 status="completed" if session.payment_status == "paid" else "pending"
             )
             
-            # Add line items from session
-            if hasattr(session, 'line_items') and session.line_items:
-                try:
-                    line_items = stripe.checkout.Session.list_line_items(session_id)
-                    for line_item in line_items.data:
-                        # Try to find the product by name or create a generic entry
-                        product_name = line_item.description or "Product"
-                        product_price = line_item.price.unit_amount / 100 if line_item.price else 10.00
-                        quantity = line_item.quantity
-                        
-                        # Find matching product or create a generic one
-                        product = Product.objects.filter(name__icontains=product_name).first()
-                        if not product:
-                            # Use first available product as fallback
-                            product = Product.objects.first()
-                        
-                        if product:
-                            OrderItem.objects.create(
-                                order=order,
-                                product=product,
-                                quantity=quantity,
-                                unit_price=product_price
-                            )
-                            print(f"Added product {product.name} to fallback order")
-                except Exception as e:
-                    print(f"Failed to process line items: {str(e)}")
-                    # Fallback: add a default product
-                    products = Product.objects.all()
-                    if products.exists():
-                        product = products.first()
-                        OrderItem.objects.create(
-                            order=order,
-                            product=product,
-                            quantity=1,
-                            unit_price=total_amount
-                        )
-                        print(f"Added default product {product.name} to fallback order")
+            # Add line items from session, matched to products by the ids in their metadata
+            try:
+                created = create_order_items(order, fetch_line_items(session_id))
+                print(f"Added {created} item(s) to fallback order")
+            except stripe.error.StripeError as e:
+                print(f"Failed to process line items: {str(e)}")
             
             print(f"✅ Fallback order created: {order.id}")
             return order
@@ -2,15 +2,18 @@ import stripe
 import json
 import logging
 from django.conf import settings
+from django.db import transaction
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
 from django.utils.decorators import method_decorator
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import AllowAny, IsAdminUser
 from rest_framework.response import Response
 from rest_framework import status
 from .models import Order, Payment
+from .stripe_events import enqueue_event, queue_stats, retry_event
+from .stripe_line_items import create_order_items, fetch_line_items
 
 logger = logging.getLogger(__name__)
 
@@ -23,9 +26,8 @@ def create_payment_intent(request):
     """Create a Stripe Payment Intent"""
     try:
         # Get store settings for currency
-        from .models import StoreSettings
-        store_settings = StoreSettings.objects.first()
-        default_currency = store_settings.currency.lower() if store_settings else 'gbp'
+        from .singletons import get_store_settings
+        default_currency = (get_store_settings().currency or 'gbp').lower()
         
         data = request.data
         amount = int(float(data.get('amount', 0)) * 100)  # Convert to cents
@@ -74,9 +76,11 @@ def stripe_webhook(request):
         # Verify webhook signature
         webhook_secret = getattr(settings, 'STRIPE_WEBHOOK_SECRET', None)
         if webhook_secret:
-            event = stripe.Webhook.construct_event(
+            stripe.Webhook.construct_event(
                 payload, sig_header, webhook_secret
             )
+            # Queue the verified raw JSON rather than the StripeObject
+            event = json.loads(payload)
         else:
             # For development/testing without webhook secret
             event = json.loads(payload)
@@ -89,31 +93,30 @@ def stripe_webhook(request):
         logger.error(f"Invalid signature: {str(e)}")
         return JsonResponse({'error': 'Invalid signature'}, status=400)
     
-    # Handle the event
-    event_type = event['type']
-    logger.info(f"Received Stripe webhook: {event_type}")
-    
+    # Queue the event and acknowledge at once; workers in stripe_events
+    # process it (and retry on failure) off the request path
     try:
-        if event_type == 'payment_intent.succeeded':
-            payment_intent = event['data']['object']
-            handle_payment_succeeded(payment_intent)
-        elif event_type == 'payment_intent.payment_failed':
-            payment_intent = event['data']['object']
-            handle_payment_failed(payment_intent)
-        elif event_type == 'payment_intent.canceled':
-            payment_intent = event['data']['object']
-            handle_payment_canceled(payment_intent)
-        elif event_type == 'checkout.session.completed':
-            session = event['data']['object']
-            handle_checkout_session_completed(session)
-        else:
-            logger.info(f"Unhandled event type: {event_type}")
-    
-    except Exception as e:
-        logger.error(f"Error processing webhook event {event_type}: {str(e)}")
-        return JsonResponse({'error': 'Webhook processing failed'}, status=500)
-    
-    return JsonResponse({'status': 'success'})
+        created = enqueue_event(event)
+    except ValueError as e:
+        logger.error(f"Invalid event: {str(e)}")
+        return JsonResponse({'error': 'Invalid payload'}, status=400)
+
+    logger.info(f"Received Stripe webhook: {event['type']} {event['id']}" + ("" if created else " (duplicate)"))
+    return JsonResponse({'status': 'queued' if created else 'duplicate'})
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def stripe_event_queue(request):
+    """Stripe webhook queue depth, lag and recent failures"""
+    return Response(queue_stats())
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def retry_stripe_event(request, event_id):
+    """Requeue a failed Stripe event for immediate processing"""
+    if not retry_event(event_id):
+        return Response({'error': 'Event not found or already processed'}, status=status.HTTP_404_NOT_FOUND)
+    return Response({'status': 'queued'})
 
 def handle_payment_succeeded(payment_intent):
     """Handle successful payment"""
@@ -167,6 +170,7 @@ def handle_payment_succeeded(payment_intent):
         
     except Exception as e:
         logger.error(f"Error handling payment success: {str(e)}")
+        raise  # retried by the Stripe event queue
 
 def handle_payment_failed(payment_intent):
     """Handle failed payment"""
@@ -220,65 +224,7 @@ def handle_payment_failed(payment_intent):
         
     except Exception as e:
         logger.error(f"Error handling payment failure: {str(e)}")
-
-def handle_checkout_session_completed(session):
-    """Handle successful checkout session completion"""
-    try:
-        session_id = session['id']
-        payment_intent_id = session.get('payment_intent')
-        metadata = session.get('metadata', {})
-        
-        logger.info(f"Processing checkout session completed: {session_id}")
-        
-        # Find order by session ID
-        try:
-            order = Order.objects.get(stripe_session_id=session_id)
-        except Order.DoesNotExist:
-            # Try to find by order_id in metadata
-            order_id = metadata.get('order_id')
-            if order_id:
-                try:
-                    order = Order.objects.get(id=order_id)
-                    # Update with session ID
-                    order.stripe_session_id = session_id
-                    order.save()
-                except Order.DoesNotExist:
-                    logger.error(f"Order not found for session {session_id}")
-                    return
-            else:
-                logger.error(f"No order found for session {session_id}")
-                return
-        
-        # Update order status to paid
-        order.status = 'paid'
-        order.payment_status = 'paid'
-        if payment_intent_id:
-            order.payment_intent_id = payment_intent_id
-        order.save()
-        
-        # Create payment record if payment intent exists
-        if payment_intent_id:
-            amount = session.get('amount_total', 0) / 100  # Convert from cents
-            currency = session.get('currency', 'gbp').upper()
-            
-            payment, created = Payment.objects.get_or_create(
-                stripe_payment_intent_id=payment_intent_id,
-                defaults={
-                    'order': order,
-                    'amount': amount,
-                    'currency': currency,
-                    'status': 'completed'
-                }
-            )
-            
-            if not created:
-                payment.status = 'completed'
-                payment.save()
-        
-        logger.info(f"Checkout session completed for order {order.order_number}")
-        
-    except Exception as e:
-        logger.error(f"Error handling checkout session completion: {str(e)}")
+        raise  # retried by the Stripe event queue
 
 def handle_payment_canceled(payment_intent):
     """Handle canceled payment"""
@@ -330,14 +276,11 @@ def handle_payment_canceled(payment_intent):
         
     except Exception as e:
         logger.error(f"Error handling payment cancellation: {str(e)}")
+        raise  # retried by the Stripe event queue
 
 def handle_checkout_session_completed(session):
     """Handle successful checkout session completion - IDEMPOTENT"""
     try:
-        import uuid
-        from .models import Product, OrderItem
-        from django.contrib.auth.models import User
-        
         session_id = session['id']
         payment_intent_id = session['payment_intent']
         amount_total = session['amount_total'] / 100  # Convert from cents
@@ -356,71 +299,29 @@ def handle_checkout_session_completed(session):
         order_id = metadata.get('order_id')
         user_id = metadata.get('user_id', 'guest')
         
-        # Check if order already exists by tracking_id (session_id)
-        order = None
-        try:
-            order = Order.objects.get(tracking_id=session_id)
-            logger.info(f"✅ Found existing order {order.id} by tracking_id {session_id}")
-        except Order.DoesNotExist:
-            logger.info(f"🔄 No existing order found for session {session_id}")
-        
-        # If no order exists, create one from session data
-        if not order:
-            logger.info(f"🔄 Creating new order from session data for {session_id}")
-            try:
-                # Get line items from session
-                line_items = None
-                try:
-                    import stripe
-                    line_items = stripe.checkout.Session.list_line_items(session_id)
-                except Exception as e:
-                    logger.warning(f"Could not fetch line items: {str(e)}")
-                
-                # Create order from session data
-                order = Order.objects.create(
-                    user=None,  # Guest order
-                    tracking_id=session_id,
-                    payment_id=payment_intent_id,
-                    customer_email=customer_email,
-                    customer_phone=session.get('customer_details', {}).get('phone', '') if session.get('customer_details') else '',
-                    shipping_address=session.get('shipping_details', {}).get('address', {}) if session.get('shipping_details') else {},
-                    subtotal=amount_total,  # Use actual amount
-                    shipping_cost=0,
-                    tax_amount=0,
-                    total_price=amount_total,
-                    payment_method="card",
-                    shipping_name="Standard Shipping",
-                    status="pending",
-                    payment_status="paid"  # If we reach this webhook, payment was successful
-                )
-                logger.info(f"✅ Created new order {order.id} from session data")
-                
-                # Create order items from line items if available
-                if line_items and hasattr(line_items, 'data'):
-                    for item in line_items.data:
-                        try:
-                            # Extract product ID from the price data metadata or name
-                            product_name = item['description']
-                            # Try to find product by name (this is a simple approach)
-                            products = Product.objects.filter(name__icontains=product_name.split(' - ')[0])
-                            if products.exists():
-                                product = products.first()
-                                
-                                OrderItem.objects.create(
-                                    order=order,
-                                    product=product,
-                                    quantity=item['quantity'],
-                                    unit_price=item['price']['unit_amount'] / 100
-                                )
-                            else:
-                                logger.warning(f"Product not found for line item: {product_name}")
-                        except Exception as e:
-                            logger.error(f"Error creating order item: {str(e)}")
-                            continue
-                
-            except Exception as e:
-                logger.error(f"❌ Failed to create order from session data: {str(e)}")
-                return
+        # Find or create the order by tracking_id (session_id); tracking_id is unique, so
+        # a concurrent run of the same session gets the existing row instead of a second order
+        order, created = Order.objects.get_or_create(
+            tracking_id=session_id,
+            defaults={
+                'user': None,  # Guest order
+                'payment_id': payment_intent_id,
+                'customer_email': customer_email,
+                'customer_phone': session.get('customer_details', {}).get('phone', '') if session.get('customer_details') else '',
+                'shipping_address': session.get('shipping_details', {}).get('address', {}) if session.get('shipping_details') else {},
+                'subtotal': amount_total,  # Use actual amount
+                'shipping_cost': 0,
+                'tax_amount': 0,
+                'total_price': amount_total,
+                'payment_method': "card",
+                'shipping_name': "Standard Shipping",
+                'status': "pending",
+                'payment_status': "paid"  # If we reach this webhook, payment was successful
+            }
+        )
+        
+        if created:
+            logger.info(f"✅ Created new order {order.id} from session data for {session_id}")
         else:
             # Order exists, update it with latest session data
             logger.info(f"🔄 Updating existing order {order.id} with session data")
@@ -465,15 +366,6 @@ def handle_checkout_session_completed(session):
             
             logger.info(f"✅ Updated existing order {order.id} with session data")
         
-        # Get line items from the session (skip for test sessions)
-        line_items = None
-        if not session_id.startswith('cs_test_'):
-            try:
-                line_items = stripe.checkout.Session.list_line_items(session_id)
-            except stripe.error.StripeError as e:
-                logger.error(f"Failed to fetch line items for session {session_id}: {str(e)}")
-                line_items = None
-        
         # Extract shipping information from session
         shipping_address = {}
         customer_name = ''
@@ -535,31 +427,12 @@ def handle_checkout_session_completed(session):
         logger.info(f"📧 Final customer email: {order.customer_email}")
         
         # IDEMPOTENT: Only create order items if they don't exist
-        existing_items_count = order.items.count()
-        if existing_items_count == 0 and line_items and hasattr(line_items, 'data'):
-            logger.info(f"Creating order items for order {order.id}")
-            for item in line_items.data:
-                try:
-                    # Extract product ID from the price data metadata or name
-                    product_name = item['description']
-                    # Try to find product by name (this is a simple approach)
-                    # In production, you might want to store product IDs in metadata
-                    products = Product.objects.filter(name__icontains=product_name.split(' - ')[0])
-                    if products.exists():
-                        product = products.first()
-                        
-                        OrderItem.objects.create(
-                            order=order,
-                            product=product,
-                            quantity=item['quantity'],
-                            unit_price=item['price']['unit_amount'] / 100
-                        )
-                    else:
-                        logger.warning(f"Product not found for line item: {product_name}")
-                except Exception as e:
-                    logger.error(f"Error creating order item: {str(e)}")
-                    continue
-        elif existing_items_count > 0:
+        existing_items_count = order.order_items.count()
+        if existing_items_count == 0:
+            # Products are matched by the ids stored in the line-item metadata
+            created = create_order_items(order, fetch_line_items(session_id))
+            logger.info(f"Created {created} order item(s) for order {order.id}")
+        else:
             logger.info(f"Order {order.id} already has {existing_items_count} items, skipping item creation")
         
         # IDEMPOTENT: Create or update payment record
@@ -580,8 +453,8 @@ def handle_checkout_session_completed(session):
         else:
             logger.info(f"Created new payment record {payment.id}")
         
-        # Send notification to admin panel via WebSocket
-        send_order_notification_to_admin(order)
+        # Send notification to admin panel via WebSocket, once the order is committed
+        transaction.on_commit(lambda: send_order_notification_to_admin(order))
         
         logger.info(f"✅ Order processed successfully: {order.id}")
         logger.info(f"📦 Order details: {order.tracking_id} - {order.customer_email} - £{order.total_price}")
@@ -589,6 +462,7 @@ def handle_checkout_session_completed(session):
         
     except Exception as e:
         logger.error(f"Error handling checkout session completion: {str(e)}")
+        raise  # retried by the Stripe event queue
 
 def send_order_notification_to_admin(order):
     """Send order notification to admin panel via WebSocket"""
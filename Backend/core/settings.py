@@ -155,7 +155,7 @@ RUNSERVER_HOST = '127.0.0.1'
 # REST Framework
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "adminpanel.jwt_user_cache.CachedJWTAuthentication",
         "rest_framework.authentication.SessionAuthentication",
     ],
     "DEFAULT_PERMISSION_CLASSES": [
@@ -228,6 +228,12 @@ CORS_ALLOW_HEADERS = [
     'if-modified-since',
 ]
 
+# Response headers the storefront/admin apps may read cross-origin
+CORS_EXPOSE_HEADERS = [
+    'etag',
+    'x-has-more',
+]
+
 CORS_ALLOW_METHODS = [
     'DELETE',
     'GET',
@@ -248,11 +254,46 @@ CSRF_TRUSTED_ORIGINS = [
 ]
 
 # Channels
-CHANNEL_LAYERS = {
-    "default": {
-        "BACKEND": "channels.layers.InMemoryChannelLayer",
-    },
-}
+# Channel layer
+# "memory" only reaches sockets in the same process, so it is limited to a
+# single ASGI worker. "redis" shares groups between workers through Redis
+# pub/sub at REDIS_URL; for local multi-worker runs without Redis, start
+# `python manage.py pubsub_broker` and point REDIS_URL at it.
+CHANNEL_LAYER_BACKEND = os.getenv("CHANNEL_LAYER_BACKEND", "memory").lower()
+REDIS_URL = os.getenv("REDIS_URL", "redis://127.0.0.1:6379/0")
+
+if CHANNEL_LAYER_BACKEND == "redis":
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "channels_redis.pubsub.RedisPubSubChannelLayer",
+            "CONFIG": {
+                "hosts": [REDIS_URL],
+            },
+        },
+    }
+else:
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "channels.layers.InMemoryChannelLayer",
+        },
+    }
+
+# Cache
+# Chat presence counters, cache-tag versions and the JWT user cache must be
+# shared by every worker, so with more than one worker the default cache has
+# to be Redis. SHARED_CACHE_URL defaults to REDIS_URL in "redis" channel
+# layer mode; set it empty when REDIS_URL is the pubsub_broker stand-in,
+# which speaks pub/sub only. Without it each process keeps a private
+# LocMem cache, which is only right for a single worker.
+SHARED_CACHE_URL = os.getenv("SHARED_CACHE_URL", REDIS_URL if CHANNEL_LAYER_BACKEND == "redis" else "")
+if SHARED_CACHE_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": SHARED_CACHE_URL,
+        },
+    }
+PRESENCE_CACHE = "default"
 
 # Logging
 LOGGING = {
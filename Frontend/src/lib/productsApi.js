@@ -85,7 +85,8 @@ export const incrementProductView = async (productId) => {
 
 // Get products with filters
 export const getProducts = async (params = {}) => {
-  const queryString = new URLSearchParams(params).toString();
+  // The list endpoint is cursor-paginated by default; callers here expect the full array
+  const queryString = new URLSearchParams({ paginate: 'false', ...params }).toString();
   const endpoint = queryString ? `/products/?${queryString}` : '/products/';
   return apiRequest(endpoint);
 };
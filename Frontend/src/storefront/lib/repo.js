@@ -5,7 +5,7 @@ const productRepo = {
   async findAll(params = {}) {
     try {
       console.log('📦 ProductRepo: Fetching all products...');
-      const response = await fetch('http://127.0.0.1:8001/api/public/products/');
+      const response = await fetch('http://127.0.0.1:8001/api/public/products/?paginate=false');
       if (!response.ok) {
         throw new Error(`HTTP ${response.status}: ${response.statusText}`);
       }
@@ -34,7 +34,7 @@ const productRepo = {
   
   async search(query) {
     try {
-      const response = await fetch(`http://127.0.0.1:8001/api/public/products/?search=${encodeURIComponent(query)}`);
+      const response = await fetch(`http://127.0.0.1:8001/api/public/products/?paginate=false&search=${encodeURIComponent(query)}`);
       if (!response.ok) {
         throw new Error(`HTTP ${response.status}: ${response.statusText}`);
       }